@@ -48,8 +48,33 @@ Implementation Notes
 
 import time
 from digitalio import Direction
+from pn532_stats import (CommandStats, PHASE_WRITE, PHASE_ACK, PHASE_RESPONSE,
+                         EVENT_TIMEOUT, EVENT_WAKEUP, EVENT_BUSY,
+                         EVENT_FRAME_ERROR, EVENT_NACK, LATENCY_DETECT,
+                         LATENCY_NO_CARD)
 
-from micropython import const
+try:
+    from micropython import const
+except ImportError:  # CPython, e.g. when running against a simulated bus
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+
+try:
+    from time import sleep_us as _sleep_us
+    from time import ticks_ms as _ticks_ms, ticks_diff as _ticks_diff
+    from time import ticks_add as _ticks_add
+except ImportError:
+    def _sleep_us(us):  # pylint: disable=missing-docstring
+        time.sleep(us / 1000000)
+
+    def _ticks_ms():  # pylint: disable=missing-docstring
+        return time.monotonic_ns() // 1000000
+
+    def _ticks_diff(end, start):  # pylint: disable=missing-docstring
+        return end - start
+
+    def _ticks_add(ticks, delta):  # pylint: disable=missing-docstring
+        return ticks + delta
 
 __version__ = "0.0.0-auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_PN532.git"
@@ -103,6 +128,24 @@ _RESPONSE_INLISTPASSIVETARGET = const(0x4B)
 _WAKEUP = const(0x55)
 
 _MIFARE_ISO14443A = const(0x00)
+_FELICA_212 = const(0x01)
+_FELICA_424 = const(0x02)
+_JEWEL = const(0x04)
+
+# Space reserved per target record in an InListPassiveTarget response
+_TARGET_RECORD_MAX = const(48)
+
+# InAutoPoll target types
+AUTOPOLL_GENERIC_106 = const(0x00)
+AUTOPOLL_JEWEL = const(0x04)
+AUTOPOLL_MIFARE = const(0x10)
+AUTOPOLL_FELICA_212 = const(0x11)
+AUTOPOLL_FELICA_424 = const(0x12)
+AUTOPOLL_ISO14443_4A = const(0x20)
+# InAutoPoll PollNr value that polls until a target is found
+_AUTOPOLL_ENDLESS = const(0xFF)
+# InAutoPoll period unit in seconds
+_AUTOPOLL_PERIOD_UNIT = 0.15
 
 # Mifare Commands
 MIFARE_CMD_AUTH_A = const(0x60)
@@ -114,6 +157,80 @@ MIFARE_CMD_DECREMENT = const(0xC0)
 MIFARE_CMD_INCREMENT = const(0xC1)
 MIFARE_CMD_STORE = const(0xC2)
 MIFARE_ULTRALIGHT_CMD_WRITE = const(0xA2)
+NTAG2XX_CMD_FAST_READ = const(0x3A)
+
+# Pages per FAST_READ so the response fits in a normal PN532 frame
+_NTAG_FAST_READ_MAX_PAGES = const(60)
+
+# InDataExchange chaining: the MI (more information) bit of the Tg byte and
+# of the response status, the rest of the status is the error code
+_DATA_EXCHANGE_MI = const(0x40)
+_DATA_EXCHANGE_ERROR = const(0x3F)
+# APDU bytes per InDataExchange in a normal frame, host to PN532 (Tg first)
+# and PN532 to host (status first)
+_APDU_OUT_CHUNK = const(251)
+_APDU_IN_CHUNK = const(252)
+
+# NFC Forum Type 2 tag layout: capability container on page 3, data area
+# (TLVs) from page 4. CC byte 2 is the data area size / 8.
+_NTAG_CC_PAGE = const(3)
+_NTAG_CC_MAGIC = const(0xE1)
+# Pages read first for an NDEF message: CC + 44 bytes, enough for a short URL
+_NTAG_NDEF_FIRST_PAGES = const(12)
+# Last page of the smallest Type 2 tag (MIFARE Ultralight), safe to read
+# before the CC gives the size
+_NTAG_MIN_LAST_PAGE = const(15)
+TLV_NULL = const(0x00)
+TLV_LOCK_CONTROL = const(0x01)
+TLV_MEMORY_CONTROL = const(0x02)
+TLV_NDEF = const(0x03)
+TLV_TERMINATOR = const(0xFE)
+
+# RFConfiguration items
+_RFCFG_FIELD = const(0x01)
+_RFCFG_TIMINGS = const(0x02)
+_RFCFG_MAX_RETRY_COM = const(0x04)
+_RFCFG_MAX_RETRIES = const(0x05)
+_RF_FIELD_ON = const(0x01)
+_RF_AUTO_RFCA = const(0x02)
+# Timeout codes: 0 none, n = 100us << (n - 1), up to 0x10 (3.28s)
+_RF_TIMEOUT_MAX_CODE = const(0x10)
+_RF_RETRY_FOREVER = const(0xFF)
+
+# PowerDown wake up sources
+POWERDOWN_WAKE_I2C = const(0x80)
+POWERDOWN_WAKE_GPIO = const(0x40)
+POWERDOWN_WAKE_SPI = const(0x20)
+POWERDOWN_WAKE_HSU = const(0x10)
+POWERDOWN_WAKE_RF = const(0x08)  # external RF field, e.g. a phone
+POWERDOWN_WAKE_INT1 = const(0x02)
+POWERDOWN_WAKE_INT0 = const(0x01)
+# The PN532 oscillator needs about 2ms to start after a wake up
+_POWER_UP_US = const(2000)
+# Fast start: reset low pulse (well above the datasheet minimum), then the
+# oscillator start up before the PN532 is probed with GetFirmwareVersion,
+# every _PROBE_RETRY_US once an attempt got no answer in _PROBE_ATTEMPT_MS,
+# for at most _BOOT_TIMEOUT seconds
+_RESET_PULSE_US = const(100)
+# Wake up request pulse (H_REQ low) of a short wake up
+_WAKEUP_PULSE_US = const(100)
+_PROBE_ATTEMPT_MS = const(10)
+_PROBE_RETRY_US = const(500)
+_BOOT_TIMEOUT = 1
+
+# InPSL bit rates in kbps, the index is the BRit / BRti code
+_BITRATES = (106, 212, 424, 848)
+# ATS: T0 bit telling TA(1) is present, TA(1) bit for the same rate both ways
+_ATS_TA_PRESENT = const(0x10)
+_ATS_SAME_BITRATE = const(0x80)
+_SEL_RES_ISO14443_4 = const(0x20)
+
+# Diagnose test: attention request / ISO14443-4 card presence detection
+_DIAGNOSE_ATTENTION = const(0x06)
+
+# SAMConfiguration
+_SAM_NORMAL_MODE = const(0x01)
+_SAM_TIMEOUT_UNIT = 0.05
 
 # Prefixes for NDEF Records (to identify record type)
 NDEF_URIPREFIX_NONE = const(0x00)
@@ -162,10 +279,47 @@ _GPIO_P34 = const(4)
 _GPIO_P35 = const(5)
 
 _ACK = b'\x00\x00\xFF\x00\xFF\x00'
+# Asks the PN532 to send its last response frame again
+_NACK = b'\x00\x00\xFF\xFF\x00\x00'
+# NACKs sent for a corrupted response before giving up
+_NACK_RETRIES = const(2)
 _FRAME_START = b'\x00\x00\xFF'
+# Ready poll backoff (microseconds) used when no IRQ pin is wired
+_POLL_MIN_US = const(100)
+_POLL_MAX_US = const(800)
+# Interval between cheap IRQ pin level checks (microseconds)
+_IRQ_CHECK_US = const(50)
+
+# Largest normal frame: preamble, start code, LEN, LCS, 255 data, DCS, postamble
+_FRAME_BUFFER_SIZE = const(262)
 # pylint: enable=bad-whitespace
 
 
+def _deadline(timeout):
+    """ticks_ms deadline timeout seconds from now"""
+    return _ticks_add(_ticks_ms(), int(timeout * 1000))
+
+
+def _earlier(deadline, other):
+    """The earlier of two deadlines, other may be None"""
+    if other is None or _ticks_diff(deadline, other) <= 0:
+        return deadline
+    return other
+
+
+def _remaining(deadline):
+    """Seconds left until deadline, 0 once it has passed"""
+    return max(0, _ticks_diff(deadline, _ticks_ms())) / 1000
+
+
+def _sleep_ms(ms, deadline=None):
+    """Sleep ms milliseconds, but not past deadline when one is given"""
+    if deadline is not None:
+        ms = min(ms, _ticks_diff(deadline, _ticks_ms()))
+    if ms > 0:
+        _sleep_us(ms * 1000)
+
+
 def _reset(pin):
     """Perform a hardware reset toggle"""
     pin.direction = Direction.OUTPUT
@@ -177,30 +331,329 @@ def _reset(pin):
     time.sleep(0.1)
 
 
+def _is_ack(data):
+    """True if data holds an ACK frame, compared without allocating"""
+    if len(data) != len(_ACK):
+        return False
+    for i in range(len(_ACK)):
+        if data[i] != _ACK[i]:
+            return False
+    return True
+
+
 class BusyError(Exception):
     """Base class for exceptions in this module."""
     pass
 
 
+class Target:
+    """A target reported by the PN532. target_type is one of the AUTOPOLL_*
+    values, tg the logical target number used by In* commands and uid the
+    NFCID (UID for ISO14443A, IDm for FeliCa, JEWELID for Jewel).
+    """
+
+    def __init__(self, target_type, tg, uid, sens_res=None, sel_res=None,
+                 extra=None):
+        self.target_type = target_type
+        self.tg = tg
+        self.uid = uid
+        self.sens_res = sens_res
+        self.sel_res = sel_res
+        self.extra = extra
+
+    def __repr__(self):
+        return "Target(type=0x{:02x}, tg={}, uid={})".format(
+            self.target_type, self.tg, [hex(i) for i in self.uid])
+
+
+def _sam_timeout_units(seconds):
+    """SAMConfiguration timeout byte: seconds in the nearest 50ms steps"""
+    return min(0xFF, max(0, int(seconds / _SAM_TIMEOUT_UNIT + 0.5)))
+
+
+def _rf_timeout_code(seconds):
+    """RFConfiguration timeout code for the shortest time of at least
+    seconds, 0 means no timeout"""
+    if not seconds:
+        return 0
+    code = 1
+    while 0.0001 * (1 << (code - 1)) < seconds and code < _RF_TIMEOUT_MAX_CODE:
+        code += 1
+    return code
+
+
+class RFProfile:
+    """RF settings applied with PN532.rf_configure. passive_retries is how
+    often InListPassiveTarget retries activation before reporting no card
+    (255 retries forever, 0 tries once), atr_retries and psl_retries the same
+    for InJumpForDEP/InATR and InPSL, com_retries the retries of
+    InDataExchange/InCommunicateThru. atr_timeout and timeout (seconds,
+    rounded up to the PN532 steps of 100us * 2^n) bound the wait for an
+    ATR_RES and for a target answer. field and auto_rfca control the RF field.
+    """
+
+    def __init__(self, passive_retries=_RF_RETRY_FOREVER,
+                 atr_retries=_RF_RETRY_FOREVER, psl_retries=0x01,
+                 com_retries=0x00, atr_timeout=0.1024, timeout=0.0512,
+                 field=True, auto_rfca=True):
+        self.passive_retries = passive_retries
+        self.atr_retries = atr_retries
+        self.psl_retries = psl_retries
+        self.com_retries = com_retries
+        self.atr_timeout = atr_timeout
+        self.timeout = timeout
+        self.field = field
+        self.auto_rfca = auto_rfca
+
+    def __repr__(self):
+        return ("RFProfile(passive_retries={}, atr_retries={}, psl_retries={},"
+                " com_retries={}, atr_timeout={}, timeout={})".format(
+                    self.passive_retries, self.atr_retries, self.psl_retries,
+                    self.com_retries, self.atr_timeout, self.timeout))
+
+
+# PN532 power on settings, InListPassiveTarget waits until a card shows up
+RF_PROFILE_DEFAULT = RFProfile()
+# Tap and go readers: no card is reported after a few milliseconds
+RF_PROFILE_FAST_TAP = RFProfile(passive_retries=0x02, atr_retries=0x02,
+                                psl_retries=0x01, com_retries=0x00,
+                                atr_timeout=0.0256, timeout=0.0256)
+# Noisy fields or hard to couple tags: retry a lot, wait longer for answers
+RF_PROFILE_ROBUST = RFProfile(passive_retries=0x40, atr_retries=0xFF,
+                              psl_retries=0x03, com_retries=0x03,
+                              atr_timeout=0.2048, timeout=0.1024)
+RF_PROFILES = {
+    "default": RF_PROFILE_DEFAULT,
+    "fast tap": RF_PROFILE_FAST_TAP,
+    "robust": RF_PROFILE_ROBUST,
+}
+
+
+def _decode_target(target_type, data):
+    """Decode the TargetData of an InAutoPoll target of target_type"""
+    if target_type == AUTOPOLL_JEWEL:
+        # Tg, SENS_RES (2), JEWELID (4)
+        return Target(target_type, data[0], bytes(data[3:7]),
+                      sens_res=bytes(data[1:3]))
+    if target_type in (AUTOPOLL_FELICA_212, AUTOPOLL_FELICA_424):
+        # Tg, POL_RES length, 0x01, NFCID2 (8), Pad (8), [SYST_CODE (2)]
+        return Target(target_type, data[0], bytes(data[3:11]),
+                      extra=bytes(data[11:]))
+    if target_type in (AUTOPOLL_GENERIC_106, AUTOPOLL_MIFARE,
+                       AUTOPOLL_ISO14443_4A):
+        # Tg, SENS_RES (2), SEL_RES, NFCIDLength, NFCID1, [ATS]
+        uid_length = data[4]
+        return Target(target_type, data[0], bytes(data[5:5+uid_length]),
+                      sens_res=bytes(data[1:3]), sel_res=data[3],
+                      extra=bytes(data[5+uid_length:]))
+    return Target(target_type, data[0], b'', extra=bytes(data[1:]))
+
+
+def _parse_autopoll(response):
+    """Decode the targets of an InAutoPoll response"""
+    targets = []
+    offset = 1
+    for _ in range(response[0]):
+        target_type = response[offset]
+        length = response[offset+1]
+        targets.append(_decode_target(
+            target_type, response[offset+2:offset+2+length]))
+        offset += 2 + length
+    return targets
+
+
+def _target_length(target_type, response, offset):
+    """Length of the target record of target_type at offset in an
+    InListPassiveTarget response"""
+    if target_type == AUTOPOLL_JEWEL:
+        return 7
+    if target_type in (AUTOPOLL_FELICA_212, AUTOPOLL_FELICA_424):
+        return 1 + response[offset+1]
+    length = 5 + response[offset+4]
+    if response[offset+3] & 0x20 and offset + length < len(response):
+        # ISO14443-4 compliant, ATS follows with its own length byte
+        length += response[offset+length]
+    return length
+
+
+def _ats_bitrates(ats):
+    """Bit rates an ATS allows as (to the card, from the card, same rate
+    both ways), the rates as bit masks of the InPSL codes (bit 0 106kbps
+    to bit 3 848kbps)"""
+    if len(ats) < 3 or not ats[1] & _ATS_TA_PRESENT:
+        return 0x01, 0x01, True
+    ta = ats[2]
+    return (ta & 0x07) << 1 | 0x01, (ta >> 4 & 0x07) << 1 | 0x01, \
+        bool(ta & _ATS_SAME_BITRATE)
+
+
+def _fastest(mask, code):
+    """Fastest InPSL code in mask up to code"""
+    while code and not mask & (1 << code):
+        code -= 1
+    return code
+
+
+def _bitrate_attempts(target, max_kbps):
+    """(to the target, from the target) rates in kbps to try with InPSL for
+    target, fastest first, up to max_kbps. Nothing for targets that are not
+    ISO14443-4 or when max_kbps is 106."""
+    if target.sel_res is None or not target.sel_res & _SEL_RES_ISO14443_4:
+        return
+    to_target, from_target, same = _ats_bitrates(target.extra or b'')
+    if same:
+        to_target = from_target = to_target & from_target
+    tried = []
+    for code in range(_BITRATES.index(max_kbps), 0, -1):
+        rates = (_fastest(to_target, code), _fastest(from_target, code))
+        if rates == (0, 0) or rates in tried:
+            continue
+        tried.append(rates)
+        yield _BITRATES[rates[0]], _BITRATES[rates[1]]
+
+
+# InListPassiveTarget BrTy to the matching target type
+_BAUD_TARGET_TYPES = {
+    _MIFARE_ISO14443A: AUTOPOLL_GENERIC_106,
+    _FELICA_212: AUTOPOLL_FELICA_212,
+    _FELICA_424: AUTOPOLL_FELICA_424,
+    _JEWEL: AUTOPOLL_JEWEL,
+}
+
+
+def _ndef_tlvs(data, offset, limit, load, room=1):
+    """Walk the TLVs of a Type 2 tag data area, offsets offset to limit in
+    data. load(end) makes data cover the offsets below end, False if it
+    cannot. Yields (offset, type, value offset, value length) for each TLV
+    up to the Terminator; a run of NULL TLVs (counted up to room bytes) is
+    one item whose value is the run. (offset, None, 0, 0) ends the walk if
+    load fails before the end of the area."""
+    while offset < limit:
+        if not load(offset + 1):
+            yield offset, None, 0, 0
+            return
+        tlv = data[offset]
+        if tlv == TLV_NULL:
+            end = offset + 1
+            while end < limit and end - offset < room and load(end + 1) \
+                    and data[end] == TLV_NULL:
+                end += 1
+            yield offset, TLV_NULL, offset, end - offset
+            offset = end
+            continue
+        if tlv == TLV_TERMINATOR:
+            yield offset, tlv, offset + 1, 0
+            return
+        value = offset + 2
+        if not load(value):
+            yield offset, None, 0, 0
+            return
+        length = data[offset + 1]
+        if length == 0xFF:  # 3 byte format, 2 byte length follows
+            value += 2
+            if not load(value):
+                yield offset, None, 0, 0
+                return
+            length = (data[offset + 2] << 8) | data[offset + 3]
+        yield offset, tlv, value, length
+        offset = value + length
+
+
 class PN532:
     """PN532 driver base, must be extended for I2C/SPI/UART interfacing"""
 
-    def __init__(self, *, debug=False, reset=None):
-        """Create an instance of the PN532 class
+    # IRQ pin and its pending edge, see _init_irq
+    _irq = None
+    _irq_flag = False
+
+    def __init__(self, *, debug=False, reset=None, fast=False, sam=False):
+        """Create an instance of the PN532 class. With fast the fixed reset
+        and wake up sleeps are replaced by probing the PN532 until it answers,
+        with sam SAM_configuration() is done as well. The firmware identity
+        is kept in firmware, the time spent in each start up phase (ms) in
+        boot_times.
         """
         self.debug = debug
+        # Logical number of the target used for InDataExchange
+        self._target = 0x01
+        # Per command latency/error counters, see enable_stats
+        self.stats = None
+        # RF settings last applied with rf_configure
+        self.rf_profile = RF_PROFILE_DEFAULT
+        # Bit rates (kbps to the target, from the target) of the current
+        # target, and the fastest to negotiate after list_passive_targets
+        self.bitrate = (_BITRATES[0], _BITRATES[0])
+        self.max_bitrate = _BITRATES[0]
+        # NACKs sent for a corrupted response before call_function raises
+        self.nack_retries = _NACK_RETRIES
+        # Frames are built in and read into these buffers, no per call allocation
+        self._tx = bytearray(_FRAME_BUFFER_SIZE)
+        self._tx_view = memoryview(self._tx)
+        self._rx = bytearray(_FRAME_BUFFER_SIZE + 1)  # + transport status byte
+        self._rx_view = memoryview(self._rx)
+        # (IC, Ver, Rev, Support) from the last GetFirmwareVersion
+        self.firmware = None
+        # [(phase, ms), ...] of the start up
+        self.boot_times = []
+        start = _ticks_ms()
         if reset:
             if debug:
                 print("Resetting")
-            _reset(reset)
-
-        try:
+            self._hard_reset(reset, fast)
+            start = self._boot_phase("reset", start)
+        if fast:
+            # Send the wake up signals without their sleeps, the probe tells
+            # when the PN532 is ready
+            self._wakeup(short=True)
+            start = self._boot_phase("wakeup", start)
+            self._probe(_deadline(_BOOT_TIMEOUT))
+        else:
             self._wakeup()
-            self.get_firmware_version()  # first time often fails, try 2ce
-            return
-        except (BusyError, RuntimeError):
-            pass
-        self.get_firmware_version()
+            start = self._boot_phase("wakeup", start)
+            try:
+                self.get_firmware_version()  # first time often fails, try 2ce
+            except (BusyError, RuntimeError):
+                self.get_firmware_version()
+        start = self._boot_phase("firmware", start)
+        if sam:
+            self.SAM_configuration()
+            self._boot_phase("sam", start)
+
+    def _boot_phase(self, name, start):
+        """Record the start up phase name begun at start, returns now"""
+        now = _ticks_ms()
+        self.boot_times.append((name, _ticks_diff(now, start)))
+        return now
+
+    def _hard_reset(self, pin, fast=False):  # pylint: disable=unused-argument
+        """Toggle the reset pin, transports may shorten it when fast"""
+        _reset(pin)
+
+    def _probe(self, deadline):
+        """GetFirmwareVersion until the PN532 answers or deadline passes.
+        While it boots bus errors (its address not acknowledged) and missing
+        answers only mean trying again shortly, without the wake up sleeps of
+        call_function's recovery. Raises RuntimeError if it never answers.
+        """
+        while True:
+            attempt = _earlier(_ticks_add(_ticks_ms(), _PROBE_ATTEMPT_MS),
+                               deadline)
+            try:
+                self._write_frame(_COMMAND_GETFIRMWAREVERSION, ())
+                ack = self._read_ready(len(_ACK), attempt, False)
+                if ack is not None and _is_ack(ack):
+                    response = self._read_ready(4+2+8, attempt, False)
+                    if response is not None:
+                        self.firmware = tuple(self._check_response(
+                            _COMMAND_GETFIRMWAREVERSION, response))
+                        return self.firmware
+            except (OSError, RuntimeError, BusyError):
+                pass
+            if _ticks_diff(deadline, _ticks_ms()) <= 0:
+                raise RuntimeError('Failed to detect the PN532')
+            # A late answer to this attempt must not be taken for the next
+            self._abort()
+            _sleep_us(_PROBE_RETRY_US)
 
     def _read_data(self, count):
         # Read raw data from device, not including status bytes:
@@ -217,14 +670,71 @@ class PN532:
         # Subclasses MUST implement this!
         raise NotImplementedError
 
-    def _wakeup(self):
-        # Send special command to wake up
+    def _wakeup(self, deadline=None, short=False):
+        # Send special command to wake up, sleeping no later than deadline
+        # (ticks_ms) when one is given. With short the signals use short
+        # pulses, never cut by deadline, and only the power up time is waited.
+        raise NotImplementedError
+
+    def _poll_ready(self, count):
+        # Return count bytes if the PN532 is ready, None if busy, no waiting.
+        # Raise OSError on bus errors.
+        # Subclasses MUST implement this!
         raise NotImplementedError
 
-    def _write_frame(self, data):
-        """Write a frame to the PN532 with the specified data bytearray."""
-        assert data is not None and 1 < len(
-            data) < 255, 'Data must be array of 1 to 255 bytes.'
+    def _init_irq(self, irq):
+        """Use the irq Pin (or None) to learn when the PN532 is ready"""
+        self._irq = irq
+        self._irq_flag = False
+        if irq is not None:
+            # PN532 pulls IRQ low when an ACK or response is ready to be read
+            irq.irq(trigger=irq.IRQ_FALLING, handler=self._irq_handler)
+
+    def _irq_handler(self, pin):  # pylint: disable=unused-argument
+        """IRQ pin falling edge, PN532 has data ready"""
+        self._irq_flag = True
+
+    def _irq_pending(self):
+        """True if the IRQ pin signals ready (or no IRQ pin is wired)"""
+        if self._irq is None or self._irq_flag:
+            return True
+        return self._irq.value() == 0
+
+    def _read_ready(self, count, deadline, recover=True):
+        """Wait until deadline (ticks_ms) for the PN532 to be ready and read
+        count bytes with _poll_ready. Returns the bytes or None on timeout.
+        With an IRQ pin the bus is only touched once IRQ is asserted,
+        otherwise it is polled with an adaptive backoff. Bus errors wake the
+        PN532 up again, or are raised as OSError without recover.
+        """
+        delay = _POLL_MIN_US
+        while _ticks_diff(deadline, _ticks_ms()) > 0:
+            if not self._irq_pending():
+                _sleep_us(_IRQ_CHECK_US)
+                continue
+            try:
+                frame = self._poll_ready(count)
+            except OSError:
+                if not recover:
+                    raise
+                self._recover(deadline)
+                continue
+            if frame is not None:
+                return frame  # No longer busy
+            if self._irq is None:
+                _sleep_us(delay)  # lets ask again soon!
+                delay = min(delay * 2, _POLL_MAX_US)
+        # Timed out!
+        if self.debug:
+            print("wait_ready timed out")
+        return None
+
+    def _write_frame(self, command, params):
+        """Write a frame for command and its params to the PN532, built in the
+        preallocated transmit buffer."""
+        count = len(params)
+        length = count + 2
+        assert length < 255, 'Data must be array of 1 to 255 bytes.'
         # Build frame to send as:
         # - Preamble (0x00)
         # - Start code  (0x00, 0xFF)
@@ -233,31 +743,37 @@ class PN532:
         # - Command bytes
         # - Checksum
         # - Postamble (0x00)
-        length = len(data)
-        frame = bytearray(length+8)
+        frame = self._tx
         frame[0] = _PREAMBLE
         frame[1] = _STARTCODE1
         frame[2] = _STARTCODE2
-        checksum = sum(frame[0:3])
-        frame[3] = length & 0xFF
+        frame[3] = length
         frame[4] = (~length + 1) & 0xFF
-        frame[5:-2] = data
-        checksum += sum(data)
-        frame[-2] = ~checksum & 0xFF
-        frame[-1] = _POSTAMBLE
+        frame[5] = _HOSTTOPN532
+        frame[6] = command & 0xFF
+        checksum = _PREAMBLE + _STARTCODE1 + _STARTCODE2 + _HOSTTOPN532 + \
+            frame[6]
+        for i in range(count):
+            frame[7+i] = params[i]
+            checksum += params[i]
+        frame[7+count] = ~checksum & 0xFF
+        frame[8+count] = _POSTAMBLE
         # Send frame.
         if self.debug:
-            print('Write frame: ', [hex(i) for i in frame])
-        self._write_data(bytes(frame))
+            print('Write frame: ', [hex(frame[i]) for i in range(9+count)])
+        self._write_data(self._tx_view[:9+count])
 
     def _read_frame(self, length):
         """Read a response frame from the PN532 of at most length bytes in size.
-        Returns the data inside the frame if found, otherwise raises an exception
-        if there is an error parsing the frame.  Note that less than length bytes
-        might be returned!
+        Returns the data inside the frame if found, as a memoryview into the
+        receive buffer, otherwise raises an exception if there is an error
+        parsing the frame.  Note that less than length bytes might be returned!
         """
         # Read frame with expected length of data.
-        response = self._read_data(length+8)
+        return self._parse_frame(self._read_data(length+8))
+
+    def _parse_frame(self, response):
+        """Check and return the data inside the raw response frame."""
         if self.debug:
             print('Read frame:', [hex(i) for i in response])
 
@@ -272,67 +788,208 @@ class PN532:
             raise RuntimeError(
                 'Response frame preamble does not contain 0x00FF!')
         offset += 1
-        if offset >= len(response):
+        if offset + 1 >= len(response):
             raise RuntimeError('Response contains no data!')
         # Check length & length checksum match.
         frame_len = response[offset]
         if (frame_len + response[offset+1]) & 0xFF != 0:
             raise RuntimeError(
                 'Response length checksum did not match length!')
+        if offset + 3 + frame_len > len(response):
+            raise RuntimeError('Response frame is longer than expected!')
         # Check frame checksum value matches bytes.
-        checksum = sum(response[offset+2:offset+2+frame_len+1]) & 0xFF
+        checksum = 0
+        for i in range(offset+2, offset+3+frame_len):
+            checksum += response[i]
+        checksum &= 0xFF
         if checksum != 0:
             raise RuntimeError(
                 'Response checksum did not match expected value: ', checksum)
         # Return frame data.
         return response[offset+2:offset+2+frame_len]
 
-    def call_function(self, command, response_length=0, params=[], timeout=1):  # pylint: disable=dangerous-default-value
+    def call_function(self, command, response_length=0, params=[], timeout=1,  # pylint: disable=dangerous-default-value
+                      copy=False, deadline=None):
         """Send specified command to the PN532 and expect up to response_length
         bytes back in a response.  Note that less than the expected bytes might
         be returned!  Params can optionally specify an array of bytes to send as
-        parameters to the function call.  Will wait up to timeout seconds
-        for a response and return a bytearray of response bytes, or None if no
-        response is available within the timeout.
+        parameters to the function call.  The whole call (write, ACK, response,
+        wake ups after bus errors) takes at most timeout seconds, or until
+        deadline (ticks_ms) if that is earlier; returns the response bytes, or
+        None if no response is available in time (the PN532 is then told to
+        abort the command).  The response is a memoryview into the
+        receive buffer that is only valid until the next command, use copy=True
+        to get a bytearray that can be kept.
         """
-        # Build frame data with command and parameters.
-        data = bytearray(2+len(params))
-        data[0] = _HOSTTOPN532
-        data[1] = command & 0xFF
-        for i, val in enumerate(params):
-            data[2+i] = val
-        # Send frame and wait for response.
+        deadline = _earlier(_deadline(timeout), deadline)
+        # The steps are shared with pn532_async, which only replaces the
+        # ready-waits
+        if not self._begin_command(command, params, deadline):
+            return None
+        try:
+            # Verify ACK response and wait to be ready for function response.
+            ack = self._read_ready(len(_ACK), deadline)
+            if ack is None:
+                return self._no_response("call_function timeout 1")
+            self._take_ack(ack)
+            # Read response bytes, along with the status byte where possible.
+            # A corrupted response is sent again after a NACK.
+            retries = self.nack_retries
+            while True:
+                frame = self._read_ready(response_length+2+8, deadline)
+                if frame is None:
+                    return self._no_response("call_function timeout 2")
+                response = self._take_response(command, frame, copy, retries,
+                                               deadline)
+                if response is not None:
+                    break
+                retries -= 1
+        except (BusyError, RuntimeError) as error:
+            self._command_error(error)
+            raise
+        return self._end_command(params, response)
+
+    def _begin_command(self, command, params, deadline):
+        """First step of call_function: write the command unless deadline
+        has passed. Returns False if it was not sent."""
+        if _ticks_diff(deadline, _ticks_ms()) <= 0:
+            return False  # no time left, do not start a command
+        stats = self.stats
+        if stats is not None:
+            stats.begin(command)
+        if not self._send_command(command, params, deadline):
+            return False
+        if stats is not None:
+            stats.phase(PHASE_WRITE)
+        return True
+
+    def _no_response(self, message):
+        """call_function step when the ACK or response did not come in
+        time: abort the command and return None"""
+        if self.debug:
+            print(message)
+        if self.stats is not None:
+            self.stats.event(EVENT_TIMEOUT)
+        self._abort()
+        return None
+
+    def _take_ack(self, ack):
+        """call_function step: check the ACK frame"""
+        self._check_ack(ack)
+        if self.stats is not None:
+            self.stats.phase(PHASE_ACK)
+
+    def _take_response(self, command, frame, copy, retries, deadline):
+        """call_function step: return the response data in frame, or None
+        after asking for it again with a NACK when it is corrupted and
+        retries are left"""
+        try:
+            return self._check_response(command, frame, copy)
+        except RuntimeError:
+            if not retries:
+                raise
+        self._nack(deadline)
+        return None
+
+    def _command_error(self, error):
+        """call_function step: count the error about to be raised"""
+        if self.stats is not None:
+            self.stats.event(EVENT_BUSY if isinstance(error, BusyError)
+                             else EVENT_FRAME_ERROR)
+
+    def _end_command(self, params, response):
+        """Last call_function step, returns the response"""
+        stats = self.stats
+        if stats is not None:
+            stats.phase(PHASE_RESPONSE)
+            stats.transferred(len(params) + len(response))
+            stats.end()
+        return response
+
+    def enable_stats(self, max_commands=8):
+        """Start recording per command latency (write, ACK wait, response
+        wait, total) and error counters for up to max_commands command codes.
+        Returns the CommandStats, also available as the stats attribute; use
+        its dump() and reset() methods. disable_stats() stops recording.
+        """
+        self.stats = CommandStats(max_commands)
+        return self.stats
+
+    def disable_stats(self):
+        """Stop recording stats"""
+        self.stats = None
+
+    def _recover(self, deadline=None):
+        """Wake up the PN532 after a bus error with a short wake up, which
+        only waits the power up time (and not past deadline if given), the
+        caller retries the transfer while its deadline allows."""
+        if self.stats is not None:
+            self.stats.event(EVENT_WAKEUP)
+        self._wakeup(deadline, short=True)
+
+    def _write_retry(self, data, deadline=None):
+        """Write data, waking the PN532 and writing again after bus errors
+        until deadline (or once without one). Returns False if it never
+        went through."""
+        while True:
+            try:
+                self._write_data(data)
+                return True
+            except OSError:
+                self._recover(deadline)
+            if deadline is None or _ticks_diff(deadline, _ticks_ms()) <= 0:
+                return False
+
+    def _nack(self, deadline=None):
+        """Ask the PN532 to send its last response again"""
+        if self.debug:
+            print("call_function bad response, NACK")
+        if self.stats is not None:
+            self.stats.event(EVENT_NACK)
+        self._write_retry(_NACK, deadline)
+
+    def _abort(self):
+        """Stop the command the PN532 is still running (an ACK frame), so it
+        takes the next one. Bus errors are ignored, there is no time left."""
         try:
-            self._write_frame(data)
+            self._write_data(_ACK)
         except OSError:
-            self._wakeup()
+            pass
+
+    def _send_command(self, command, params, deadline=None):
+        """Write the frame for command, again after bus errors until
+        deadline. Returns False if the bus write never went through."""
+        try:
+            self._write_frame(command, params)
+        except OSError:
+            self._recover(deadline)
             if self.debug:
                 print("call_function OSError")
-            return None
-        if not self._wait_ready(timeout):
-            if self.debug:
-                print("call_function timeout 1")
-            return None
-        # Verify ACK response and wait to be ready for function response.
-        if not _ACK == self._read_data(len(_ACK)):
-            raise RuntimeError('Did not receive expected ACK from PN532!')
+            # The frame is still in the transmit buffer
+            return self._write_retry(self._tx_view[:9+len(params)], deadline)
+        return True
+
+    def _check_ack(self, ack):
+        """Raise if the data read after a command is not an ACK frame"""
+        if not _is_ack(ack):
             if self.debug:
                 print("call_function no ack")
-        if not self._wait_ready(timeout):
-            if self.debug:
-                print("call_function timeout 2")
-            return None
-        # Read response bytes.
-        response = self._read_frame(response_length+2)
+            raise RuntimeError('Did not receive expected ACK from PN532!')
+
+    def _check_response(self, command, frame, copy=False):
+        """Parse the raw response frame to command and return its data"""
+        response = self._parse_frame(frame)
         # Check that response is for the called function.
         if not (response[0] == _PN532TOHOST and response[1] == (command+1)):
             raise RuntimeError('Received unexpected command response!')
         # Return response data.
+        if copy:
+            return bytearray(response[2:])
         return response[2:]
 
     def get_firmware_version(self):
         """Call PN532 GetFirmwareVersion function and return a tuple with the IC,
-        Ver, Rev, and Support values.
+        Ver, Rev, and Support values, also kept in the firmware attribute.
         """
         if self.debug:
             print("Get firmware version")
@@ -342,44 +999,317 @@ class PN532:
             raise RuntimeError('Failed to detect the PN532')
         if self.debug:
             print("Get firmware version response:", tuple(response))
-        return tuple(response)
+        self.firmware = tuple(response)
+        return self.firmware
 
-    def SAM_configuration(self):   # pylint: disable=invalid-name
-        """Configure the PN532 to read MiFare cards."""
+    def SAM_configuration(self, sam_timeout=1, irq=True):   # pylint: disable=invalid-name
+        """Configure the PN532 to read MiFare cards. sam_timeout (seconds,
+        in steps of 50ms up to 12.75s, 0 for none) is the SAM timeout used in
+        virtual card mode and irq whether the PN532 drives its IRQ pin. With
+        irq False a wired IRQ pin is no longer used, the status is polled.
+        """
         # Send SAM configuration command with configuration for:
         # - 0x01, normal mode
-        # - 0x14, timeout 50ms * 20 = 1 second
-        # - 0x01, use IRQ pin
+        # - timeout in units of 50ms (0x14 = 1 second)
+        # - use IRQ pin or not
         # Note that no other verification is necessary as call_function will
         # check the command was executed as expected.
+        if not irq:
+            self._init_irq(None)  # the pin will not signal this response
         self.call_function(_COMMAND_SAMCONFIGURATION,
-                           params=[0x01, 0x14, 0x01])
+                           params=[_SAM_NORMAL_MODE,
+                                   _sam_timeout_units(sam_timeout),
+                                   0x01 if irq else 0x00])
+
+    def _rf_configuration(self, item, data):
+        params = bytearray(1+len(data))
+        params[0] = item
+        params[1:] = bytes(data)
+        return self.call_function(_COMMAND_RFCONFIGURATION,
+                                  params=params) is not None
+
+    def rf_field(self, on=True, auto_rfca=True):  # pylint: disable=invalid-name
+        """Switch the RF field on or off, auto_rfca enables RF collision
+        avoidance. Returns True if the PN532 accepted the setting."""
+        return self._rf_configuration(_RFCFG_FIELD, [
+            (_RF_FIELD_ON if on else 0) | (_RF_AUTO_RFCA if auto_rfca else 0)])
+
+    def rf_timings(self, atr_timeout=0.1024, timeout=0.0512):
+        """Set the ATR_RES timeout and the timeout of target answers to
+        InDataExchange/InCommunicateThru, in seconds. Returns True if the
+        PN532 accepted the setting."""
+        return self._rf_configuration(_RFCFG_TIMINGS, [
+            0x00, _rf_timeout_code(atr_timeout), _rf_timeout_code(timeout)])
+
+    def rf_max_retries(self, passive=_RF_RETRY_FOREVER,
+                       atr=_RF_RETRY_FOREVER, psl=0x01, com=0x00):
+        """Set MxRtyPassiveActivation (passive), MxRtyATR (atr), MxRtyPSL
+        (psl) and MaxRtyCOM (com), 255 retries forever. Returns True if the
+        PN532 accepted the settings."""
+        return self._rf_configuration(_RFCFG_MAX_RETRIES,
+                                      [atr, psl, passive]) and \
+            self._rf_configuration(_RFCFG_MAX_RETRY_COM, [com])
+
+    def rf_configure(self, profile):
+        """Apply an RFProfile or a named preset from RF_PROFILES ("default",
+        "fast tap", "robust"). Returns True if every setting was accepted."""
+        if isinstance(profile, str):
+            profile = RF_PROFILES[profile]
+        self.rf_profile = profile
+        return self.rf_field(profile.field, profile.auto_rfca) and \
+            self.rf_timings(profile.atr_timeout, profile.timeout) and \
+            self.rf_max_retries(profile.passive_retries, profile.atr_retries,
+                                profile.psl_retries, profile.com_retries)
 
     def read_passive_target(self, card_baud=_MIFARE_ISO14443A, timeout=1):
         """Wait for a MiFare card to be available and return its UID when found.
         Will wait up to timeout seconds and return None if no card is found,
-        otherwise a bytearray with the UID of the found card is returned.
+        otherwise a bytes object with the UID of the found card is returned.
+        """
+        targets = self.list_passive_targets(1, card_baud, timeout)
+        if not targets:
+            return None
+        return targets[0].uid
+
+    def list_passive_targets(self, max_targets=2, card_baud=_MIFARE_ISO14443A,
+                             timeout=1):
+        """Detect up to max_targets (1 or 2) cards in one InListPassiveTarget
+        exchange. Returns a list of Target (empty if no card is found) or None
+        if no response arrived within timeout seconds. The first target becomes
+        the current target for InDataExchange based methods, use in_select to
+        switch to another one.
         """
-        # Send passive read command for 1 card.  Expect at most a 7 byte UUID.
+        assert max_targets in (1, 2), 'The PN532 handles 1 or 2 targets!'
+        deadline = _deadline(timeout)
         try:
-            response = self.call_function(_COMMAND_INLISTPASSIVETARGET,
-                                          params=[0x01, card_baud],
-                                          response_length=19,
-                                          timeout=timeout)
+            response = self.call_function(
+                _COMMAND_INLISTPASSIVETARGET,
+                params=[max_targets, card_baud],
+                response_length=1+max_targets*_TARGET_RECORD_MAX,
+                deadline=deadline)
         except BusyError:
-            return None  # no card found!
+            return []  # no card found!
         # If no response is available return None to indicate no card is present.
+        # call_function already stopped the PN532 retrying.
+        if response is None:
+            return None
+        # The steps after the response are shared with pn532_async
+        targets = self._found_targets(response, max_targets, card_baud)
+        if targets:
+            self.negotiate_bitrate(targets[0], self.max_bitrate,
+                                   _remaining(deadline))
+        return targets
+
+    def _found_targets(self, response, max_targets, card_baud):
+        """list_passive_targets step: decode the targets of the
+        InListPassiveTarget response, make the first one the current target
+        and record the detect latency"""
+        target_type = _BAUD_TARGET_TYPES.get(card_baud, card_baud)
+        targets = []
+        offset = 1
+        for _ in range(min(response[0], max_targets)):
+            length = _target_length(target_type, response, offset)
+            targets.append(_decode_target(
+                target_type, response[offset:offset+length]))
+            offset += length
+        if targets:
+            self._target = targets[0].tg
+            self._set_bitrate(_BITRATES[0], _BITRATES[0])
+        if self.stats is not None:
+            self.stats.sample(LATENCY_DETECT if targets else LATENCY_NO_CARD,
+                              self.stats.last_us)
+        return targets
+
+    def _set_bitrate(self, to_target, from_target):
+        self.bitrate = (to_target, from_target)
+        if self.stats is not None:
+            self.stats.bitrate = self.bitrate
+
+    def in_psl(self, tg, to_target, from_target, timeout=1):
+        """Change the bit rates (106, 212, 424 or 848 kbps) of target tg with
+        InPSL (PPS for ISO14443-4 cards). Returns True on success; on failure
+        both sides keep the previous rates.
+        """
+        response = self.call_function(
+            _COMMAND_INPSL, params=[tg, _BITRATES.index(to_target),
+                                    _BITRATES.index(from_target)],
+            response_length=1, timeout=timeout)
+        return self._psl_done(response, to_target, from_target)
+
+    def _psl_done(self, response, to_target, from_target):
+        """in_psl step: True, and the new rates kept, if InPSL succeeded"""
+        if response is None or response[0] != 0x00:
+            return False
+        self._set_bitrate(to_target, from_target)
+        return True
+
+    def negotiate_bitrate(self, target, max_kbps=424, timeout=1):
+        """Switch an ISO14443-4 target from list_passive_targets to the
+        fastest bit rates up to max_kbps that its ATS allows, falling back to
+        slower ones when InPSL fails, all within timeout seconds. Returns the
+        (to the target, from the target) rates in kbps, also kept in bitrate
+        and the stats.
+        """
+        deadline = _deadline(timeout)
+        for to_target, from_target in _bitrate_attempts(target, max_kbps):
+            if self.in_psl(target.tg, to_target, from_target,
+                           _remaining(deadline)):
+                break
+        return self.bitrate
+
+    def in_select(self, tg, timeout=1):
+        """Select target tg (from list_passive_targets) and make it the current
+        target for InDataExchange based methods. Returns True on success.
+        """
+        response = self.call_function(_COMMAND_INSELECT,
+                                      params=[tg],
+                                      response_length=1, timeout=timeout)
+        if response is None or response[0] != 0x00:
+            return False
+        self._target = tg
+        return True
+
+    def in_deselect(self, tg=0, timeout=1):
+        """Deselect target tg, keeping it known to the PN532 so it can be
+        selected again with in_select. tg 0 deselects all targets. Returns True
+        on success.
+        """
+        response = self.call_function(_COMMAND_INDESELECT,
+                                      params=[tg],
+                                      response_length=1, timeout=timeout)
+        return response is not None and response[0] == 0x00
+
+    def in_release(self, tg=0, timeout=1):
+        """Release target tg (tg 0 releases all targets): ISO14443-4 cards get
+        a DESELECT and the PN532 forgets the target, a new card needs
+        list_passive_targets. Returns True on success.
+        """
+        response = self.call_function(_COMMAND_INRELEASE,
+                                      params=[tg],
+                                      response_length=1, timeout=timeout)
+        return response is not None and response[0] == 0x00
+
+    def diagnose_attention(self, timeout=1):
+        """Check the current target still answers with the Diagnose attention
+        request test (ISO14443-4 presence check, DEP targets). Returns True if
+        the target answered, False if it did not and None if the PN532 gave
+        no response.
+        """
+        response = self.call_function(_COMMAND_DIAGNOSE,
+                                      params=[_DIAGNOSE_ATTENTION],
+                                      response_length=1, timeout=timeout)
+        if response is None:
+            return None
+        return response[0] == 0x00
+
+    def auto_poll(self, types=(AUTOPOLL_GENERIC_106, AUTOPOLL_FELICA_212,
+                               AUTOPOLL_JEWEL), period=1, count=1, timeout=None):
+        """Let the PN532 poll for targets on its own using InAutoPoll. Types is
+        a sequence of AUTOPOLL_* target types, period the time between polls in
+        units of 150ms (1 to 15) and count the number of polling rounds (1 to
+        254, or 255 to poll until a target is found). Returns a list of Target
+        (empty if nothing was found), or None if no response arrived within
+        timeout seconds. The default timeout covers all requested rounds.
+        """
+        assert 0 < len(types) <= 15, 'Between 1 and 15 target types allowed!'
+        assert 0 < period <= 15, 'Period must be 1 to 15 (x 150ms)!'
+        assert 0 < count <= _AUTOPOLL_ENDLESS, 'Count must be 1 to 255!'
+        if timeout is None:
+            timeout = (count * len(types) * period * _AUTOPOLL_PERIOD_UNIT) + 1
+        params = bytearray(2+len(types))
+        params[0] = count
+        params[1] = period
+        params[2:] = bytes(types)
+        response = self.call_function(_COMMAND_INAUTOPOLL,
+                                      params=params,
+                                      response_length=64,
+                                      timeout=timeout)
+        # call_function aborted a poll still running on the PN532
         if response is None:
             return None
-        # Check only 1 card with up to a 7 byte UID is present.
-        if response[0] != 0x01:
-            raise RuntimeError('More than one card detected!')
-        if response[5] > 7:
-            raise RuntimeError('Found card with unexpectedly long UID!')
-        # Return UID of card.
-        return response[6:6+response[5]]
-
-    def mifare_classic_authenticate_block(self, uid, block_number, key_number, key):   # pylint: disable=invalid-name
+        return _parse_autopoll(response)
+
+    def wait_for_card(self, types=(AUTOPOLL_GENERIC_106, AUTOPOLL_FELICA_212,
+                                   AUTOPOLL_JEWEL), period=1, timeout=1):
+        """Wait up to timeout seconds for any card of the given AUTOPOLL_*
+        types while the PN532 polls by itself, every period x 150ms. The host
+        only waits for the PN532 to signal ready (IRQ when wired), so there is
+        no bus traffic per poll. Returns the first Target found or None.
+        """
+        targets = self.auto_poll(types, period, _AUTOPOLL_ENDLESS, timeout)
+        if not targets:
+            return None
+        return targets[0]
+
+    def auto_poll_start(self, types=(AUTOPOLL_GENERIC_106,
+                                     AUTOPOLL_FELICA_212, AUTOPOLL_JEWEL),
+                        period=1):
+        """Start an endless InAutoPoll and return once the PN532 has ACKed it,
+        so the host can sleep until IRQ signals a target. Collect the targets
+        with auto_poll_result, stop polling with auto_poll_stop. Returns True
+        if the poll started.
+        """
+        assert 0 < len(types) <= 15, 'Between 1 and 15 target types allowed!'
+        assert 0 < period <= 15, 'Period must be 1 to 15 (x 150ms)!'
+        params = bytearray(2+len(types))
+        params[0] = _AUTOPOLL_ENDLESS
+        params[1] = period
+        params[2:] = bytes(types)
+        deadline = _deadline(1)
+        if not self._send_command(_COMMAND_INAUTOPOLL, params, deadline):
+            return False
+        ack = self._read_ready(len(_ACK), deadline)
+        if ack is None:
+            return False
+        self._check_ack(ack)
+        return True
+
+    def auto_poll_result(self, timeout=0):
+        """Targets found by the poll started with auto_poll_start, waiting up
+        to timeout seconds (0 checks once). Returns a list of Target or None if
+        nothing was found yet, also after a bus error (the PN532 is woken up
+        again and keeps polling)."""
+        if timeout:
+            response = self._read_ready(64+2+8, _deadline(timeout))
+        elif self._irq_pending():
+            try:
+                response = self._poll_ready(64+2+8)
+            except OSError:
+                self._recover()
+                return None
+        else:
+            response = None
+        if response is None:
+            return None
+        return _parse_autopoll(self._check_response(_COMMAND_INAUTOPOLL,
+                                                    response))
+
+    def auto_poll_stop(self, timeout=1):
+        """Stop a poll started with auto_poll_start, writing the ACK again
+        after bus errors for up to timeout seconds. Returns False if it
+        never went through."""
+        return self._write_retry(_ACK, _deadline(timeout))
+
+    def power_down(self, wake=POWERDOWN_WAKE_I2C | POWERDOWN_WAKE_SPI |
+                   POWERDOWN_WAKE_HSU | POWERDOWN_WAKE_RF, irq=True):
+        """Put the PN532 in power down (RF field off, a few uA) until one of
+        the POWERDOWN_WAKE_* sources in wake fires: host bus traffic, or an
+        external RF field with POWERDOWN_WAKE_RF. Passive cards do not make a
+        field and are only found by polling. With irq the IRQ pin signals a
+        wake up not caused by the host. Returns True if the PN532 went down,
+        use power_up before the next command.
+        """
+        response = self.call_function(_COMMAND_POWERDOWN,
+                                      params=[wake, 0x01 if irq else 0x00],
+                                      response_length=1)
+        return response is not None and response[0] & 0x3F == 0x00
+
+    def power_up(self):
+        """Wake the PN532 after power_down"""
+        self._wakeup()
+
+    def mifare_classic_authenticate_block(self, uid, block_number, key_number, key,   # pylint: disable=invalid-name
+                                          timeout=1):
         """Authenticate specified block number for a MiFare classic card.  Uid
         should be a byte array with the UID of the card, block number should be
         the block to authenticate, key number should be the key type (like
@@ -391,7 +1321,7 @@ class PN532:
         uidlen = len(uid)
         keylen = len(key)
         params = bytearray(3+uidlen+keylen)
-        params[0] = 0x01  # Max card numbers
+        params[0] = self._target
         params[1] = key_number & 0xFF
         params[2] = block_number & 0xFF
         params[3:3+keylen] = key
@@ -399,27 +1329,31 @@ class PN532:
         # Send InDataExchange request and verify response is 0x00.
         response = self.call_function(_COMMAND_INDATAEXCHANGE,
                                       params=params,
-                                      response_length=1)
-        return response[0] == 0x00
+                                      response_length=1, timeout=timeout)
+        return response is not None and response[0] == 0x00
 
-    def mifare_classic_read_block(self, block_number):
+    def mifare_classic_read_block(self, block_number, into=None, timeout=1):
         """Read a block of data from the card.  Block number should be the block
         to read.  If the block is successfully read a bytearray of length 16 with
         data starting at the specified block will be returned.  If the block is
-        not read then None will be returned.
+        not read then None will be returned. With into (a writable buffer of at
+        least 16 bytes) the data is copied there and into is returned instead.
         """
         # Send InDataExchange request to read block of MiFare data.
         response = self.call_function(_COMMAND_INDATAEXCHANGE,
-                                      params=[0x01, MIFARE_CMD_READ,
+                                      params=[self._target, MIFARE_CMD_READ,
                                               block_number & 0xFF],
-                                      response_length=17)
+                                      response_length=17, timeout=timeout)
         # Check first response is 0x00 to show success.
-        if response[0] != 0x00:
+        if response is None or response[0] != 0x00:
             return None
-        # Return first 4 bytes since 16 bytes are always returned.
-        return response[1:]
+        # Return a copy of the 16 bytes, the response is in the receive buffer.
+        if into is not None:
+            into[0:16] = response[1:17]
+            return into
+        return bytearray(response[1:])
 
-    def mifare_classic_write_block(self, block_number, data):
+    def mifare_classic_write_block(self, block_number, data, timeout=1):
         """Write a block of data to the card.  Block number should be the block
         to write and data should be a byte array of length 16 with the data to
         write.  If the data is successfully written then True is returned,
@@ -429,17 +1363,17 @@ class PN532:
             data) == 16, 'Data must be an array of 16 bytes!'
         # Build parameters for InDataExchange command to do MiFare classic write.
         params = bytearray(19)
-        params[0] = 0x01  # Max card numbers
+        params[0] = self._target
         params[1] = MIFARE_CMD_WRITE
         params[2] = block_number & 0xFF
         params[3:] = data
         # Send InDataExchange request.
         response = self.call_function(_COMMAND_INDATAEXCHANGE,
                                       params=params,
-                                      response_length=1)
-        return response[0] == 0x0
+                                      response_length=1, timeout=timeout)
+        return response is not None and response[0] == 0x0
 
-    def ntag2xx_write_block(self, block_number, data):
+    def ntag2xx_write_block(self, block_number, data, timeout=1):
         """Write a block of data to the card.  Block number should be the block
         to write and data should be a byte array of length 4 with the data to
         write.  If the data is successfully written then True is returned,
@@ -449,20 +1383,288 @@ class PN532:
             data) == 4, 'Data must be an array of 4 bytes!'
         # Build parameters for InDataExchange command to do NTAG203 classic write.
         params = bytearray(3+len(data))
-        params[0] = 0x01  # Max card numbers
+        params[0] = self._target
         params[1] = MIFARE_ULTRALIGHT_CMD_WRITE
         params[2] = block_number & 0xFF
         params[3:] = data
         # Send InDataExchange request.
         response = self.call_function(_COMMAND_INDATAEXCHANGE,
                                       params=params,
-                                      response_length=1)
-        return response[0] == 0x00
+                                      response_length=1, timeout=timeout)
+        return response is not None and response[0] == 0x00
 
-    def ntag2xx_read_block(self, block_number):
+    def ntag2xx_read_block(self, block_number, timeout=1):
         """Read a block of data from the card.  Block number should be the block
         to read.  If the block is successfully read a bytearray of length 16 with
         data starting at the specified block will be returned.  If the block is
         not read then None will be returned.
         """
-        return self.mifare_classic_read_block(block_number)[0:4]  # only 4 bytes per page
+        block = self.mifare_classic_read_block(block_number, timeout=timeout)
+        if block is None:
+            return None
+        return block[0:4]  # only 4 bytes per page
+
+    def ntag2xx_read_range(self, start_page, end_page, timeout=1):
+        """Read pages start_page to end_page (inclusive) of an NTAG2xx card and
+        return them as one contiguous bytearray, or None if the read failed or
+        took longer than timeout seconds.
+        Uses FAST_READ through InCommunicateThru, split to fit the PN532 frame
+        size, and falls back to 4 page READs for tags without FAST_READ.
+        """
+        assert 0 <= start_page <= end_page <= 0xFF, 'Invalid page range!'
+        deadline = _deadline(timeout)
+        data = bytearray(4 * (end_page - start_page + 1))
+        page = start_page
+        while page <= end_page:
+            last = min(end_page, page + _NTAG_FAST_READ_MAX_PAGES - 1)
+            count = 4 * (last - page + 1)
+            response = self.call_function(_COMMAND_INCOMMUNICATETHRU,
+                                          params=[NTAG2XX_CMD_FAST_READ,
+                                                  page, last],
+                                          response_length=1+count,
+                                          deadline=deadline)
+            if response is None or response[0] != 0x00 or \
+                    len(response) != 1 + count:
+                break
+            offset = 4 * (page - start_page)
+            data[offset:offset+count] = response[1:]
+            page = last + 1
+        else:
+            return data
+        # FAST_READ not supported, a NAK leaves the tag idle so select it
+        # again and continue with READ (16 bytes = 4 pages per exchange).
+        if self.debug:
+            print("FAST_READ failed at page", page, "using READ")
+        self.in_select(self._target, _remaining(deadline))
+        while page <= end_page:
+            block = self.mifare_classic_read_block(
+                page, timeout=_remaining(deadline))
+            if block is None:
+                return None
+            offset = 4 * (page - start_page)
+            count = min(16, len(data) - offset)
+            data[offset:offset+count] = block[0:count]
+            page += 4
+        return data
+
+    def ntag2xx_read_ndef(self, first_pages=_NTAG_NDEF_FIRST_PAGES, timeout=1):
+        """Read the NDEF message of an NTAG2xx (NFC Forum Type 2) card,
+        fetching only the pages it occupies. The capability container and
+        the next first_pages - 1 pages come in the first exchange, then the
+        TLVs (NULL, Lock Control, Memory Control, NDEF, Terminator, 1 or 3
+        byte lengths) are walked and the rest of the NDEF TLV is read in one
+        go. Returns a memoryview of the message, or None if the read failed,
+        took longer than timeout seconds or the tag holds no NDEF message.
+        """
+        deadline = _deadline(timeout)
+        # buf holds the tag memory from the CC page on
+        buf = self.ntag2xx_read_range(_NTAG_CC_PAGE,
+                                      _NTAG_CC_PAGE + first_pages - 1, timeout)
+        if buf is None or buf[0] != _NTAG_CC_MAGIC:
+            return None
+        # Byte offsets in buf, the data area follows the CC
+        limit = 4 + 8 * buf[2]
+
+        def load(end):
+            # Make buf cover offsets below end, reading whole pages
+            if end > limit:
+                return False
+            if end > len(buf):
+                more = self.ntag2xx_read_range(
+                    _NTAG_CC_PAGE + len(buf) // 4,
+                    _NTAG_CC_PAGE + (end + 3) // 4 - 1, _remaining(deadline))
+                if more is None:
+                    return False
+                buf.extend(more)
+            return True
+
+        # Lock Control, Memory Control and proprietary TLVs are skipped
+        for _, tlv, offset, length in _ndef_tlvs(buf, 4, limit, load):
+            if tlv == TLV_NDEF:
+                if not load(offset + length):
+                    return None
+                return memoryview(buf)[offset:offset + length]
+        return None
+
+    def ntag2xx_write_ndef(self, uid, message, timeout=2):
+        """Write NDEF message (bytes) to the NTAG2xx card uid, rewriting only
+        the pages that change. The current data area is read in one go (the
+        UID in pages 0-2 must match uid, all 7 bytes). When more than one page
+        changes the NDEF TLV type is first replaced by a Terminator and the
+        page holding it is written last, so a tag pulled away mid-write holds
+        no or the old message, never a mix. Lock/Memory Control TLVs before
+        the NDEF TLV are kept. The result is checked with one ranged read.
+        Returns (pages written, elapsed ms) or None on failure, also when it
+        takes longer than timeout seconds (the tag then holds no message or
+        the old one). Raises ValueError if message does not fit the tag.
+        """
+        start = _ticks_ms()
+        deadline = _deadline(timeout)
+        length = len(message)
+        header = 2 if length < 0xFF else 4
+        # NDEF TLV and Terminator, plus room for Lock/Memory Control TLVs
+        room = header + length + 1
+        needed = room + 16
+        # UID, CC and the start of the data area, within any Type 2 tag
+        old = self.ntag2xx_read_range(
+            0, min(_NTAG_CC_PAGE + (needed + 3) // 4, _NTAG_MIN_LAST_PAGE),
+            timeout)
+        if old is None or old[12] != _NTAG_CC_MAGIC:
+            return None
+        if len(uid) != 7 or old[0:3] != uid[0:3] or old[4:8] != uid[3:7]:
+            return None
+        limit = 16 + 8 * old[14]  # end of the data area
+        if 16 + room > limit:
+            raise ValueError('NDEF message does not fit the tag')
+
+        def load(end):
+            # Make old cover offsets below end, reading ahead to the bytes
+            # the new message needs but never past the data area
+            if end > limit:
+                return False
+            if end > len(old):
+                more = self.ntag2xx_read_range(
+                    len(old) // 4, (min(max(end, 16 + needed), limit) - 1) // 4,
+                    _remaining(deadline))
+                if more is None:
+                    return False
+                old.extend(more)
+            return True
+
+        # The NDEF TLV goes where the old one or the Terminator is, or at the
+        # first run of NULL TLVs long enough (blank tags are all NULLs)
+        tlv = limit
+        for offset, kind, _, run in _ndef_tlvs(old, 16, limit, load, room):
+            if kind is None:
+                return None
+            if kind in (TLV_NDEF, TLV_TERMINATOR) or (
+                    kind == TLV_NULL and (run >= room or offset + run >= limit)):
+                tlv = offset
+                break
+        end = tlv + room
+        if end > limit:
+            raise ValueError('NDEF message does not fit the tag')
+        if not load(end):
+            return None
+        # New image of the pages from the NDEF TLV to the Terminator
+        first = tlv // 4
+        last = (end - 1) // 4
+        new = bytearray(old[4*first:4*last+4])
+        base = 4 * first
+        offset = tlv - base
+        new[offset] = TLV_NDEF
+        if header == 2:
+            new[offset + 1] = length
+        else:
+            new[offset + 1] = 0xFF
+            new[offset + 2] = length >> 8
+            new[offset + 3] = length & 0xFF
+        new[offset + header:offset + header + length] = message
+        new[offset + header + length] = TLV_TERMINATOR
+        # The first page, holding the TLV type byte, is written last. While
+        # the other pages change a Terminator in place of the type hides the
+        # message, wherever the 1 or 3 length bytes fall.
+        written = 0
+
+        def write(page, data):
+            if not self.ntag2xx_write_block(page, data, _remaining(deadline)):
+                return False
+            old[4*page:4*page+4] = data
+            return True
+
+        changed = [page for page in range(first, last + 1)
+                   if old[4*page:4*page+4] != new[4*(page-first):4*(page-first)+4]]
+        # A single page write is atomic, more need the message hidden first
+        if len(changed) > 1:
+            empty = bytearray(old[4*first:4*first+4])
+            empty[offset] = TLV_TERMINATOR
+            if old[4*first:4*first+4] != empty:
+                if not write(first, empty):
+                    return None
+                written += 1
+        for page in [page for page in changed if page != first] + [first]:
+            data = new[4*(page-first):4*(page-first)+4]
+            if old[4*page:4*page+4] != data:
+                if not write(page, data):
+                    return None
+                written += 1
+        check = self.ntag2xx_read_range(first, last, _remaining(deadline))
+        if check != new:
+            return None
+        return written, _ticks_diff(_ticks_ms(), start)
+
+    def _apdu_chunk(self, params, deadline):
+        """One InDataExchange of APDU chaining, returns the response (status
+        then data) or raises RuntimeError"""
+        response = self.call_function(_COMMAND_INDATAEXCHANGE,
+                                      params=params,
+                                      response_length=1+_APDU_IN_CHUNK,
+                                      deadline=deadline)
+        if response is None:
+            raise RuntimeError('No response to InDataExchange!')
+        if response[0] & _DATA_EXCHANGE_ERROR:
+            raise RuntimeError('InDataExchange error 0x{:02x}'.format(
+                response[0] & _DATA_EXCHANGE_ERROR))
+        return response
+
+    def _apdu_responses(self, apdu, timeout):
+        """Send apdu to the current target, chained over InDataExchange
+        commands with the MI bit, then yield each chunk of the response as it
+        arrives (a memoryview valid until the next command). All the exchanges
+        share one timeout seconds deadline, set on the first one."""
+        deadline = _deadline(timeout)
+        length = len(apdu)
+        apdu = memoryview(apdu)
+        params = bytearray(1 + min(length, _APDU_OUT_CHUNK))
+        view = memoryview(params)
+        sent = 0
+        while True:
+            count = min(length - sent, _APDU_OUT_CHUNK)
+            more = sent + count < length
+            params[0] = self._target | (_DATA_EXCHANGE_MI if more else 0)
+            view[1:1+count] = apdu[sent:sent+count]
+            sent += count
+            response = self._apdu_chunk(view[:1+count], deadline)
+            if not more:
+                break
+        while True:
+            yield response[1:]
+            if not response[0] & _DATA_EXCHANGE_MI:
+                return
+            # Ask the PN532 for the next part of the response
+            params[0] = self._target
+            response = self._apdu_chunk(view[:1], deadline)
+
+    def apdu_exchange(self, apdu, into=None, timeout=1):
+        """Send a command APDU of any length to the current ISO14443-4 target
+        and return the whole response APDU (data then SW1 SW2). Data that does
+        not fit one frame is chained both ways with the InDataExchange MI bit,
+        the PN532 handles the chaining on the RF side. The response goes into
+        into when given (a memoryview of it is returned), otherwise in a new
+        bytearray. Raises RuntimeError if the target does not answer or the
+        whole exchange takes longer than timeout seconds.
+        """
+        if into is None:
+            result = bytearray()
+            for chunk in self._apdu_responses(apdu, timeout):
+                result += chunk
+            return result
+        result = memoryview(into)
+        length = 0
+        for chunk in self._apdu_responses(apdu, timeout):
+            if length + len(chunk) > len(result):
+                raise ValueError('Response does not fit into!')
+            result[length:length+len(chunk)] = chunk
+            length += len(chunk)
+        return result[:length]
+
+    def apdu_stream(self, apdu, into, timeout=1):
+        """Generator form of apdu_exchange for responses larger than RAM
+        allows: every chunk of the response is copied to the start of into (a
+        buffer of at least 252 bytes) and its length yielded, to be consumed
+        before the next iteration. The last chunk ends with SW1 SW2.
+        """
+        assert len(into) >= _APDU_IN_CHUNK, 'into must hold 252 bytes!'
+        for chunk in self._apdu_responses(apdu, timeout):
+            into[0:len(chunk)] = chunk
+            yield len(chunk)
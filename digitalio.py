@@ -13,7 +13,11 @@ DigitalIO for ESP32 over SPI.
 https://github.com/adafruit/Adafruit_Blinka/blob/master/src/adafruit_blinka/microcontroller/bcm283x/pin.py
 https://github.com/adafruit/Adafruit_Blinka/blob/master/src/digitalio.py
 """
-from micropython import const
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
 
 
 class Pin:
@@ -5,8 +5,10 @@ import ssd1306
 # Author: Tony DiCola
 # pn_532_i2c wrapper updated by David Somerville to work with Micropython
 import pn532_i2c
+from pn532_cache import TagCache
+from pn532_session import TargetSession
+import ndef
 import time
-from micropython import const
 import network
 import gc
 # MicroWebCli is a micro HTTP Web client for MicroPython see https://github.com/jczic/MicroWebCli
@@ -14,15 +16,29 @@ from microWebCli import MicroWebCli
 
 ALEXA_LAMP_URL = "http://192.168.1.115:1880/alexa"
 
-NDEF_URIPREFIX_HTTP_WWWDOT = const(0x01)
-NDEF_URIPREFIX_HTTPS_WWWDOT = const(0x02)
-NDEF_URIPREFIX_HTTP = const(0x03)
-NDEF_URIPREFIX_HTTPS = const(0x04)
 
-TLV_START = const(0x00)
-TLV_TYPE_NDEF = const(0x03)
-NDEF_HEADER_WELL_KNOWN_TYPE = const(0xd1)
-NDEF_PAYLOAD_TYPE_URI = const(0x55)
+def read_url(pn532):
+    # Read the NDEF message on the card (only the pages it uses), returns the
+    # URL of its first URI or Smart Poster record, "" if there is none or None
+    # if the read failed
+    try:
+        ndefData = pn532.ntag2xx_read_ndef()
+    except:
+        ndefData = None
+    if ndefData is None:
+        print("Failed NDEF read")
+        return None
+    try:
+        for record in ndef.records(ndefData):
+            poster = record.smart_poster()
+            if poster is not None:
+                record = next(poster)
+            sURL = record.uri()
+            if sURL:
+                return sURL
+    except (ValueError, StopIteration):
+        print("Bad NDEF message")
+    return ""
 
 
 # Set up I2C buss and scan for devices
@@ -46,14 +62,21 @@ oled.text('Starting....', 0, 10)
 oled.show()
 
 # Try running pn532 RFID code
-#  Initalize the PN532 object, use the GPIO pin(5) to reset the PN532 on each run
-pn532 = pn532_i2c.PN532_I2C(i2c, debug=False, reset=5)
-ic, ver, rev, support = pn532.get_firmware_version()
+#  Initalize the PN532 object, use the GPIO pin(5) to reset the PN532 on each run.
+#  Fast start probes the PN532 instead of sleeping, and configures the SAM for
+#  MiFare type cards as well
+pn532 = pn532_i2c.PN532_I2C(i2c, debug=False, reset=5, fast=True, sam=True)
+ic, ver, rev, support = pn532.firmware
 print("Found PN532 with firmware version: {0}.{1}".format(ver, rev))
-# Set up configuration for MiFare type cards
-pn532.SAM_configuration()
+print("PN532 start up (ms):", pn532.boot_times)
+# Report "no card" after a few ms instead of waiting for the read timeout
+pn532.rf_configure("fast tap")
+# Parsed URLs of recently seen tags, 2KB of RAM at most
+tag_cache = TagCache(budget=2048)
+# Keeps a card selected while it stays on the reader, a presence check costs
+# a fraction of a new poll so it can run more often
+session = TargetSession(pn532)
 
-time.sleep_ms(1000)
 # Setup network connection
 sta_if = network.WLAN(network.STA_IF)
 if not sta_if.isconnected():
@@ -73,33 +96,35 @@ oled.show()
 gc.collect()
 
 # Start listening for a card
-time.sleep_ms(3000)
 print("Waiting for RFID/NFC card...")
 gc.collect()
-last_uid = None
 bToggle = True
 while True:
-    time.sleep_ms(300)
-    oled.fill(0)
-    if bToggle:
-        oled.text("* Wait for NFC *", 0, 10)
-        bToggle = False
+    if session.target is not None:
+        # Card on the reader, notice it leaving quickly
+        time.sleep_ms(100)
     else:
-        bToggle = True
-    oled.show()
+        time.sleep_ms(300)
+        oled.fill(0)
+        if bToggle:
+            oled.text("* Wait for NFC *", 0, 10)
+            bToggle = False
+        else:
+            bToggle = True
+        oled.show()
     try:
-        # Check if a card is available to read
-        uid = pn532.read_passive_target(timeout=0.2)
+        # Check the card is still there, or if a new one is available to read
+        target = session.poll(timeout=0.2)
         print(".", end="")
         # Try again if no card is available
-        if uid is None:
-            last_uid = None
+        if target is None:
             oled.fill(0)
             oled.show()
             continue
-        if last_uid == uid:
+        if not session.new:
             pass
         else:
+            uid = target.uid
             gc.collect()
             # Process new RFID card
             oled.fill(0)
@@ -117,53 +142,28 @@ while True:
             # For NCF cards pull data to check for NDEF record
             # print("len(uid):", len(uid))
             if len(uid) == 7:
-                # # Get first 176 bytes of data on the card
-                try:
-                    cardData = pn532.mifare_classic_read_block(0)
-                    for blockNumber in range(3, 43, 4):
-                        cardData += pn532.mifare_classic_read_block(
-                            blockNumber)
-                except:
-                    print("Failed block read")
-                    pass
+                # Known tags only cost a short read to check they are unchanged
+                sURL = tag_cache.read(pn532, uid, read_url)
                 print("Found card with UID:", [hex(i) for i in uid], uid)
-                #  If card has a NDEF URL data
-                #  First check card has a TLV block
-                if (cardData[19] == TLV_START and cardData[20] == TLV_TYPE_NDEF):
-                    # Check TLV block has a NDEF record
-                    if (cardData[22] == NDEF_HEADER_WELL_KNOWN_TYPE and cardData[23] == 0x01):
-                        # Check if data is URI
-                        if (cardData[25] == NDEF_PAYLOAD_TYPE_URI):
-                            # Get URI length
-                            uriLength = cardData[24]
-                            # Add the URL prefix
-                            if cardData[26] == NDEF_URIPREFIX_HTTP_WWWDOT:
-                                sURL = "http://www."
-                            if cardData[26] == NDEF_URIPREFIX_HTTPS_WWWDOT:
-                                sURL = "https://www."
-                            if cardData[26] == NDEF_URIPREFIX_HTTP:
-                                sURL = "http://"
-                            if cardData[26] == NDEF_URIPREFIX_HTTPS:
-                                sURL = "https://"
-                            sURL += (cardData[27: uriLength -
-                                              1 + 27]).decode('utf-8')
-                            oled.text(sURL, 0, 20)
-                            oled.show()
-                            #  Call the URL
-                            try:
-                                print("Calling: ", sURL)
-                                resp1 = MicroWebCli.GETRequest(
-                                    sURL, connTimeoutSec=3)
-                                # oled.text("Success!", 0, 30)
-                                # oled.show()
-                            except:
-                                print("http get failed")
-                                # oled.text("URL Failed!", 0, 30)
-                                # oled.show()
+                print("Tag cache hits:", tag_cache.hits,
+                      "misses:", tag_cache.misses)
+                if sURL:
+                    oled.text(sURL, 0, 20)
+                    oled.show()
+                    #  Call the URL
+                    try:
+                        print("Calling: ", sURL)
+                        resp1 = MicroWebCli.GETRequest(
+                            sURL, connTimeoutSec=3)
+                        # oled.text("Success!", 0, 30)
+                        # oled.show()
+                    except:
+                        print("http get failed")
+                        # oled.text("URL Failed!", 0, 30)
+                        # oled.show()
             else:
                 print()
                 print("Found card with UID:", [hex(i) for i in uid])
-        last_uid = uid
     except:
         print("Something failed")
         pass
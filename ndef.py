@@ -0,0 +1,352 @@
+"""
+``ndef``
+====================================================
+
+NDEF message parsing and encoding. records() walks a message held in any
+buffer and yields its records lazily. A record only remembers where its
+type, ID and payload are in the message, they are memoryviews into it when
+used so nothing is copied (except the payload of chunked records, which has
+to be joined). MessageWriter encodes records straight into a caller
+supplied buffer.
+
+URI (with all 36 abbreviations), Text, Smart Poster and MIME records have
+helpers, any other record is available raw.
+"""
+
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+
+# pylint: disable=bad-whitespace
+# Record header flags
+FLAG_MB = const(0x80)  # message begin
+FLAG_ME = const(0x40)  # message end
+FLAG_CF = const(0x20)  # chunk flag
+FLAG_SR = const(0x10)  # short record, 1 byte payload length
+FLAG_IL = const(0x08)  # ID length present
+_TNF_MASK = const(0x07)
+
+# Type name formats
+TNF_EMPTY = const(0x00)
+TNF_WELL_KNOWN = const(0x01)
+TNF_MEDIA = const(0x02)
+TNF_ABSOLUTE_URI = const(0x03)
+TNF_EXTERNAL = const(0x04)
+TNF_UNKNOWN = const(0x05)
+TNF_UNCHANGED = const(0x06)
+
+# Well known record types
+RTD_URI = b'U'
+RTD_TEXT = b'T'
+RTD_SMART_POSTER = b'Sp'
+
+# Text record status byte: UTF-16 flag and language code length
+_TEXT_UTF16 = const(0x80)
+_TEXT_LANG_MASK = const(0x3F)
+
+# URI identifier codes, NDEF_URIPREFIX_* in adafruit_pn532 index this
+URI_PREFIXES = (
+    "", "http://www.", "https://www.", "http://", "https://", "tel:",
+    "mailto:", "ftp://anonymous:anonymous@", "ftp://ftp.", "ftps://",
+    "sftp://", "smb://", "nfs://", "ftp://", "dav://", "news:", "telnet://",
+    "imap:", "rtsp://", "urn:", "pop:", "sip:", "sips:", "tftp:", "btspp://",
+    "btl2cap://", "btgoep://", "tcpobex://", "irdaobex://", "file://",
+    "urn:epc:id:", "urn:epc:tag:", "urn:epc:pat:", "urn:epc:raw:", "urn:epc:",
+    "urn:nfc:",
+)
+
+
+class Record:
+    """One NDEF record, a window on the message. type, id and payload are
+    memoryviews into the message made when first asked for (payload is a
+    bytearray for a record joined from chunks)."""
+
+    def __init__(self, flags, view, type_start, id_start, payload_start,
+                 payload_end, joined=None):
+        self.flags = flags
+        self.tnf = flags & _TNF_MASK
+        self._view = view
+        self._type_start = type_start
+        self._id_start = id_start
+        self._payload_start = payload_start
+        self._payload_end = payload_end
+        self._joined = joined
+
+    def __repr__(self):
+        return "Record(tnf={}, type={}, {} byte payload)".format(
+            self.tnf, bytes(self.type), len(self.payload))
+
+    @property
+    def type(self):
+        """Record type"""
+        return self._view[self._type_start:self._id_start]
+
+    @property
+    def id(self):  # pylint: disable=invalid-name
+        """Record ID, empty without the IL flag"""
+        return self._view[self._id_start:self._payload_start]
+
+    @property
+    def payload(self):
+        """Record payload"""
+        if self._joined is not None:
+            return self._joined
+        return self._view[self._payload_start:self._payload_end]
+
+    def _payload_window(self):
+        """(buffer, start, end) of the payload without making a view"""
+        if self._joined is not None:
+            return self._joined, 0, len(self._joined)
+        return self._view, self._payload_start, self._payload_end
+
+    def is_type(self, tnf, record_type):
+        """True if the record has type name format tnf and type record_type"""
+        if self.tnf != tnf or \
+                self._id_start - self._type_start != len(record_type):
+            return False
+        view, start = self._view, self._type_start
+        for i, byte in enumerate(record_type):
+            if view[start + i] != byte:
+                return False
+        return True
+
+    def uri(self):
+        """The URI of a URI record with its prefix expanded, or the type of
+        an absolute URI record. None for other records."""
+        if self.tnf == TNF_ABSOLUTE_URI:
+            return str(self.type, 'utf-8')
+        if not self.is_type(TNF_WELL_KNOWN, RTD_URI):
+            return None
+        buf, start, end = self._payload_window()
+        if start == end:
+            return None
+        code = buf[start]
+        prefix = URI_PREFIXES[code] if code < len(URI_PREFIXES) else ""
+        return prefix + str(memoryview(buf)[start + 1:end], 'utf-8')
+
+    def text(self):
+        """(language, text) of a Text record, None for other records"""
+        if not self.is_type(TNF_WELL_KNOWN, RTD_TEXT):
+            return None
+        buf, start, end = self._payload_window()
+        if start == end:
+            return None
+        status = buf[start]
+        text_start = start + 1 + (status & _TEXT_LANG_MASK)
+        view = memoryview(buf)
+        language = str(view[start + 1:text_start], 'ascii')
+        if status & _TEXT_UTF16:
+            return language, _decode_utf16(view[text_start:end])
+        return language, str(view[text_start:end], 'utf-8')
+
+    def mime_type(self):
+        """The content type of a MIME record, None for other records"""
+        if self.tnf != TNF_MEDIA:
+            return None
+        return str(self.type, 'ascii')
+
+    def smart_poster(self):
+        """Records (URI, title Text records, ...) nested in a Smart Poster
+        record, a generator like records(). None for other records."""
+        if not self.is_type(TNF_WELL_KNOWN, RTD_SMART_POSTER):
+            return None
+        return records(self.payload)
+
+
+def _decode_utf16(data):
+    """Decode UTF-16 text (BOM or big endian), MicroPython has no codec"""
+    start, big_endian = 0, True
+    if len(data) >= 2 and (data[0], data[1]) in ((0xFE, 0xFF), (0xFF, 0xFE)):
+        start, big_endian = 2, data[0] == 0xFE
+    chars = []
+    for i in range(start, len(data) - 1, 2):
+        if big_endian:
+            chars.append(chr((data[i] << 8) | data[i + 1]))
+        else:
+            chars.append(chr(data[i] | (data[i + 1] << 8)))
+    return "".join(chars)
+
+
+def records(message):
+    """Yield the records of message (bytes, bytearray or memoryview) one at
+    a time, stopping after the record flagged ME. Chunked records come out
+    as one record. Raises ValueError on a truncated or malformed message."""
+    view = memoryview(message)
+    end = len(view)
+    offset = 0
+    chunked = None
+    while offset < end:
+        flags = view[offset]
+        if offset + 3 > end:
+            raise ValueError("Truncated NDEF record")
+        type_length = view[offset + 1]
+        if flags & FLAG_SR:
+            payload_length = view[offset + 2]
+            offset += 3
+        else:
+            if offset + 6 > end:
+                raise ValueError("Truncated NDEF record")
+            payload_length = ((view[offset + 2] << 24) |
+                              (view[offset + 3] << 16) |
+                              (view[offset + 4] << 8) | view[offset + 5])
+            offset += 6
+        id_length = 0
+        if flags & FLAG_IL:
+            if offset >= end:
+                raise ValueError("Truncated NDEF record")
+            id_length = view[offset]
+            offset += 1
+        id_start = offset + type_length
+        payload_start = id_start + id_length
+        payload_end = payload_start + payload_length
+        if payload_end > end:
+            raise ValueError("Truncated NDEF record")
+        if chunked is not None:
+            # Middle or last chunk: no type, payload appended
+            if flags & _TNF_MASK != TNF_UNCHANGED or type_length:
+                raise ValueError("Bad NDEF record chunk")
+            chunked.payload.extend(view[payload_start:payload_end])
+            if not flags & FLAG_CF:
+                chunked.flags |= flags & FLAG_ME
+                yield chunked
+                chunked = None
+        elif flags & FLAG_CF:
+            chunked = Record(flags & ~FLAG_CF, view, offset, id_start,
+                             payload_start, payload_end,
+                             bytearray(view[payload_start:payload_end]))
+        else:
+            yield Record(flags, view, offset, id_start, payload_start,
+                         payload_end)
+        offset = payload_end
+        if flags & FLAG_ME and not flags & FLAG_CF:
+            return
+    if chunked is not None:
+        raise ValueError("Truncated NDEF record")
+
+
+def record_length(type_length, payload_length, id_length=0):
+    """Encoded size of a record"""
+    header = 3 if payload_length < 0x100 else 6
+    if id_length:
+        header += 1
+    return header + type_length + id_length + payload_length
+
+
+def _uri_split(uri):
+    """(identifier code, rest) using the longest matching prefix"""
+    best = 0
+    for code in range(1, len(URI_PREFIXES)):
+        prefix = URI_PREFIXES[code]
+        if uri.startswith(prefix) and len(prefix) > len(URI_PREFIXES[best]):
+            best = code
+    return best, uri[len(URI_PREFIXES[best]):]
+
+
+class MessageWriter:
+    """Encodes NDEF records into buf (a bytearray or memoryview) from
+    offset on. MB is set on the first record and ME on the last by finish().
+    Raises ValueError if buf is too small."""
+
+    def __init__(self, buf, offset=0):
+        self._buf = buf
+        self._start = offset
+        self.offset = offset
+        self._last = None  # header offset of the last record
+
+    def _header(self, tnf, record_type, payload_length, record_id):
+        """Write the record header and type/ID fields, returns the payload
+        offset"""
+        buf = self._buf
+        size = record_length(len(record_type), payload_length, len(record_id))
+        if self.offset + size > len(buf):
+            raise ValueError("NDEF buffer too small")
+        flags = tnf
+        if self._last is None:
+            flags |= FLAG_MB
+        if payload_length < 0x100:
+            flags |= FLAG_SR
+        if record_id:
+            flags |= FLAG_IL
+        self._last = offset = self.offset
+        buf[offset] = flags
+        buf[offset + 1] = len(record_type)
+        offset += 2
+        if flags & FLAG_SR:
+            buf[offset] = payload_length
+            offset += 1
+        else:
+            buf[offset] = payload_length >> 24
+            buf[offset + 1] = (payload_length >> 16) & 0xFF
+            buf[offset + 2] = (payload_length >> 8) & 0xFF
+            buf[offset + 3] = payload_length & 0xFF
+            offset += 4
+        if record_id:
+            buf[offset] = len(record_id)
+            offset += 1
+        buf[offset:offset + len(record_type)] = record_type
+        offset += len(record_type)
+        buf[offset:offset + len(record_id)] = record_id
+        self.offset = offset + len(record_id) + payload_length
+        return offset + len(record_id)
+
+    def add(self, tnf, record_type, payload, record_id=b''):
+        """Add a record with raw type and payload"""
+        offset = self._header(tnf, record_type, len(payload), record_id)
+        self._buf[offset:offset + len(payload)] = payload
+
+    def add_uri(self, uri, record_id=b''):
+        """Add a URI record, the longest known prefix is abbreviated"""
+        code, rest = _uri_split(uri)
+        rest = rest.encode('utf-8')
+        offset = self._header(TNF_WELL_KNOWN, RTD_URI, 1 + len(rest),
+                              record_id)
+        self._buf[offset] = code
+        self._buf[offset + 1:offset + 1 + len(rest)] = rest
+
+    def add_text(self, text, language="en", record_id=b''):
+        """Add a UTF-8 Text record"""
+        text = text.encode('utf-8')
+        language = language.encode('ascii')
+        offset = self._header(TNF_WELL_KNOWN, RTD_TEXT,
+                              1 + len(language) + len(text), record_id)
+        buf = self._buf
+        buf[offset] = len(language)
+        offset += 1
+        buf[offset:offset + len(language)] = language
+        offset += len(language)
+        buf[offset:offset + len(text)] = text
+
+    def add_mime(self, mime_type, payload, record_id=b''):
+        """Add a MIME (media type) record"""
+        self.add(TNF_MEDIA, mime_type.encode('ascii'), payload, record_id)
+
+    def add_smart_poster(self, uri, title=None, language="en"):
+        """Add a Smart Poster record holding a URI record and optionally a
+        title Text record"""
+        code, rest = _uri_split(uri)
+        length = record_length(1, 1 + len(rest.encode('utf-8')))
+        if title is not None:
+            length += record_length(1, 1 + len(language) +
+                                    len(title.encode('utf-8')))
+        offset = self._header(TNF_WELL_KNOWN, RTD_SMART_POSTER, length, b'')
+        # Nested message written in place as the payload
+        nested = MessageWriter(self._buf, offset)
+        nested.add_uri(URI_PREFIXES[code] + rest)
+        if title is not None:
+            nested.add_text(title, language)
+        nested.finish()
+
+    def finish(self):
+        """Set ME on the last record, returns the message length"""
+        if self._last is not None:
+            self._buf[self._last] |= FLAG_ME
+        return self.offset - self._start
+
+
+def encode_uri(buf, uri):
+    """Encode a single URI record message into buf, returns its length"""
+    writer = MessageWriter(buf)
+    writer.add_uri(uri)
+    return writer.finish()
@@ -0,0 +1,210 @@
+"""
+``pn532_async``
+====================================================
+
+asyncio (CPython) / uasyncio (MicroPython) front end for a PN532 driver
+instance such as pn532_i2c.PN532_I2C. Commands are framed and parsed by the
+wrapped driver, but ready-waits yield to the event loop instead of sleeping,
+so the display, Wi-Fi and HTTP can be serviced while a poll is in flight.
+
+Usage::
+
+    pn532 = AsyncPN532(pn532_i2c.PN532_I2C(i2c))
+    async for uid in pn532.cards():
+        print(uid)
+
+"""
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from adafruit_pn532 import (_ACK, _BITRATES, _COMMAND_INAUTOPOLL,
+                            _COMMAND_INDATAEXCHANGE, _COMMAND_INPSL,
+                            _COMMAND_INLISTPASSIVETARGET, _MIFARE_ISO14443A,
+                            _AUTOPOLL_ENDLESS,
+                            _TARGET_RECORD_MAX, AUTOPOLL_FELICA_212,
+                            AUTOPOLL_GENERIC_106, AUTOPOLL_JEWEL,
+                            MIFARE_CMD_READ, _POWER_UP_US, BusyError,
+                            _bitrate_attempts, _parse_autopoll, _ticks_diff,
+                            _ticks_ms, _deadline, _earlier, _remaining)
+
+# Ready poll backoff in seconds (IRQ pin level checks use the minimum)
+_POLL_MIN = 0.0002
+_POLL_MAX = 0.002
+
+
+class AsyncPN532:
+    """Non-blocking PN532 commands on top of a driver instance. The driver
+    must implement _poll_ready. One command is in flight at a time."""
+
+    def __init__(self, pn532):
+        self.pn532 = pn532
+        self._lock = asyncio.Lock()
+
+    async def _read_ready(self, count, deadline):
+        """Yield to the event loop until the PN532 is ready and return count
+        bytes, or None once deadline (ticks_ms) has passed. Bus errors send
+        the wake up signals and the power up time is awaited."""
+        pn532 = self.pn532
+        delay = _POLL_MIN
+        while _ticks_diff(deadline, _ticks_ms()) > 0:
+            try:
+                frame = pn532._poll_ready(count)  # pylint: disable=protected-access
+            except OSError:
+                # A deadline of now leaves out the power up wait, it is
+                # awaited instead
+                pn532._recover(_ticks_ms())  # pylint: disable=protected-access
+                await asyncio.sleep(min(_POWER_UP_US / 1000000,
+                                        _remaining(deadline)))
+                continue
+            if frame is not None:
+                return frame
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _POLL_MAX)
+        return None
+
+    async def call_function(self, command, response_length=0, params=(),
+                            timeout=1, copy=False, deadline=None):
+        """Async version of PN532.call_function. The returned memoryview is
+        only valid until the next command unless copy=True is used. The
+        timeout (or deadline) covers the wait for the lock too."""
+        # pylint: disable=protected-access
+        pn532 = self.pn532
+        deadline = _earlier(_deadline(timeout), deadline)
+        async with self._lock:
+            # The steps of PN532.call_function, with awaited ready-waits
+            if not pn532._begin_command(command, params, deadline):
+                return None
+            try:
+                ack = await self._read_ready(len(_ACK), deadline)
+                if ack is None:
+                    return pn532._no_response("call_function timeout 1")
+                pn532._take_ack(ack)
+                retries = pn532.nack_retries
+                while True:
+                    frame = await self._read_ready(response_length+2+8,
+                                                   deadline)
+                    if frame is None:
+                        return pn532._no_response("call_function timeout 2")
+                    response = pn532._take_response(command, frame, copy,
+                                                    retries, deadline)
+                    if response is not None:
+                        break
+                    retries -= 1
+            except (BusyError, RuntimeError) as error:
+                pn532._command_error(error)
+                raise
+            return pn532._end_command(params, response)
+
+    async def read_passive_target(self, card_baud=_MIFARE_ISO14443A,
+                                  timeout=1):
+        """Async version of PN532.read_passive_target, returns the UID of the
+        card found or None."""
+        targets = await self.list_passive_targets(1, card_baud, timeout)
+        if not targets:
+            return None
+        return targets[0].uid
+
+    async def list_passive_targets(self, max_targets=2,
+                                   card_baud=_MIFARE_ISO14443A, timeout=1):
+        """Async version of PN532.list_passive_targets, the bit rates are
+        negotiated up to the driver's max_bitrate as well."""
+        # pylint: disable=protected-access
+        assert max_targets in (1, 2), 'The PN532 handles 1 or 2 targets!'
+        deadline = _deadline(timeout)
+        try:
+            response = await self.call_function(
+                _COMMAND_INLISTPASSIVETARGET,
+                params=(max_targets, card_baud),
+                response_length=1+max_targets*_TARGET_RECORD_MAX,
+                deadline=deadline)
+        except BusyError:
+            return []  # no card found!
+        if response is None:
+            return None
+        targets = self.pn532._found_targets(response, max_targets, card_baud)
+        if targets:
+            await self.negotiate_bitrate(targets[0], self.pn532.max_bitrate,
+                                         _remaining(deadline))
+        return targets
+
+    async def in_psl(self, tg, to_target, from_target, timeout=1):
+        """Async version of PN532.in_psl"""
+        response = await self.call_function(
+            _COMMAND_INPSL, params=(tg, _BITRATES.index(to_target),
+                                    _BITRATES.index(from_target)),
+            response_length=1, timeout=timeout)
+        return self.pn532._psl_done(response, to_target, from_target)  # pylint: disable=protected-access
+
+    async def negotiate_bitrate(self, target, max_kbps=424, timeout=1):
+        """Async version of PN532.negotiate_bitrate"""
+        deadline = _deadline(timeout)
+        for to_target, from_target in _bitrate_attempts(target, max_kbps):
+            if await self.in_psl(target.tg, to_target, from_target,
+                                 _remaining(deadline)):
+                break
+        return self.pn532.bitrate
+
+    async def mifare_classic_read_block(self, block_number):
+        """Async version of PN532.mifare_classic_read_block, returns the 16
+        bytes read or None."""
+        response = await self.call_function(
+            _COMMAND_INDATAEXCHANGE,
+            params=(self.pn532._target, MIFARE_CMD_READ,  # pylint: disable=protected-access
+                    block_number & 0xFF),
+            response_length=17)
+        if response is None or response[0] != 0x00:
+            return None
+        return bytearray(response[1:])
+
+    async def wait_for_card(self, types=(AUTOPOLL_GENERIC_106,
+                                         AUTOPOLL_FELICA_212, AUTOPOLL_JEWEL),
+                            period=1, timeout=1):
+        """Async version of PN532.wait_for_card. The PN532 polls by itself
+        (InAutoPoll) while the event loop keeps running; returns the first
+        Target found or None."""
+        params = bytearray(2+len(types))
+        params[0] = _AUTOPOLL_ENDLESS
+        params[1] = period
+        params[2:] = bytes(types)
+        response = await self.call_function(_COMMAND_INAUTOPOLL,
+                                            params=params,
+                                            response_length=64,
+                                            timeout=timeout)
+        # call_function aborted a poll still running on the PN532
+        if response is None:
+            return None
+        targets = _parse_autopoll(response)
+        if not targets:
+            return None
+        return targets[0]
+
+    def cards(self, interval=0.3, timeout=0.2):
+        """Async iterator yielding the UID of each card presented, once per
+        presentation. Polls every interval seconds with InListPassiveTarget."""
+        return _CardEvents(self, interval, timeout)
+
+
+class _CardEvents:
+    """Async iterator behind AsyncPN532.cards (no async generators in
+    MicroPython)"""
+
+    def __init__(self, pn532, interval, timeout):
+        self._pn532 = pn532
+        self._interval = interval
+        self._timeout = timeout
+        self._last_uid = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            uid = await self._pn532.read_passive_target(timeout=self._timeout)
+            if uid is not None and uid != self._last_uid:
+                self._last_uid = uid
+                return uid
+            self._last_uid = uid
+            await asyncio.sleep(self._interval)
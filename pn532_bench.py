@@ -0,0 +1,815 @@
+"""
+``pn532_bench``
+====================================================
+
+Benchmarks for the PN532 driver against the pn532_sim simulated bus, run on
+CPython with ``python pn532_bench.py``. Reports I2C transactions, bytes on the
+bus and wall time per operation, as a regression baseline for driver changes.
+"""
+
+import threading
+import time
+import tracemalloc
+
+import ndef
+import pn532_i2c
+import pn532_spi
+import pn532_uart
+from adafruit_pn532 import (_COMMAND_GETFIRMWAREVERSION, MIFARE_CMD_AUTH_A,
+                            MIFARE_CMD_AUTH_B, _ticks_diff, _ticks_ms)
+from pn532_cache import TagCache
+from pn532_linux import LinuxI2C
+from pn532_lowpower import MODE_AUTOPOLL, MODE_POWER_DOWN, LowPowerDetector
+from pn532_mifare import KEY_DEFAULT, MifareClassicSession
+from pn532_pool import (SCHEDULE_PRIORITY, MuxChannel, ReaderPool,
+                        TCA9548A)
+from pn532_session import TargetSession
+from pn532_sim import (NTAG215, I2CDevLoopback, MifareClassic1K, NTAG2xx,
+                       PN532Simulator, PN532SPISimulator, PN532UARTSimulator,
+                       TCA9548ASimulator, Type4Tag)
+
+_NDEF_URL = b'\xd1\x01\x0cU\x04example.com'
+_REPEAT = 10
+# Type 4 tag: SELECT of the NDEF application, of the CC and NDEF files
+_T4_SELECT_APP = b'\x00\xA4\x04\x00\x07\xD2\x76\x00\x00\x85\x01\x01\x00'
+_T4_SELECT_CC = b'\x00\xA4\x00\x0C\x02\xE1\x03'
+_T4_SELECT_NDEF = b'\x00\xA4\x00\x0C\x02\xE1\x04'
+
+
+class LegacyPollI2C(pn532_i2c.PN532_I2C):
+    """Ready handling of the original driver: a status byte poll every 50ms,
+    then a status read and a frame read, for comparison."""
+
+    def _read_ready(self, count, deadline, recover=True):
+        status = bytearray(1)
+        while _ticks_diff(deadline, _ticks_ms()) > 0:
+            self._i2c.readfrom_into(0x24, status)
+            if status[0] == 0x01:
+                return self._read_data(count)
+            time.sleep(0.05)
+        return None
+
+
+def measure(bus, operation, repeat=_REPEAT):
+    """Run operation repeat times, returns per run (transactions, bytes on
+    the bus, wall time in ms)"""
+    bus.reset_counters()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        operation()
+    elapsed = time.perf_counter() - start
+    return (bus.transactions / repeat,
+            (bus.bytes_read + bus.bytes_written) / repeat,
+            1000 * elapsed / repeat)
+
+
+def report(name, result):
+    """Print one benchmark line"""
+    print("{:<52} {:>8.1f} {:>10.0f} {:>10.2f}".format(name, *result))
+
+
+def allocations(operation, repeat=100):
+    """Bytes allocated per run of operation, measured with tracemalloc"""
+    operation()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(repeat):
+        operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - before) / repeat
+
+
+def peak_heap(operation, repeat=20):
+    """Most heap in use at once during a run of operation, in bytes above
+    the heap before it (tracemalloc)"""
+    operation()
+    tracemalloc.start()
+    peak = 0
+    for _ in range(repeat):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        operation()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return peak
+
+
+def legacy_dump(pn532):
+    """Whole NTAG215 read the way main.py used to: 16 byte READs"""
+    data = bytearray()
+    for page in range(0, NTAG215, 4):
+        data += pn532.mifare_classic_read_block(page)
+    return data
+
+
+def drivers(bus):
+    """Driver variants to compare on bus"""
+    return (
+        ("legacy 50ms poll", LegacyPollI2C(bus)),
+        ("backoff poll", pn532_i2c.PN532_I2C(bus)),
+        ("irq", pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)),
+    )
+
+
+def bench_ntag(bus):
+    """Passive target detection, block reads and full tag dumps"""
+    for name, pn532 in drivers(bus):
+        report("read_passive_target [{}]".format(name),
+               measure(bus, pn532.read_passive_target))
+        report("mifare_classic_read_block [{}]".format(name),
+               measure(bus, lambda p=pn532: p.mifare_classic_read_block(4)))
+        report("NTAG215 dump, 4 page READs [{}]".format(name),
+               measure(bus, lambda p=pn532: legacy_dump(p), 3))
+        report("NTAG215 dump, ntag2xx_read_range [{}]".format(name),
+               measure(bus, lambda p=pn532: p.ntag2xx_read_range(
+                   0, NTAG215 - 1), 3))
+
+
+def bench_mifare(bus):
+    """Authenticated Mifare Classic block reads"""
+    card = bus.tags[0]
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    pn532.read_passive_target()
+
+    def read():
+        pn532.mifare_classic_authenticate_block(card.uid, 4, 0x60, b'\xff' * 6)
+        pn532.mifare_classic_read_block(4)
+    report("Mifare 1K auth + block read [irq]", measure(bus, read))
+
+
+def block_by_block_dump(pn532, uid, keys):
+    """Mifare 1K dump the single-shot way: authenticate every block, trying
+    each key (and selecting the card again after a failure)"""
+    data = bytearray()
+    for block in range(64):
+        for key in keys:
+            for key_type in (MIFARE_CMD_AUTH_A, MIFARE_CMD_AUTH_B):
+                if pn532.mifare_classic_authenticate_block(uid, block,
+                                                          key_type, key):
+                    break
+                pn532.read_passive_target()
+            else:
+                continue
+            break
+        data += pn532.mifare_classic_read_block(block)
+    return data
+
+
+def bench_mifare_dump():
+    """PN532 exchanges per Mifare 1K dump, half the sectors on a second key"""
+    key = b'\x11' * 6
+    card = MifareClassic1K(keys=[(KEY_DEFAULT, KEY_DEFAULT)] * 8 +
+                           [(key, key)] * 8)
+    bus = PN532Simulator(tags=[card])
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    uid = pn532.read_passive_target()
+    keys = (KEY_DEFAULT, key)
+    session = MifareClassicSession(pn532, keys)
+    for name, operation in (
+            ("block by block", lambda: block_by_block_dump(pn532, uid, keys)),
+            ("session, first tap", lambda: session.read_card(uid)),
+            ("session, repeat tap", lambda: session.read_card(uid))):
+        pn532.read_passive_target()
+        bus.reset_counters()
+        result = measure(bus, operation, 1)
+        report("Mifare 1K dump [{}]".format(name), result)
+        print("{:<52} {:>30}".format("  PN532 exchanges", bus.commands))
+
+
+def load_url(pn532):
+    """main.py style content load: pages 0-42 and the URI record"""
+    data = pn532.ntag2xx_read_range(0, 42)
+    if data is None:
+        return None
+    return bytes(data[23:23 + data[20] - 1]).decode()
+
+
+def bench_tag_cache():
+    """Known tag presented again, full read versus cache validation"""
+    tag = NTAG2xx(NTAG215, ndef=_NDEF_URL)
+    bus = PN532Simulator(tags=[tag])
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    cache = TagCache()
+    uid = pn532.read_passive_target()
+    report("known tag, pages 0-42 read [irq]",
+           measure(bus, lambda: load_url(pn532)))
+    report("known tag, cache hit [irq]",
+           measure(bus, lambda: cache.read(pn532, uid, load_url)))
+    tag.set_ndef(b'\xd1\x01\x0eU\x04example.org/a')
+    print("cache after rewrite: {} (hits {} misses {}, {} bytes)".format(
+        cache.read(pn532, uid, load_url), cache.hits, cache.misses,
+        cache.used))
+
+
+def bench_ndef_read():
+    """NDEF message read sized from the TLVs versus the fixed pages 0-42"""
+    for name, message, fast_read in (
+            ("short URL", _NDEF_URL, True),
+            ("short URL, no FAST_READ", _NDEF_URL, False),
+            ("400 byte message", bytes(400), True)):
+        bus = PN532Simulator(tags=[NTAG2xx(NTAG215, ndef=message,
+                                           fast_read=fast_read)])
+        pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+        pn532.read_passive_target()
+        for method, operation in (
+                ("pages 0-42", lambda p=pn532: p.ntag2xx_read_range(0, 42)),
+                ("ntag2xx_read_ndef", pn532.ntag2xx_read_ndef)):
+            result = measure(bus, operation, 3)
+            report("{} [{}]".format(name, method), result)
+            print("{:<52} {:>30.0f}".format("  PN532 exchanges",
+                                            bus.commands / 3))
+
+
+def slicing_url(data):
+    """URL from a pages 0-42 dump with fixed offsets and slices, as main.py
+    did before the ndef module"""
+    if data[15] == 0x00 and data[16] == 0x03 and data[18] == 0xD1 and \
+            data[19] == 0x01 and data[21] == 0x55:
+        prefix = ("", "http://www.", "https://www.", "http://",
+                  "https://")[data[22]]
+        return prefix + data[23:data[20] - 1 + 23].decode('utf-8')
+    return None
+
+
+def slicing_records(message):
+    """Records as (tnf, type, id, payload) tuples built with slices, the
+    copying way to walk a message"""
+    result = []
+    offset = 0
+    while offset < len(message):
+        flags = message[offset]
+        type_length = message[offset + 1]
+        if flags & 0x10:
+            payload_length = message[offset + 2]
+            offset += 3
+        else:
+            payload_length = int.from_bytes(message[offset + 2:offset + 6],
+                                            'big')
+            offset += 6
+        id_length = 0
+        if flags & 0x08:
+            id_length = message[offset]
+            offset += 1
+        record_type = message[offset:offset + type_length]
+        offset += type_length
+        record_id = message[offset:offset + id_length]
+        offset += id_length
+        result.append((flags & 0x07, record_type, record_id,
+                       message[offset:offset + payload_length]))
+        offset += payload_length
+        if flags & 0x40:
+            break
+    return result
+
+
+def bench_ndef_parse():
+    """NDEF parse time and heap per message, CPython"""
+    dump = bytearray(172)
+    dump[15:18] = b'\x00\x03\x10'
+    dump[18:18 + len(_NDEF_URL)] = _NDEF_URL
+    buf = bytearray(4096)
+    writer = ndef.MessageWriter(buf)
+    writer.add_smart_poster("https://example.com/badge", "Badge")
+    writer.add_text("Front door")
+    writer.add_mime("application/json", b'{"door": 1}' * 40)
+    writer.add_mime("image/png", bytes(2048))
+    message = bytearray(buf[:writer.finish()])
+    for name, operation in (
+            ("URL, fixed offsets + slices", lambda: slicing_url(dump)),
+            ("URL, ndef.records",
+             lambda: next(ndef.records(memoryview(dump)[18:34])).uri()),
+            ("4 records, slicing parser", lambda: slicing_records(message)),
+            ("4 records, ndef.records", lambda: list(ndef.records(message))),
+            ("encode URI record into buffer",
+             lambda: ndef.encode_uri(buf, "https://example.com"))):
+        start = time.perf_counter()
+        for _ in range(1000):
+            operation()
+        elapsed = (time.perf_counter() - start) * 1000
+        print("{:<52} {:>8.1f} us {:>8.0f} bytes peak heap".format(
+            "ndef: " + name, elapsed, peak_heap(operation)))
+
+
+def full_write_ndef(pn532, message):
+    """Write the NDEF TLV page by page without looking at the tag"""
+    tlv = bytearray(b'\x03') + bytes([len(message)]) + message + b'\xfe'
+    tlv += bytes(-len(tlv) % 4)
+    for page in range(len(tlv) // 4):
+        pn532.ntag2xx_write_block(4 + page, tlv[4*page:4*page+4])
+    return len(tlv) // 4
+
+
+def bench_write_ndef():
+    """Provisioning a tag with a URL that differs from the one on it"""
+    buf = bytearray(256)
+    old = bytes(buf[:ndef.encode_uri(buf, "https://example.com/door/17")])
+    new = bytes(buf[:ndef.encode_uri(buf, "https://example.com/door/18")])
+    tag = NTAG2xx(NTAG215, ndef=old)
+    bus = PN532Simulator(tags=[tag])
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    uid = pn532.read_passive_target()
+    for name, operation in (
+            ("every page", lambda: full_write_ndef(pn532, new)),
+            ("ntag2xx_write_ndef", lambda: pn532.ntag2xx_write_ndef(uid, new))):
+        tag.set_ndef(old)
+        bus.reset_counters()
+        start = time.perf_counter()
+        result = operation()
+        elapsed = 1000 * (time.perf_counter() - start)
+        pages = result[0] if isinstance(result, tuple) else result
+        print("{:<52} {:>8} pages {:>8.2f} ms {:>4} exchanges".format(
+            "URL change, " + name, pages, elapsed, bus.commands))
+
+
+def _read_binary(offset, length):
+    """READ BINARY APDU, extended Le above 256 bytes"""
+    if length <= 256:
+        return bytes([0x00, 0xB0, offset >> 8, offset & 0xFF, length & 0xFF])
+    return bytes([0x00, 0xB0, offset >> 8, offset & 0xFF, 0x00, length >> 8,
+                  length & 0xFF])
+
+
+def type4_read_ndef(pn532, into, le):
+    """Read the NDEF message of a Type 4 tag into into (message size + 2
+    bytes) with READ BINARY of up to le bytes, returns the message size"""
+    pn532.apdu_exchange(_T4_SELECT_APP)
+    pn532.apdu_exchange(_T4_SELECT_CC)
+    cc = pn532.apdu_exchange(_read_binary(0, 15))
+    le = min(le, cc[3] << 8 | cc[4])
+    pn532.apdu_exchange(_T4_SELECT_NDEF)
+    nlen = pn532.apdu_exchange(_read_binary(0, 2))
+    size = nlen[0] << 8 | nlen[1]
+    view = memoryview(into)
+    offset = 0
+    while offset < size:
+        count = min(le, size - offset)
+        # Each answer ends with SW1 SW2, overwritten by the next one
+        pn532.apdu_exchange(_read_binary(2 + offset, count),
+                            into=view[offset:offset+count+2])
+        offset += count
+    return size
+
+
+def bench_type4():
+    """4KB NDEF file of a Type 4 tag: short READ BINARY APDUs against one
+    extended APDU whose response is chained over InDataExchange (MI bit)"""
+    message = bytes(range(256)) * 15 + bytes(4094 - 3840)
+    bus = PN532Simulator(tags=[Type4Tag(ndef=message)])
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    pn532.list_passive_targets(1)
+    into = bytearray(len(message) + 2)
+    for le in (59, 255, 4094):
+        result = measure(bus, lambda le=le: type4_read_ndef(pn532, into, le),
+                         3)
+        assert into[:len(message)] == message
+        report("type4 4KB NDEF, Le {} ({:.1f} kB/s)".format(
+            le, len(message) / result[2]), result)
+    chunk = bytearray(252)
+
+    def stream():
+        pn532.apdu_exchange(_T4_SELECT_NDEF)
+        total = 0
+        for count in pn532.apdu_stream(_read_binary(2, len(message)), chunk):
+            total += count
+        return total
+    result = measure(bus, stream, 3)
+    report("type4 4KB NDEF, apdu_stream 252B buffer ({:.1f} kB/s)".format(
+        len(message) / result[2]), result)
+    # Bit rates negotiated with InPSL after activation, the last card claims
+    # 848kbps in its ATS but its PPS only succeeds up to 424kbps
+    for max_kbps, tag in ((212, Type4Tag(ndef=message)),
+                          (424, Type4Tag(ndef=message)),
+                          (848, Type4Tag(ndef=message)),
+                          (848, Type4Tag(ndef=message, pps_limit=424))):
+        bus = PN532Simulator(tags=[tag])
+        pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+        pn532.max_bitrate = max_kbps
+        activate = measure(bus, lambda p=pn532: p.list_passive_targets(1), 3)
+        result = measure(bus, lambda p=pn532: type4_read_ndef(
+            p, into, len(message)), 3)
+        name = "{}/{}".format(*pn532.bitrate)
+        if tag.pps_limit < max_kbps:
+            name += " from {}".format(max_kbps)
+        report("  activation + InPSL [{}kbps]".format(name), activate)
+        report("type4 4KB NDEF, Le 4094 [{}] ({:.1f} kB/s)".format(
+            name, len(message) / result[2]), result)
+
+
+# Boot time assumed for the simulated PN532 after reset
+_BOOT_US = 20000
+# Sleeps main.py had between the reader set up and the first poll
+_MAIN_SLEEPS_MS = 1000 + 3000
+
+
+def bench_cold_start():
+    """Reset to first card poll: the default start up followed by main.py's
+    own firmware query and SAM configuration, against fast start with the
+    SAM configuration folded in. main.py's sleeps are added, not slept."""
+    for name, fast in (("default", False), ("fast", True)):
+        bus = PN532Simulator(tags=[NTAG2xx(NTAG215)], boot_us=_BOOT_US)
+        start = time.perf_counter()
+        pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin,
+                                    reset=bus.reset_pin, fast=fast, sam=fast)
+        phases = list(pn532.boot_times)
+        if not fast:
+            begin = time.perf_counter()
+            pn532.get_firmware_version()
+            pn532.SAM_configuration()
+            phases.append(("main.py firmware+SAM",
+                           round(1000 * (time.perf_counter() - begin))))
+        pn532.list_passive_targets(1)
+        first_poll = 1000 * (time.perf_counter() - start)
+        if not fast:
+            phases.append(("main.py sleeps", _MAIN_SLEEPS_MS))
+            first_poll += _MAIN_SLEEPS_MS
+        print("cold start [{}]: {} -> first UID at {:.0f} ms".format(
+            name, ", ".join("{} {}".format(*phase) for phase in phases),
+            first_poll))
+
+
+def bench_rf_profiles():
+    """InListPassiveTarget latency with and without a card per RF profile"""
+    for profile in ("default", "fast tap", "robust"):
+        bus = PN532Simulator(tags=[])
+        pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+        pn532.rf_configure(profile)
+        report("no card, timeout=0.2 [{}]".format(profile),
+               measure(bus, lambda p=pn532: p.read_passive_target(
+                   timeout=0.2), 3))
+        bus.tags.append(NTAG2xx(NTAG215))
+        report("card present [{}]".format(profile),
+               measure(bus, lambda p=pn532: p.read_passive_target(
+                   timeout=0.2), 3))
+
+
+def _departure(bus, session, tag):
+    """The card of session leaves, returns the presence check result"""
+    bus.tags.append(tag)
+    session.poll()
+    bus.tags.remove(tag)
+    return measure(bus, session.present, 1)
+
+
+def bench_session():
+    """Per loop cost of a card staying on the reader and of noticing it
+    leave: a new poll every loop (main.py before) against a presence check on
+    the selected target"""
+    for name, tag in (("NTAG215", NTAG2xx(NTAG215)),
+                      ("Mifare 1K", MifareClassic1K())):
+        for profile in ("default", "fast tap"):
+            bus = PN532Simulator(tags=[tag])
+            pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+            pn532.rf_configure(profile)
+            session = TargetSession(pn532)
+            session.poll()
+            label = "{} [{}]".format(name, profile)
+            poll = measure(bus, lambda p=pn532: p.read_passive_target(
+                timeout=0.2))
+            check = measure(bus, session.present)
+            report("card stays, re-poll " + label, poll)
+            report("card stays, presence check " + label, check)
+            bus.tags.remove(tag)
+            gone = measure(bus, lambda p=pn532: p.read_passive_target(
+                timeout=0.2), 3)
+            runs = [_departure(bus, session, tag) for _ in range(3)]
+            left = [sum(column) / len(runs) for column in zip(*runs)]
+            report("card left, re-poll " + label, gone)
+            report("card left, presence check " + label, left)
+            # main.py polls every 300ms, checks a present card every 100ms
+            print("{:<52} {:>8.0f} ms -> {:.0f} ms".format(
+                "mean time to notice removal " + label,
+                150 + gone[2], 50 + left[2]))
+
+
+# Supply currents in mA for the energy model (typical figures, the PN532
+# ones depend on the antenna): ESP32 running / light sleep, PN532 with the
+# RF field on / idle with the field off / power down
+_ESP32_ACTIVE_MA = 40.0
+_ESP32_LIGHT_SLEEP_MA = 0.8
+_PN532_RF_MA = 60.0
+_PN532_IDLE_MA = 10.0
+_PN532_POWER_DOWN_MA = 0.01
+_BATTERY_MAH = 2000
+# RF on time of one InAutoPoll round per target type
+_AUTOPOLL_RF_MS = 2.5
+
+
+def _budget(name, active_ms, rf_ms, cycle_ms, esp32_sleep, pn532_rest_ma,
+            latency_ms):
+    """Print the average current, battery life and mean detection latency of
+    a detection cycle"""
+    rest_ms = cycle_ms - active_ms
+    esp32 = _ESP32_ACTIVE_MA * active_ms + rest_ms * (
+        _ESP32_LIGHT_SLEEP_MA if esp32_sleep else _ESP32_ACTIVE_MA)
+    pn532 = _PN532_RF_MA * rf_ms + pn532_rest_ma * (cycle_ms - rf_ms)
+    current = (esp32 + pn532) / cycle_ms
+    print("{:<40} {:>8.2f} mA {:>8.1f} days {:>8.0f} ms".format(
+        name, current, _BATTERY_MAH / current / 24, latency_ms))
+
+
+def bench_low_power():
+    """Energy and detection latency per duty cycle, no card most of the time.
+    Command times come from the simulator, currents from the model above."""
+    bus = PN532Simulator(tags=[])
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    pn532.rf_configure("fast tap")
+
+    def poll():
+        pn532.power_up()
+        pn532.list_passive_targets(1, timeout=0.1)
+        pn532.power_down()
+    poll_ms = measure(bus, poll)[2]
+    bus.tags.append(NTAG2xx(NTAG215))
+    detect_ms = measure(bus, pn532.read_passive_target)[2]
+    print("{:<40} {:>11} {:>13} {:>11}".format(
+        "detection mode", "current", "2000mAh", "latency"))
+    # main.py before: poll every 300ms, host timeout 0.2s, field always on
+    _budget("flat out 300ms loop", 500, 200, 500, False, _PN532_IDLE_MA,
+            250 + detect_ms)
+    for interval in (100, 250, 500, 1000):
+        _budget("power down, poll every {}ms".format(interval), poll_ms,
+                poll_ms, interval + poll_ms, True, _PN532_POWER_DOWN_MA,
+                (interval + poll_ms) / 2 + detect_ms)
+    for period in (1, 2, 4):
+        cycle = 150 * period
+        _budget("autopoll + IRQ, period {}ms".format(cycle), 0,
+                2 * _AUTOPOLL_RF_MS, cycle, True, _PN532_IDLE_MA,
+                cycle / 2 + detect_ms)
+    for mode, name in ((MODE_POWER_DOWN, "power down 250ms"),
+                       (MODE_AUTOPOLL, "autopoll 150ms")):
+        bus.tags.clear()
+        detector = LowPowerDetector(pn532, mode, 0.25 if mode else 0.15,
+                                    irq=bus.irq_pin)
+        timer = threading.Timer(0.4, lambda: bus.tags.append(
+            NTAG2xx(NTAG215)))
+        timer.start()
+        detector.wait_for_card(timeout=2)
+        print("wake to UID [{}]: {} ms".format(name,
+                                               detector.wake_latency_ms))
+
+
+def _tap(pn532):
+    """One tap as main.py handles it: find the card, read and parse its URL.
+    True if it completed."""
+    try:
+        targets = pn532.list_passive_targets(1, timeout=0.2)
+        if not targets:
+            return False
+        message = pn532.ntag2xx_read_ndef()
+        return message is not None and \
+            next(ndef.records(message)).uri() == "https://example.com"
+    except (RuntimeError, ValueError, StopIteration):
+        return False
+
+
+def bench_faults(taps=200):
+    """Completed taps per minute (back to back, no loop sleep) with bit
+    flips injected into response frames, without NACK retries (the tap is
+    lost) and with the default NACK retries"""
+    for corrupt in (0.0, 0.01, 0.05, 0.2):
+        for retries in (0, 2):
+            bus = PN532Simulator(tags=[NTAG2xx(NTAG215, ndef=_NDEF_URL)],
+                                 corrupt=corrupt)
+            pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+            pn532.rf_configure("fast tap")
+            pn532.nack_retries = retries
+            bus.reset_counters()
+            start = time.perf_counter()
+            done = sum(_tap(pn532) for _ in range(taps))
+            elapsed = time.perf_counter() - start
+            print("{:<44} {:>4}/{} taps {:>6.0f} taps/min {:>4} NACKs".format(
+                "bit flips {:.0%} of responses, {} NACK retries".format(
+                    corrupt, retries), done, taps, 60 * done / elapsed,
+                bus.nacks))
+
+
+class NoDeadlineWakeupI2C(pn532_i2c.PN532_I2C):
+    """Wake up after a bus error as before deadlines: always the full 0.5s
+    sleep, for comparison"""
+
+    def _wakeup(self, deadline=None, short=False):
+        super()._wakeup()
+
+
+def _bounded(bus, pn532, operation, calls):
+    """Run operation calls times, returns (worst and mean wall time in ms,
+    calls that succeeded, bus errors injected)"""
+    bus.reset_counters()
+    worst = total = 0
+    done = 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            done += operation(pn532) is not None
+        except RuntimeError:
+            pass
+        elapsed = 1000 * (time.perf_counter() - start)
+        worst = max(worst, elapsed)
+        total += elapsed
+    return worst, total / calls, done, bus.bus_failures
+
+
+def bench_deadlines(calls=40):
+    """Worst case latency of public methods against their timeout with bus
+    errors injected (OSError on a share of I2C transactions): every call
+    must end by its deadline plus one bus transaction"""
+    type4 = Type4Tag(ndef=bytes(4094))
+    cases = (
+        ("list_passive_targets, no card", 0.2, [],
+         lambda p: p.list_passive_targets(1, timeout=0.2) or None),
+        ("list_passive_targets, NTAG215", 0.2,
+         [NTAG2xx(NTAG215, ndef=_NDEF_URL)],
+         lambda p: p.list_passive_targets(1, timeout=0.2) or None),
+        ("ntag2xx_read_ndef", 0.1, [NTAG2xx(NTAG215, ndef=_NDEF_URL)],
+         lambda p: p.ntag2xx_read_ndef(timeout=0.1)),
+        ("apdu_exchange, 4KB READ BINARY", 1, [type4],
+         lambda p: p.apdu_exchange(_read_binary(2, 4094), timeout=1)),
+    )
+    for name, timeout, tags, operation in cases:
+        for errors, driver in ((0.02, NoDeadlineWakeupI2C),
+                               (0.02, pn532_i2c.PN532_I2C),
+                               (0.2, pn532_i2c.PN532_I2C)):
+            bus = PN532Simulator(tags=tags)
+            pn532 = driver(bus, irq=bus.irq_pin)
+            pn532.list_passive_targets(1, timeout=0.2)
+            if type4 in tags:
+                pn532.apdu_exchange(_T4_SELECT_APP)
+                pn532.apdu_exchange(_T4_SELECT_NDEF)
+            bus.bus_errors = errors
+            worst, mean, done, failures = _bounded(
+                bus, pn532, operation,
+                calls if driver is not NoDeadlineWakeupI2C else calls // 4)
+            print("{:<52} {:>5.0f} {:>7.0f} {:>7.1f} {:>5} {:>5}".format(
+                "{} {:.0%} [{}]".format(
+                    name, errors, "old wakeup" if driver is
+                    NoDeadlineWakeupI2C else "deadline"),
+                1000 * timeout, worst, mean, done, failures))
+
+
+def bench_transports():
+    """Full NTAG215 read over each transport, wire time modelled"""
+    tag = NTAG2xx(NTAG215, ndef=_NDEF_URL)
+    i2c = PN532Simulator(tags=[tag])
+    spi = PN532SPISimulator(tags=[tag])
+    uart = PN532UARTSimulator(tags=[tag])
+    fast_uart = PN532UARTSimulator(tags=[tag])
+    fast = pn532_uart.PN532_UART(fast_uart)
+    fast.set_baudrate(921600)
+    for name, bus, pn532 in (
+            ("I2C 400kHz, irq", i2c, pn532_i2c.PN532_I2C(i2c, irq=i2c.irq_pin)),
+            ("SPI 5MHz, irq", spi,
+             pn532_spi.PN532_SPI(spi, spi.cs_pin, irq=spi.irq_pin)),
+            ("SPI 5MHz, status poll", spi,
+             pn532_spi.PN532_SPI(spi, spi.cs_pin)),
+            ("UART 115200", uart, pn532_uart.PN532_UART(uart)),
+            ("UART 921600", fast_uart, fast)):
+        pn532.read_passive_target()
+        result = measure(bus, lambda p=pn532: p.ntag2xx_read_range(
+            0, NTAG215 - 1), 3)
+        report("NTAG215 dump [{}]".format(name), result)
+        print("{:<52} {:>30.1f}".format(
+            "  throughput kB/s", NTAG215 * 4 / result[2]))
+
+
+def bench_linux(calls=20000):
+    """LinuxI2C (i2c-dev I2C_RDWR) against the simulator behind the
+    I2CDevLoopback ioctl: cost of the binding per bus transaction (no wire
+    time, the kernel call itself is not included) and a full NTAG215 read"""
+    bus = PN532Simulator(tags=[NTAG2xx(NTAG215, ndef=_NDEF_URL)], clock_hz=0)
+    linux = LinuxI2C(ioctl=I2CDevLoopback(bus))
+    frame = bytearray(17)
+    for name, i2c in (("simulator direct", bus),
+                      ("LinuxI2C + loopback", linux)):
+        start = time.perf_counter()
+        for _ in range(calls):
+            i2c.readfrom_into(0x24, frame)
+        print("{:<52} {:>30.1f}".format(
+            "17 byte read, us [{}]".format(name),
+            1000000 * (time.perf_counter() - start) / calls))
+    bus.clock_hz = 400000
+    for name, i2c in (("simulator bus", bus), ("LinuxI2C, I2C_RDWR", linux)):
+        pn532 = pn532_i2c.PN532_I2C(i2c, irq=bus.irq_pin)
+        pn532.read_passive_target()
+        linux.ioctls = 0
+        result = measure(bus, lambda p=pn532: p.ntag2xx_read_range(
+            0, NTAG215 - 1), 20)
+        report("NTAG215 dump [{}]".format(name), result)
+        print("{:<52} {:>30.1f}".format(
+            "  throughput kB/s", NTAG215 * 4 / result[2]))
+    print("{:<52} {:>30.1f}".format("  ioctls per dump", linux.ioctls / 20))
+
+
+def _mux_readers(count, cards, irq=True):
+    """count "fast tap" readers behind one simulated TCA9548A, with an
+    NTAG215 on each when cards. Returns (chips, readers)"""
+    chips = [PN532Simulator(tags=[NTAG2xx(NTAG215)] if cards else [])
+             for _ in range(count)]
+    mux = TCA9548A(TCA9548ASimulator(chips))
+    readers = [pn532_i2c.PN532_I2C(MuxChannel(mux, channel),
+                                   irq=chip.irq_pin if irq else None)
+               for channel, chip in enumerate(chips)]
+    for pn532 in readers:
+        pn532.rf_configure("fast tap")
+    return chips, readers
+
+
+def _polls_per_second(poll, seconds=0.5):
+    """Polls completed per second by poll(), which returns how many it did"""
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        done += poll()
+    return done / (time.perf_counter() - start)
+
+
+def _sequential(readers):
+    for pn532 in readers:
+        pn532.list_passive_targets(1, timeout=0.1)
+    return len(readers)
+
+
+def bench_pool():
+    """Aggregate InListPassiveTarget polls per second of readers behind a
+    TCA9548A: one after the other against ReaderPool's overlapped commands,
+    then a dead reader and strict priority with 2 active readers of 8"""
+    for cards in (False, True):
+        for count in (1, 4, 8):
+            for irq in ((True, False) if count == 8 else (True,)):
+                _, readers = _mux_readers(count, cards, irq)
+                pool = ReaderPool(readers)
+                print("{:<52} {:>10.0f} {:>10.0f}".format(
+                    "{} reader(s), {}{}".format(
+                        count, "cards" if cards else "no card",
+                        "" if irq else ", no IRQ"),
+                    _polls_per_second(lambda r=readers: _sequential(r)),
+                    _polls_per_second(lambda p=pool: len(p.poll()))))
+    chips, readers = _mux_readers(4, False)
+    chips[3].bus_errors = 1.0
+    pool = ReaderPool(readers)
+    rate = _polls_per_second(lambda: len(pool.poll()))
+    print("4 readers, reader 3 dead: {:.0f} polls/s, {}".format(
+        rate, pool.readers[3]))
+    _, readers = _mux_readers(8, True)
+    pool = ReaderPool(readers, schedule=SCHEDULE_PRIORITY, max_active=2,
+                      priorities=[1] + [0] * 7)
+    seconds = 1
+    _polls_per_second(lambda: len(pool.poll()), seconds)
+    print("8 readers, 2 active, reader 0 first: {:.0f} polls/s reader 0,"
+          " {:.0f} polls/s each other".format(
+              pool.readers[0].polls / seconds,
+              sum(reader.polls for reader in pool.readers[1:]) / 7 / seconds))
+
+
+def bench_stats(bus):
+    """Cost of leaving the command stats enabled"""
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    report("read_passive_target [irq, stats off]",
+           measure(bus, pn532.read_passive_target, 50))
+    pn532.enable_stats()
+    report("read_passive_target [irq, stats on]",
+           measure(bus, pn532.read_passive_target, 50))
+    print("stats allocations: {:.0f} bytes/call".format(
+        allocations(pn532.read_passive_target)))
+
+
+def bench_allocations(bus):
+    """Heap allocated per command on CPython"""
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    print("call_function allocations: {:.0f} bytes/call".format(allocations(
+        lambda: pn532.call_function(_COMMAND_GETFIRMWAREVERSION, 4))))
+    print("read_passive_target allocations: {:.0f} bytes/call".format(
+        allocations(pn532.read_passive_target)))
+
+
+def main():
+    """Run all benchmarks"""
+    print("{:<52} {:>8} {:>10} {:>10}".format(
+        "operation", "trans", "bytes", "ms"))
+    bench_ntag(PN532Simulator(tags=[NTAG2xx(NTAG215, ndef=_NDEF_URL)]))
+    bench_mifare(PN532Simulator(tags=[MifareClassic1K()]))
+    bench_mifare_dump()
+    bench_tag_cache()
+    bench_ndef_read()
+    bench_ndef_parse()
+    bench_write_ndef()
+    bench_type4()
+    bench_cold_start()
+    bench_rf_profiles()
+    bench_session()
+    bench_low_power()
+    bench_faults()
+    print("{:<52} {:>5} {:>7} {:>7} {:>5} {:>5}".format(
+        "bus errors", "limit", "worst", "mean", "ok", "errs"))
+    bench_deadlines()
+    bench_transports()
+    bench_linux()
+    print("{:<52} {:>10} {:>10}".format("polls/s", "one by one", "pool"))
+    bench_pool()
+    bench_stats(PN532Simulator(tags=[NTAG2xx(NTAG215)]))
+    bench_allocations(PN532Simulator(tags=[NTAG2xx(NTAG215)]))
+
+
+if __name__ == '__main__':
+    main()
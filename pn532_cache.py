@@ -0,0 +1,117 @@
+"""
+``pn532_cache``
+====================================================
+
+UID keyed cache of parsed tag content. A tag seen before costs one 16 byte
+READ of pages 3-6 (the capability container and the start of the NDEF TLV)
+to check its content is unchanged, instead of a full dump and parse.
+"""
+
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+
+# pylint: disable=bad-whitespace
+# Page 3 is the capability container, READ returns it and the next 3 pages
+_TOKEN_PAGE = const(3)
+# Bookkeeping bytes counted per entry on top of uid, token and content
+_ENTRY_OVERHEAD = const(64)
+
+_MISS = object()
+
+
+def read_token(pn532):
+    """Validation token of the current tag: pages 3-6 (CC, NDEF TLV type and
+    length, first message bytes) in one READ. None if the read failed."""
+    block = pn532.mifare_classic_read_block(_TOKEN_PAGE)
+    return None if block is None else bytes(block)
+
+
+def _content_size(content):
+    try:
+        return len(content)
+    except TypeError:
+        return 0
+
+
+class TagCache:
+    """Parsed tag content keyed by UID, least recently used entries are
+    evicted to keep the total under budget bytes. The token stored with an
+    entry must match for a hit, tags rewritten elsewhere to the same length
+    and first bytes are not noticed: invalidate() them after writing."""
+
+    def __init__(self, budget=2048):
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        # uid -> (token, content, size); uids in use order, most recent
+        # last, the oldest is the next one evicted
+        self._entries = {}
+        self._order = []
+
+    def __len__(self):
+        return len(self._order)
+
+    def _drop(self, uid):
+        self.used -= self._entries.pop(uid)[2]
+        self._order.remove(uid)
+
+    def get(self, uid, token, default=None):
+        """Content cached for uid if token still matches, else default"""
+        uid = bytes(uid)
+        entry = self._entries.get(uid)
+        if entry is None:
+            self.misses += 1
+            return default
+        if token is None or entry[0] != token:
+            self._drop(uid)
+            self.misses += 1
+            return default
+        self._order.remove(uid)
+        self._order.append(uid)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, uid, token, content, size=None):
+        """Cache content for uid, validated by token. size is the bytes to
+        charge against the budget, len(content) by default. Returns False if
+        the entry alone does not fit the budget."""
+        uid = bytes(uid)
+        if uid in self._entries:
+            self._drop(uid)
+        if size is None:
+            size = _content_size(content)
+        size += len(uid) + len(token) + _ENTRY_OVERHEAD
+        if size > self.budget:
+            return False
+        while self.used + size > self.budget:
+            self._drop(self._order[0])
+        self._entries[uid] = (token, content, size)
+        self._order.append(uid)
+        self.used += size
+        return True
+
+    def invalidate(self, uid=None):
+        """Forget uid, or every tag"""
+        if uid is None:
+            self._entries = {}
+            self._order = []
+            self.used = 0
+        elif bytes(uid) in self._entries:
+            self._drop(bytes(uid))
+
+    def read(self, pn532, uid, load):
+        """Content of the current tag uid: cached if the token still matches,
+        otherwise load(pn532) is called and its result cached. load returns
+        None when the tag could not be read, that is not cached."""
+        token = read_token(pn532)
+        content = self.get(uid, token, _MISS)
+        if content is not _MISS:
+            return content
+        content = load(pn532)
+        if content is not None and token is not None:
+            self.put(uid, token, content)
+        return content
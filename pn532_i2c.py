@@ -38,87 +38,133 @@ __version__ = "0.0.0-auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_PN532.git"
 
 import time
-from machine import I2C, Pin
+try:
+    from machine import I2C, Pin
+except ImportError:  # CPython: irq and reset numbers are Linux GPIOs
+    I2C = None
+    from pn532_linux import LinuxPin as Pin
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
 from digitalio import Direction
-from micropython import const
-from adafruit_pn532 import PN532, BusyError, _reset
+from adafruit_pn532 import (PN532, BusyError, _reset, _ACK, _POWER_UP_US,
+                            _RESET_PULSE_US, _WAKEUP_PULSE_US, _sleep_us,
+                            _sleep_ms, _deadline)
 
 # pylint: disable=bad-whitespace
 _I2C_ADDRESS = const(0x24)
 
 _NOT_BUSY = const(0x01)
 
+# Longest read used to poll the status byte when no IRQ pin is wired
+_POLL_READ_MAX = const(32)
+
 
 class PN532_I2C(PN532):
     """Driver for the PN532 connected over I2C."""
 
-    def __init__(self, i2c, *, irq=None, reset=None, req=None, debug=False):
+    def __init__(self, i2c, *, irq=None, reset=None, req=None, debug=False,
+                 fast=False, sam=False):
         """Create an instance of the PN532 class using I2C. Note that PN532
-        uses clock stretching. Optional IRQ pin (not used),
-        reset pin and debugging output.
+        uses clock stretching. Optional IRQ pin (pin number or Pin, signals
+        readiness so the status byte is not polled), reset pin and debugging
+        output. fast starts the PN532 without the fixed reset and wake up
+        sleeps and sam configures the SAM as well, see PN532.
         """
         self.debug = debug
-        self._irq = irq
+        self._status = bytearray(1)  # status byte for _read_data
+        if isinstance(irq, int):
+            irq = Pin(irq, Pin.IN, Pin.PULL_UP)
+        self._init_irq(irq)
         self._req = req
-        if reset:
-            # Changed this logic so it is not circuit python dependent (No use of direction)
-            # Do the reset at the I2c level
-            if self.debug:
-                print("reset")
-            reset_pin = Pin(reset, Pin.OUT)
-            reset_pin.value(1)
-            time.sleep(0.1)
-            reset_pin.value(0)
-            time.sleep(0.5)
-            reset_pin.value(1)
-            time.sleep(0.1)
-            # _reset(reset)
         # self._i2c = I2C.SoftI2C(i2c, _I2C_ADDRESS)
         self._i2c = i2c
-        # call super.__init__ without reset pin (To get around circuitpython pin specifics)
-        super().__init__(debug=debug)
+        super().__init__(debug=debug, reset=reset, fast=fast, sam=sam)
+
+    def _hard_reset(self, pin, fast=False):
+        """Toggle the reset pin. Fast mode only holds it low for a short
+        pulse and leaves the wait for the PN532 to the probe."""
+        # Changed this logic so it is not circuit python dependent (No use of direction)
+        # Do the reset at the I2c level
+        if self.debug:
+            print("reset")
+        reset_pin = Pin(pin, Pin.OUT) if isinstance(pin, int) else pin
+        if fast:
+            reset_pin.value(0)
+            _sleep_us(_RESET_PULSE_US)
+            reset_pin.value(1)
+            _sleep_us(_POWER_UP_US)
+            return
+        reset_pin.value(1)
+        time.sleep(0.1)
+        reset_pin.value(0)
+        time.sleep(0.5)
+        reset_pin.value(1)
+        time.sleep(0.1)
 
-    def _wakeup(self):  # pylint: disable=no-self-use
-        """Send any special commands/data to wake up PN532"""
+    def _wakeup(self, deadline=None, short=False):  # pylint: disable=no-self-use
+        """Send any special commands/data to wake up PN532, not sleeping past
+        deadline (ticks_ms) when one is given. short pulses the request line
+        for _WAKEUP_PULSE_US and waits the power up time only."""
         if self._req:
             self._req.direction = Direction.OUTPUT
             self._req.value = True
-            time.sleep(0.1)
-            self._req.value = False
-            time.sleep(0.1)
+            if short:
+                self._req.value = False
+                _sleep_us(_WAKEUP_PULSE_US)
+            else:
+                _sleep_ms(100, deadline)
+                self._req.value = False
+                _sleep_ms(100, deadline)
             self._req.value = True
-        time.sleep(0.5)
+        _sleep_ms(_POWER_UP_US // 1000 if short else 500, deadline)
+
+    def power_up(self):
+        """Wake the PN532 after power_down. The I2C address byte wakes it,
+        the frame itself (an ACK here) is lost, then it needs ~2ms."""
+        try:
+            self._write_data(_ACK)
+        except OSError:
+            pass  # the PN532 may not acknowledge its address while waking
+        _sleep_us(_POWER_UP_US)
 
     def _wait_ready(self, timeout=1):
         """Poll PN532 if status byte is ready, up to `timeout` seconds"""
-        # Updated to use time_ns vs time.monotonic of circuitpython
-        status = bytearray(1)
-        timestamp = time.time_ns()/1000000000
-        if self.debug:
-            print("wait ready timestamp:", timestamp)
-        while ((time.time_ns()/1000000000) - timestamp) < timeout:
-            try:
-                # with self._i2c:
-                self._i2c.readfrom_into(_I2C_ADDRESS, status)
-            except OSError:
-                self._wakeup()
-                continue
-            if status == b'\x01':
-                return True  # No longer busy
-            else:
-                time.sleep(0.05)  # lets ask again soon!
-        # Timed out!
+        return self._read_ready(0, _deadline(timeout)) is not None
+
+    def _poll_ready(self, count):
+        """Check once, without waiting, if the PN532 is ready and if so read
+        count bytes with the status byte. Returns a memoryview of the bytes
+        after the status byte, or None if the PN532 is busy (or IRQ is not
+        asserted yet). Bus errors are raised as OSError.
+        """
+        if not self._irq_pending():
+            return None
+        self._irq_flag = False
+        frame = self._rx_view[:count+1]
+        # Without IRQ a long read is only done once the status byte is ready
+        if self._irq is None and count > _POLL_READ_MAX:
+            self._i2c.readfrom_into(_I2C_ADDRESS, frame[:1])
+            if frame[0] != _NOT_BUSY:
+                return None
+        # with self._i2c:
+        self._i2c.readfrom_into(_I2C_ADDRESS, frame)
+        if frame[0] != _NOT_BUSY:
+            return None
         if self.debug:
-            print("wait_ready time.time_ns():", time.time_ns()/1000000000)
-        return False
+            print("_poll_ready frame: ", bytes(frame))
+        return frame[1:]  # don't return the status byte
 
     def _read_data(self, count):
-        """Read a specified count of bytes from the PN532."""
+        """Read a specified count of bytes from the PN532 into the receive
+        buffer and return them as a memoryview."""
         if self.debug:
             print("_read_data")
-        # Build a read request frame.
-        frame = bytearray(count+1)
-        status_byte = bytearray(1)
+        # Frame is read into the receive buffer, after the status byte.
+        frame = self._rx_view[:count+1]
+        status_byte = self._status
         # Updated to use readfrom_into (Circutpython readfrom not supported)
         self._i2c.readfrom_into(_I2C_ADDRESS, status_byte)
         if self.debug:
@@ -132,7 +178,7 @@ class PN532_I2C(PN532):
         # Updated to use readfrom_into (Circutpython readfrom not supported)
         self._i2c.readfrom_into(_I2C_ADDRESS, frame)
         if self.debug:
-            print("_read_data frame: ", frame)
+            print("_read_data frame: ", bytes(frame))
         return frame[1:]   # don't return the status byte
 
     def _write_data(self, framebytes):
@@ -140,4 +186,5 @@ class PN532_I2C(PN532):
         # Updated to using writeto - circuitpython write not supported
         if self.debug:
             print('_write data: ', [hex(i) for i in framebytes])
+        self._irq_flag = False
         self._i2c.writeto(_I2C_ADDRESS, framebytes)
@@ -0,0 +1,152 @@
+"""
+``pn532_linux``
+====================================================
+
+Linux host bindings so the PN532 drivers run on CPython gateways: LinuxI2C
+drives /dev/i2c-N with the machine.I2C calls the drivers use, LinuxPin is a
+machine.Pin for reset and IRQ lines through the sysfs GPIO interface.
+
+Usage::
+
+    i2c = LinuxI2C(1)
+    pn532 = pn532_i2c.PN532_I2C(i2c, irq=LinuxPin(17, LinuxPin.IN),
+                                reset=LinuxPin(27, LinuxPin.OUT))
+
+Every transfer is one I2C_RDWR ioctl: the address travels with each message,
+so no I2C_SLAVE call is needed when several devices share the bus, and the
+PN532 clock stretching is handled by the adapter. The message structures and
+the data buffer are allocated once.
+"""
+
+import ctypes
+import os
+try:
+    import fcntl
+except ImportError:  # not a Unix host
+    fcntl = None
+
+# i2c-dev ioctl and i2c_msg flags, see linux/i2c-dev.h and linux/i2c.h
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+# Largest transfer: a PN532 frame plus the status byte, with room to spare
+_MAX_TRANSFER = 512
+# Addresses probed by scan, the reserved ones excluded
+_SCAN_FIRST = 0x08
+_SCAN_LAST = 0x77
+
+
+class I2CMsg(ctypes.Structure):
+    """struct i2c_msg"""
+    _fields_ = [('addr', ctypes.c_uint16), ('flags', ctypes.c_uint16),
+                ('len', ctypes.c_uint16),
+                ('buf', ctypes.POINTER(ctypes.c_uint8))]
+
+
+class I2CRdwrData(ctypes.Structure):
+    """struct i2c_rdwr_ioctl_data"""
+    _fields_ = [('msgs', ctypes.POINTER(I2CMsg)), ('nmsgs', ctypes.c_uint32)]
+
+
+class LinuxI2C:
+    """machine.I2C subset (scan, readfrom_into, writeto) on /dev/i2c-bus.
+    ioctl replaces fcntl.ioctl, no device is opened then (e.g. with
+    pn532_sim.I2CDevLoopback). ioctls counts the system calls made."""
+
+    def __init__(self, bus=1, *, ioctl=None, max_transfer=_MAX_TRANSFER):
+        if ioctl is None:
+            self._fd = os.open('/dev/i2c-{}'.format(bus), os.O_RDWR)
+            self._ioctl = fcntl.ioctl
+        else:
+            self._fd = -1
+            self._ioctl = ioctl
+        self.ioctls = 0
+        self._data = bytearray(max_transfer)
+        self._view = memoryview(self._data)
+        # The messages point into _data, which must never be resized
+        self._cdata = (ctypes.c_uint8 * max_transfer).from_buffer(self._data)
+        self._msg = I2CMsg(0, 0, 0, ctypes.cast(self._cdata, ctypes.POINTER(
+            ctypes.c_uint8)))
+        self._rdwr = I2CRdwrData(ctypes.pointer(self._msg), 1)
+
+    def close(self):
+        """Close the device"""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _transfer(self, address, flags, count):
+        """One single message I2C_RDWR transaction on the data buffer.
+        Raises OSError (e.g. ENXIO, EREMOTEIO) when the device does not
+        acknowledge."""
+        if count > len(self._data):
+            raise ValueError('Transfer larger than max_transfer')
+        msg = self._msg
+        msg.addr = address
+        msg.flags = flags
+        msg.len = count
+        self.ioctls += 1
+        self._ioctl(self._fd, I2C_RDWR, self._rdwr)
+
+    def readfrom_into(self, address, buf):
+        """machine.I2C.readfrom_into"""
+        count = len(buf)
+        self._transfer(address, I2C_M_RD, count)
+        buf[:] = self._view[:count]
+
+    def writeto(self, address, buf):
+        """machine.I2C.writeto, returns the bytes written"""
+        count = len(buf)
+        self._view[:count] = buf
+        self._transfer(address, 0, count)
+        return count
+
+    def scan(self):
+        """machine.I2C.scan: addresses acknowledging a one byte read"""
+        found = []
+        for address in range(_SCAN_FIRST, _SCAN_LAST + 1):
+            try:
+                self._transfer(address, I2C_M_RD, 1)
+            except OSError:
+                continue
+            found.append(address)
+        return found
+
+
+class LinuxPin:
+    """machine.Pin subset (value, irq) for GPIO number through sysfs
+    (root), exported on first use. Pulls cannot be set from sysfs, wire
+    them externally. irq only records the handler: the PN532 drivers check
+    the IRQ level when no edge was flagged, which costs one read of the
+    value file."""
+
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    IRQ_FALLING = 2
+
+    def __init__(self, number, mode=IN, pull=None, *,  # pylint: disable=unused-argument
+                 root='/sys/class/gpio'):
+        path = '{}/gpio{}'.format(root, number)
+        if not os.path.exists(path):
+            with open(root + '/export', 'w') as export:
+                export.write(str(number))
+        with open(path + '/direction', 'w') as direction:
+            direction.write('out' if mode == self.OUT else 'in')
+        self._value = open(path + '/value', 'r+b', buffering=0)
+        self.handler = None
+
+    def value(self, level=None):
+        """machine.Pin.value"""
+        self._value.seek(0)
+        if level is None:
+            return 1 if self._value.read(1) == b'1' else 0
+        self._value.write(b'1' if level else b'0')
+        return None
+
+    def irq(self, trigger=None, handler=None):  # pylint: disable=unused-argument
+        """Record the handler, the level is polled through value()"""
+        self.handler = handler
+
+    def close(self):
+        """Close the value file, the GPIO stays exported"""
+        self._value.close()
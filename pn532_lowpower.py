@@ -0,0 +1,134 @@
+"""
+``pn532_lowpower``
+====================================================
+
+Battery friendly card detection. The PN532 has no low power card detection
+of its own: passive cards make no RF field, so its RF level wake up only
+catches phones. LowPowerDetector therefore duty cycles:
+
+* power down mode: a short InListPassiveTarget ("fast tap" profile), then
+  PowerDown until the next poll while the ESP32 light sleeps. A phone's
+  field (RF wake up) ends the sleep early through IRQ.
+* autopoll mode: the PN532 polls by itself with InAutoPoll while the ESP32
+  light sleeps until IRQ signals a card.
+
+The wake to UID latency of the last detection is kept in wake_latency_ms
+(and in the stats as LATENCY_WAKE when they are enabled).
+"""
+
+import time
+try:
+    import machine
+except ImportError:  # CPython
+    machine = None
+try:
+    import esp32
+except ImportError:  # not an ESP32
+    esp32 = None
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+from adafruit_pn532 import (_ticks_ms, _ticks_diff, _AUTOPOLL_PERIOD_UNIT,
+                            AUTOPOLL_GENERIC_106, AUTOPOLL_MIFARE)
+from pn532_stats import LATENCY_WAKE
+
+# pylint: disable=bad-whitespace
+MODE_POWER_DOWN = const(0)
+MODE_AUTOPOLL = const(1)
+# Sleep granularity when the host cannot light sleep (CPython, simulator)
+_SLEEP_STEP_MS = const(1)
+
+
+def light_sleep(ms, irq=None):
+    """Sleep up to ms milliseconds, waking early when the irq Pin goes low.
+    ESP32 light sleep keeps RAM and resumes here; elsewhere the pin is
+    checked every millisecond."""
+    if machine is not None and hasattr(machine, 'lightsleep'):
+        if irq is not None and esp32 is not None:
+            esp32.wake_on_ext0(pin=irq, level=esp32.WAKEUP_ALL_LOW)
+        machine.lightsleep(ms)
+        return
+    start = _ticks_ms()
+    while _ticks_diff(_ticks_ms(), start) < ms:
+        if irq is not None and irq.value() == 0:
+            return
+        time.sleep(_SLEEP_STEP_MS / 1000)
+
+
+class LowPowerDetector:
+    """Waits for cards with the PN532 and the host asleep most of the time.
+    interval is the time between polls in seconds (rounded to the 150ms
+    InAutoPoll steps in autopoll mode). irq is the Pin the PN532 IRQ is wired
+    to; autopoll mode needs it. sleep is the function used to sleep,
+    light_sleep by default."""
+
+    def __init__(self, pn532, mode=MODE_POWER_DOWN, interval=0.5, irq=None,
+                 types=(AUTOPOLL_GENERIC_106, AUTOPOLL_MIFARE),
+                 sleep=light_sleep):
+        assert mode == MODE_POWER_DOWN or irq is not None, \
+            'Autopoll mode needs the IRQ pin!'
+        self._pn532 = pn532
+        self.mode = mode
+        self.interval = interval
+        self._irq = irq
+        self._types = types
+        self._sleep = sleep
+        self.wake_latency_ms = None
+        self.polls = 0  # polls (power down) or wake ups (autopoll)
+        if mode == MODE_POWER_DOWN:
+            pn532.rf_configure("fast tap")
+
+    def _detected(self, woke, uid):
+        self.wake_latency_ms = _ticks_diff(_ticks_ms(), woke)
+        stats = self._pn532.stats
+        if stats is not None:
+            stats.sample(LATENCY_WAKE, self.wake_latency_ms * 1000)
+        return uid
+
+    def wait_for_card(self, timeout=None):
+        """Sleep until a card is found and return its UID, or None after
+        timeout seconds (None waits forever)."""
+        if self.mode == MODE_AUTOPOLL:
+            return self._wait_autopoll(timeout)
+        return self._wait_power_down(timeout)
+
+    def _wait_power_down(self, timeout):
+        pn532 = self._pn532
+        start = woke = _ticks_ms()
+        while True:
+            self.polls += 1
+            targets = pn532.list_passive_targets(1, timeout=0.1)
+            if targets:
+                return self._detected(woke, targets[0].uid)
+            if timeout is not None and \
+                    _ticks_diff(_ticks_ms(), start) >= timeout * 1000:
+                return None
+            pn532.power_down()
+            self._sleep(int(self.interval * 1000), self._irq)
+            woke = _ticks_ms()
+            pn532.power_up()
+
+    def _wait_autopoll(self, timeout):
+        pn532 = self._pn532
+        period = max(1, min(15, int(self.interval / _AUTOPOLL_PERIOD_UNIT
+                                    + 0.5)))
+        if not pn532.auto_poll_start(self._types, period):
+            return None
+        start = _ticks_ms()
+        while True:
+            remaining = None
+            if timeout is not None:
+                remaining = int(timeout * 1000) - _ticks_diff(_ticks_ms(),
+                                                              start)
+                if remaining <= 0:
+                    pn532.auto_poll_stop()
+                    return None
+            self._sleep(remaining if remaining is not None else 60000,
+                        self._irq)
+            woke = _ticks_ms()
+            self.polls += 1
+            targets = pn532.auto_poll_result()
+            if targets:
+                return self._detected(woke, targets[0].uid)
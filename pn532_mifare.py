@@ -0,0 +1,165 @@
+"""
+``pn532_mifare``
+====================================================
+
+Sector at a time Mifare Classic access on top of the PN532 driver. A
+MifareClassicSession authenticates once per sector, reads the blocks of the
+sector back to back and remembers which key opened each sector of each card,
+so repeat taps go straight to the working key.
+"""
+
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+from adafruit_pn532 import MIFARE_CMD_AUTH_A, MIFARE_CMD_AUTH_B
+
+# pylint: disable=bad-whitespace
+MIFARE_CLASSIC_1K = const(1024)
+MIFARE_CLASSIC_4K = const(4096)
+_BLOCK_SIZE = const(16)
+# Sectors 0-31 have 4 blocks, the 8 sectors above them (4K only) have 16
+_SMALL_SECTORS = const(32)
+
+# Factory default (transport) key
+KEY_DEFAULT = b'\xff\xff\xff\xff\xff\xff'
+
+_KEY_TYPES = (MIFARE_CMD_AUTH_A, MIFARE_CMD_AUTH_B)
+
+
+def sector_blocks(sector):
+    """(first block, block count) of sector"""
+    if sector < _SMALL_SECTORS:
+        return sector * 4, 4
+    return _SMALL_SECTORS * 4 + (sector - _SMALL_SECTORS) * 16, 16
+
+
+def sector_count(size):
+    """Number of sectors of a card with size bytes (1K or 4K)"""
+    if size <= _SMALL_SECTORS * 4 * _BLOCK_SIZE:
+        return size // (4 * _BLOCK_SIZE)
+    return _SMALL_SECTORS + (size - _SMALL_SECTORS * 4 * _BLOCK_SIZE) // (
+        16 * _BLOCK_SIZE)
+
+
+class MifareClassicSession:
+    """Reads Mifare Classic cards a sector at a time. keys is the list of
+    6 byte keys to try, each as key A then key B. The key that worked for a
+    (uid, sector) is kept in an LRU of up to cache_size entries."""
+
+    def __init__(self, pn532, keys=(KEY_DEFAULT,), cache_size=64):
+        self._pn532 = pn532
+        self.keys = list(keys)
+        self._cache_size = cache_size
+        # (uid, sector) entries, most recent last, and the key of each
+        self._lru = []
+        self._lru_keys = {}
+        self.auth_failures = 0
+        # False once the card uid dropped to idle after a failed command
+        self._uid = None
+        self._active = True
+
+    def _cached(self, uid, sector):
+        entry = (uid, sector)
+        found = self._lru_keys.get(entry)
+        if found is not None:
+            self._lru.remove(entry)
+            self._lru.append(entry)
+        return found
+
+    def _remember(self, uid, sector, key_type, key_index):
+        entry = (uid, sector)
+        if entry in self._lru_keys:
+            self._lru.remove(entry)
+        elif len(self._lru) >= self._cache_size:
+            del self._lru_keys[self._lru.pop(0)]
+        self._lru.append(entry)
+        self._lru_keys[entry] = (key_type, key_index)
+
+    def forget(self, uid=None):
+        """Drop the remembered keys of uid, or of every card"""
+        if uid is None:
+            self._lru = []
+            self._lru_keys = {}
+            return
+        uid = bytes(uid)
+        for entry in [entry for entry in self._lru if entry[0] == uid]:
+            self._lru.remove(entry)
+            del self._lru_keys[entry]
+
+    def _candidates(self, uid, sector):
+        cached = self._cached(uid, sector)
+        if cached is not None:
+            yield cached
+        for key_index in range(len(self.keys)):
+            for key_type in _KEY_TYPES:
+                if (key_type, key_index) != cached:
+                    yield key_type, key_index
+
+    def _reactivate(self, uid):
+        """A failed authentication drops the card back to idle, select it
+        again. Returns False if the card is gone (or another one answered)."""
+        targets = self._pn532.list_passive_targets(1, timeout=0.1)
+        self._active = bool(targets) and targets[0].uid == uid
+        return self._active
+
+    def authenticate(self, uid, sector):
+        """Open sector of card uid, the remembered key first. uid should be
+        the card just found by read_passive_target. Returns (key type, key
+        index) of the key that worked or None."""
+        uid = bytes(uid)
+        if uid != self._uid:
+            # Another card, just found and still selected
+            self._uid = uid
+            self._active = True
+        first_block = sector_blocks(sector)[0]
+        for key_type, key_index in self._candidates(uid, sector):
+            if not self._active and not self._reactivate(uid):
+                return None
+            if self._pn532.mifare_classic_authenticate_block(
+                    uid, first_block, key_type, self.keys[key_index]):
+                self._remember(uid, sector, key_type, key_index)
+                return key_type, key_index
+            self.auth_failures += 1
+            self._active = False
+        return None
+
+    def read_sector(self, uid, sector, into=None, trailer=True):
+        """Authenticate and read every block of sector (the trailer too
+        unless trailer is False) into into, a buffer of the sector size
+        (allocated if None). Returns the buffer or None on failure; blocks
+        left unread are untouched."""
+        first_block, blocks = sector_blocks(sector)
+        if into is None:
+            into = bytearray(blocks * _BLOCK_SIZE)
+        if self.authenticate(uid, sector) is None:
+            return None
+        view = memoryview(into)
+        if not trailer:
+            blocks -= 1
+        for block in range(blocks):
+            offset = block * _BLOCK_SIZE
+            if self._pn532.mifare_classic_read_block(
+                    first_block + block,
+                    view[offset:offset+_BLOCK_SIZE]) is None:
+                self._active = False
+                return None
+        return into
+
+    def read_card(self, uid, size=MIFARE_CLASSIC_1K, into=None, trailer=True):
+        """Read the whole card (size bytes, 1K or 4K) into one buffer, into
+        or a new bytearray. Returns (buffer, list of the sectors that could not
+        be read); unread sectors are left zero filled."""
+        if into is None:
+            into = bytearray(size)
+        view = memoryview(into)
+        failed = []
+        for sector in range(sector_count(size)):
+            first_block, blocks = sector_blocks(sector)
+            offset = first_block * _BLOCK_SIZE
+            if self.read_sector(uid, sector,
+                                view[offset:offset+blocks*_BLOCK_SIZE],
+                                trailer) is None:
+                failed.append(sector)
+        return into, failed
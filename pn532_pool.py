@@ -0,0 +1,272 @@
+"""
+``pn532_pool``
+====================================================
+
+Several PN532 readers polled by one host. The PN532 I2C address is fixed, so
+readers sit behind a TCA9548A style multiplexer (a MuxChannel per reader
+stands in for machine.I2C) and/or on separate buses.
+
+ReaderPool keeps an InListPassiveTarget in flight on every reader: commands
+are written without waiting, then each reader's ACK and response are picked
+up as soon as it is ready, so the RF time of one reader overlaps the bus
+work of the others. The commands go through the steps of call_function, so
+corrupted responses are asked for again with a NACK, bus errors wake the
+PN532 up and the reader stats are recorded. Readers are restarted round
+robin or by priority, at most max_active at once (to keep neighbouring
+antennas from interfering). A reader failing max_failures polls in a row is
+left alone for retry_after seconds.
+
+Usage::
+
+    mux = TCA9548A(i2c)
+    readers = [pn532_i2c.PN532_I2C(MuxChannel(mux, n)) for n in range(4)]
+    pool = ReaderPool(readers)
+    while True:
+        for reader, targets in pool.poll():
+            if targets:
+                print(reader.index, targets[0].uid)
+"""
+
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+from adafruit_pn532 import (_ACK, _COMMAND_INLISTPASSIVETARGET,
+                            _MIFARE_ISO14443A, _TARGET_RECORD_MAX, BusyError,
+                            _deadline, _earlier, _sleep_us, _ticks_add,
+                            _ticks_diff, _ticks_ms)
+
+# pylint: disable=bad-whitespace
+_TCA9548A_ADDRESS = const(0x70)
+SCHEDULE_ROUND_ROBIN = const(0)
+SCHEDULE_PRIORITY = const(1)
+# Reader phases
+_IDLE = const(0)
+_ACK_WAIT = const(1)
+_RESPONSE_WAIT = const(2)
+# Pause between passes over the readers when none of them was ready
+_IDLE_PASS_US = const(200)
+# Time a command write may take with its retries after bus errors, so a
+# dead reader does not hold up the others
+_WRITE_MS = const(5)
+
+
+class TCA9548A:
+    """TCA9548A I2C multiplexer at address on i2c. The selected channel is
+    remembered, so a channel switch costs one byte only when it changes."""
+
+    def __init__(self, i2c, address=_TCA9548A_ADDRESS):
+        self._i2c = i2c
+        self._address = address
+        self._mask = bytearray(1)
+        self.selected = None
+        self.switches = 0
+
+    def select(self, channel):
+        """Connect channel (0 to 7) to the bus"""
+        if channel == self.selected:
+            return
+        self._mask[0] = 1 << channel
+        self.selected = None  # unknown until the write went through
+        self._i2c.writeto(self._address, self._mask)
+        self.selected = channel
+        self.switches += 1
+
+
+class MuxChannel:
+    """One TCA9548A channel, the machine.I2C calls of the PN532 driver"""
+
+    def __init__(self, mux, channel):
+        self._mux = mux
+        self._channel = channel
+
+    def readfrom_into(self, address, buf):
+        """machine.I2C.readfrom_into on this channel"""
+        self._mux.select(self._channel)
+        self._mux._i2c.readfrom_into(address, buf)  # pylint: disable=protected-access
+
+    def writeto(self, address, buf):
+        """machine.I2C.writeto on this channel"""
+        self._mux.select(self._channel)
+        return self._mux._i2c.writeto(address, buf)  # pylint: disable=protected-access
+
+
+class PoolReader:
+    """A reader of the pool and its health: polls completed, cards (polls
+    that found a target), failures in total and in a row, the last error,
+    and retry_at (ticks_ms) while it is left alone."""
+
+    def __init__(self, index, pn532, priority):
+        self.index = index
+        self.pn532 = pn532
+        self.priority = priority
+        self.polls = 0
+        self.cards = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.retry_at = None
+        self._phase = _IDLE
+        self._deadline = 0
+        self._retries = 0  # NACKs left for the response
+
+    def __repr__(self):
+        return ("PoolReader(index={}, polls={}, cards={}, failures={},"
+                " healthy={}, last_error={})".format(
+                    self.index, self.polls, self.cards, self.failures,
+                    self.healthy, self.last_error))
+
+    @property
+    def healthy(self):
+        """False while the reader is left alone after failing"""
+        return self.retry_at is None
+
+
+class ReaderPool:
+    """Polls readers (PN532 instances) for cards with overlapping commands.
+    schedule is SCHEDULE_ROUND_ROBIN or SCHEDULE_PRIORITY (strict, higher
+    priorities first; it only matters when max_active limits the readers
+    polling at once). timeout bounds one InListPassiveTarget, configure the
+    readers with a short passive retry count (rf_configure("fast tap")) so
+    "no card" answers come back quickly."""
+
+    def __init__(self, readers, *, schedule=SCHEDULE_ROUND_ROBIN,
+                 priorities=None, max_active=None, card_baud=_MIFARE_ISO14443A,
+                 timeout=0.1, max_failures=3, retry_after=1):
+        if priorities is None:
+            priorities = [0] * len(readers)
+        self.readers = [PoolReader(i, pn532, priority) for i, (pn532, priority)
+                        in enumerate(zip(readers, priorities))]
+        self.schedule = schedule
+        self.max_active = max_active or len(readers)
+        self.timeout_ms = int(timeout * 1000)
+        self.max_failures = max_failures
+        self.retry_after_ms = int(retry_after * 1000)
+        self._card_baud = card_baud
+        self._params = bytes([0x01, card_baud])
+        self._active = 0
+        self._next = 0  # round robin position
+
+    def _failed(self, reader, error, now):
+        reader._phase = _IDLE  # pylint: disable=protected-access
+        self._active -= 1
+        reader.failures += 1
+        reader.consecutive_failures += 1
+        reader.last_error = error
+        if reader.consecutive_failures >= self.max_failures:
+            reader.retry_at = _ticks_add(now, self.retry_after_ms)
+
+    def _start(self, reader, now):
+        """Write InListPassiveTarget to reader, without waiting for the ACK"""
+        # pylint: disable=protected-access
+        self._active += 1
+        reader._phase = _ACK_WAIT
+        reader._deadline = _ticks_add(now, self.timeout_ms)
+        # The steps of PN532.call_function, the ready-waits are replaced by
+        # one _poll_ready per pass
+        if not reader.pn532._begin_command(
+                _COMMAND_INLISTPASSIVETARGET, self._params,
+                _earlier(_ticks_add(now, _WRITE_MS), reader._deadline)):
+            self._failed(reader, 'bus error', now)
+
+    def _advance(self, reader, now):
+        """Pick up the ACK or response of reader if it is ready. Returns the
+        targets found once its poll completed, else None."""
+        # pylint: disable=protected-access
+        pn532 = reader.pn532
+        if _ticks_diff(reader._deadline, now) <= 0:
+            pn532._no_response("pool timeout")
+            self._failed(reader, 'timeout', now)
+            return None
+        if not pn532._irq_pending():
+            return None
+        try:
+            if reader._phase == _ACK_WAIT:
+                frame = pn532._poll_ready(len(_ACK))
+                if frame is not None:
+                    pn532._take_ack(frame)
+                    reader._phase = _RESPONSE_WAIT
+                    reader._retries = pn532.nack_retries
+                return None
+            frame = pn532._poll_ready(1+_TARGET_RECORD_MAX+2+8)
+            if frame is None:
+                return None
+            response = pn532._take_response(
+                _COMMAND_INLISTPASSIVETARGET, frame, False, reader._retries,
+                reader._deadline)
+            if response is None:
+                reader._retries -= 1  # asked again with a NACK
+                return None
+        except OSError:
+            # Woken up, the ACK or response is read again on the next pass
+            pn532._recover(reader._deadline)
+            return None
+        except (RuntimeError, BusyError) as error:
+            pn532._command_error(error)
+            pn532._abort()
+            self._failed(reader, repr(error), now)
+            return None
+        targets = pn532._found_targets(
+            pn532._end_command(self._params, response), 1, self._card_baud)
+        reader._phase = _IDLE
+        self._active -= 1
+        reader.polls += 1
+        reader.consecutive_failures = 0
+        if targets:
+            reader.cards += 1
+        return targets
+
+    def _idle_readers(self, now):
+        """Readers that may start a poll, in scheduling order"""
+        readers = self.readers
+        count = len(readers)
+        order = [readers[(self._next + i) % count] for i in range(count)]
+        if self.schedule == SCHEDULE_PRIORITY:
+            order.sort(key=lambda reader: -reader.priority)
+        idle = []
+        for reader in order:
+            if reader._phase != _IDLE:  # pylint: disable=protected-access
+                continue
+            if reader.retry_at is not None:
+                if _ticks_diff(reader.retry_at, now) > 0:
+                    continue
+                reader.retry_at = None  # try it again
+            idle.append(reader)
+        return idle
+
+    def step(self):
+        """One pass over the readers without waiting: collect what is
+        ready, then start idle readers up to max_active. Returns the
+        completed polls as [(PoolReader, targets), ...]."""
+        now = _ticks_ms()
+        done = []
+        for reader in self.readers:
+            if reader._phase != _IDLE:  # pylint: disable=protected-access
+                targets = self._advance(reader, now)
+                if targets is not None:
+                    done.append((reader, targets))
+        for reader in self._idle_readers(now):
+            if self._active >= self.max_active:
+                break
+            self._start(reader, now)
+            self._next = (reader.index + 1) % len(self.readers)
+        return done
+
+    def poll(self, timeout=0.2):
+        """Step until at least one poll completed or timeout seconds passed.
+        Returns the completed polls as [(PoolReader, targets), ...]."""
+        deadline = _deadline(timeout)
+        while True:
+            done = self.step()
+            if done or _ticks_diff(deadline, _ticks_ms()) <= 0:
+                return done
+            _sleep_us(_IDLE_PASS_US)
+
+    def stop(self):
+        """Abort the polls in flight, e.g. before using a reader directly"""
+        for reader in self.readers:
+            if reader._phase != _IDLE:  # pylint: disable=protected-access
+                reader.pn532._abort()  # pylint: disable=protected-access
+                reader._phase = _IDLE  # pylint: disable=protected-access
+        self._active = 0
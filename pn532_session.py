@@ -0,0 +1,93 @@
+"""
+``pn532_session``
+====================================================
+
+Keeps a card selected while it stays in the field. Instead of a new
+InListPassiveTarget (anticollision and selection) on every loop, the selected
+target is checked with one tiny exchange, and InRelease is only sent when it
+is gone:
+
+* ISO14443-4 cards: Diagnose attention request
+* NFC Forum Type 2 tags (NTAG, Ultralight): READ of page 0
+* Mifare Classic: InDeselect then InSelect (HLTA, WUPA + SELECT by UID),
+  a READ would need an authentication. Authentications are lost.
+"""
+
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+from adafruit_pn532 import _deadline, _remaining
+from pn532_stats import LATENCY_PRESENCE, _ticks_us, _ticks_diff
+
+# pylint: disable=bad-whitespace
+_ISO14443A = const(0x00)
+# SEL_RES bits: ISO14443-4 compliant, Mifare Classic
+_SEL_RES_ISO14443_4 = const(0x20)
+_SEL_RES_MIFARE_CLASSIC = const(0x08)
+
+
+class TargetSession:
+    """The card found by poll() stays selected until a presence check fails.
+    new tells whether the target returned by the last poll() was just found,
+    checks counts presence checks and departures the cards seen leaving."""
+
+    def __init__(self, pn532, card_baud=_ISO14443A):
+        self._pn532 = pn532
+        self._card_baud = card_baud
+        self.target = None
+        self.new = False
+        self.checks = 0
+        self.departures = 0
+        self._block = bytearray(16)
+
+    def poll(self, timeout=0.2):
+        """The Target in the field, or None. A selected target only gets a
+        presence check; once it is gone (or if there was none) the PN532
+        looks for a card. All of it takes up to timeout seconds."""
+        deadline = _deadline(timeout)
+        if self.target is not None:
+            if self.present(timeout):
+                self.new = False
+                return self.target
+            self.release(_remaining(deadline))
+            self.departures += 1
+        targets = self._pn532.list_passive_targets(1, self._card_baud,
+                                                   _remaining(deadline))
+        self.new = bool(targets)
+        if not targets:
+            return None
+        self.target = targets[0]
+        return self.target
+
+    def present(self, timeout=1):
+        """True if the selected target answers within timeout seconds"""
+        target = self.target
+        if target is None:
+            return False
+        pn532 = self._pn532
+        stats = pn532.stats
+        if stats is not None:
+            start = _ticks_us()
+        self.checks += 1
+        if target.sel_res is None or target.sel_res & _SEL_RES_ISO14443_4:
+            found = pn532.diagnose_attention(timeout)
+        elif target.sel_res & _SEL_RES_MIFARE_CLASSIC:
+            deadline = _deadline(timeout)
+            found = pn532.in_deselect(target.tg, timeout) and \
+                pn532.in_select(target.tg, _remaining(deadline))
+        else:
+            found = pn532.mifare_classic_read_block(0, self._block,
+                                                    timeout) is not None
+        if stats is not None:
+            stats.sample(LATENCY_PRESENCE, _ticks_diff(_ticks_us(), start))
+        return bool(found)
+
+    def release(self, timeout=1):
+        """Forget the selected target, the PN532 releases it (InRelease)
+        within timeout seconds"""
+        if self.target is not None:
+            self._pn532.in_release(self.target.tg, timeout)
+        self.target = None
+        self.new = False
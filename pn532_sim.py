@@ -0,0 +1,991 @@
+"""
+``pn532_sim``
+====================================================
+
+Hardware-free PN532 emulator for running and benchmarking the driver on
+CPython. PN532Simulator implements the I2C readfrom_into/writeto contract of
+machine.I2C at the PN532 address and answers real frames (ACK, GetFirmwareVersion,
+SAMConfiguration, InListPassiveTarget, InAutoPoll, InSelect/InDeselect,
+InDataExchange with MI chaining and InCommunicateThru) for the virtual tags
+placed in its field: NTAG2xx, MifareClassic1K and Type4Tag. I2CDevLoopback
+stands in for the i2c-dev kernel driver under pn532_linux.LinuxI2C.
+
+Usage::
+
+    tag = NTAG2xx(NTAG215)
+    bus = PN532Simulator(tags=[tag], latency_us=800)
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+
+"""
+
+import ctypes
+import random
+import time
+
+from pn532_linux import I2C_RDWR, I2C_M_RD
+
+_I2C_ADDRESS = 0x24
+
+# InDataExchange / InCommunicateThru status codes
+STATUS_OK = 0x00
+STATUS_TIMEOUT = 0x01
+STATUS_AUTH_ERROR = 0x14
+# Status / Tg bit for more data in a chained InDataExchange, and the largest
+# response part the PN532 returns in a normal frame
+MORE_INFORMATION = 0x40
+DATA_EXCHANGE_CHUNK = 252
+
+# One passive activation attempt without a card (REQA and its timeout, RF
+# field settling), MxRtyPassiveActivation + 1 of them before NbTg = 0
+PASSIVE_ATTEMPT_US = 1000
+# Frame delay time and start/end of frame of every RF exchange
+FRAME_DELAY_US = 100
+# Oscillator start after a wake up from PowerDown
+POWER_UP_US = 1500
+
+# NTAG2xx sizes in pages
+NTAG213 = 45
+NTAG215 = 135
+NTAG216 = 231
+
+# InPSL BRit / BRti codes
+_BITRATES_KBPS = (106, 212, 424, 848)
+
+# SetSerialBaudRate BR codes
+_BAUDRATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+_CC_SIZE = {NTAG213: 0x12, NTAG215: 0x3E, NTAG216: 0x6D}
+_ACK = b'\x00\x00\xFF\x00\xFF\x00'
+
+
+def _now_us():
+    return time.monotonic_ns() // 1000
+
+
+def _frame(data):
+    """Build a PN532 to host information frame around data"""
+    length = len(data)
+    checksum = (~sum(data) + 1) & 0xFF
+    return bytes([0x00, 0x00, 0xFF, length, (~length + 1) & 0xFF]) + \
+        bytes(data) + bytes([checksum, 0x00])
+
+
+class NTAG2xx:
+    """Virtual NTAG213/215/216 (NFC Forum Type 2) tag. ndef is an optional
+    NDEF message stored in an NDEF TLV from page 4. Set fast_read=False to
+    emulate a tag without FAST_READ (e.g. NTAG203)."""
+
+    sens_res = b'\x00\x44'
+    sel_res = 0x00
+
+    def __init__(self, pages=NTAG215, uid=b'\x04\x5a\x1b\x72\x9c\x3e\x80',
+                 ndef=None, fast_read=True):
+        self.uid = bytes(uid)
+        self.pages = pages
+        self.fast_read = fast_read
+        self.memory = bytearray(4 * pages)
+        self.memory[0:3] = self.uid[0:3]
+        self.memory[3] = 0x88 ^ uid[0] ^ uid[1] ^ uid[2]
+        self.memory[4:8] = self.uid[3:7]
+        self.memory[8] = uid[3] ^ uid[4] ^ uid[5] ^ uid[6]
+        self.memory[12:16] = bytes([0xE1, 0x10, _CC_SIZE.get(pages, 0x12),
+                                    0x00])
+        self.memory[16] = 0xFE  # empty tag, Terminator TLV
+        if ndef is not None:
+            self.set_ndef(ndef)
+        self.halted = False
+
+    # EEPROM programming time of a page WRITE (datasheet 4.1ms)
+    write_us = 4100
+
+    def set_ndef(self, message):
+        """Store message in an NDEF TLV followed by a Terminator TLV"""
+        if len(message) < 0xFF:
+            tlv = bytes([0x03, len(message)]) + bytes(message) + b'\xFE'
+        else:
+            tlv = bytes([0x03, 0xFF, len(message) >> 8, len(message) & 0xFF]) \
+                + bytes(message) + b'\xFE'
+        self.memory[16:16+len(tlv)] = tlv
+
+    def activate(self):
+        """Selected by the reader"""
+        self.halted = False
+
+    def exchange(self, data):
+        """Handle a tag command, returns (status, response bytes)"""
+        if self.halted:
+            return STATUS_TIMEOUT, b''
+        command = data[0]
+        if command == 0x30 and len(data) == 2:  # READ, 4 pages with roll over
+            page = data[1]
+            if page >= self.pages:
+                return self._nak()
+            return STATUS_OK, self._read4(page)
+        if command == 0x3A and len(data) == 3:  # FAST_READ
+            start, end = data[1], data[2]
+            if not self.fast_read or start > end or end >= self.pages:
+                return self._nak()
+            return STATUS_OK, bytes(self.memory[4*start:4*(end+1)])
+        if command in (0xA2, 0xA0) and len(data) >= 6:  # WRITE, COMPAT WRITE
+            page = data[1]
+            if page < 3 or page >= self.pages:
+                return self._nak()
+            self.memory[4*page:4*page+4] = data[2:6]
+            return STATUS_OK, b''
+        return self._nak()
+
+    def _read4(self, page):
+        out = bytearray(16)
+        for i in range(16):
+            out[i] = self.memory[(4*page + i) % len(self.memory)]
+        return bytes(out)
+
+    def _nak(self):
+        # A NAK sends the tag back to IDLE, it has to be selected again
+        self.halted = True
+        return STATUS_TIMEOUT, b''
+
+
+class MifareClassic1K:
+    """Virtual Mifare Classic 1K card. keys is an optional list of 16
+    (key_a, key_b) pairs, defaulting to the transport key FFFFFFFFFFFF."""
+
+    sens_res = b'\x00\x04'
+    sel_res = 0x08
+
+    def __init__(self, uid=b'\xde\xad\xbe\xef', keys=None, data=None):
+        self.uid = bytes(uid)
+        self.keys = list(keys) if keys else [(b'\xff' * 6, b'\xff' * 6)] * 16
+        self.memory = bytearray(data) if data else bytearray(1024)
+        self.memory[0:4] = self.uid
+        self.memory[4] = uid[0] ^ uid[1] ^ uid[2] ^ uid[3]
+        self.authenticated = None
+        self.halted = False
+
+    # EEPROM programming time of a block WRITE
+    write_us = 2500
+
+    def activate(self):
+        """Selected by the reader, any authentication is lost"""
+        self.halted = False
+        self.authenticated = None
+
+    def exchange(self, data):
+        """Handle a card command, returns (status, response bytes)"""
+        if self.halted:
+            return STATUS_TIMEOUT, b''
+        command = data[0]
+        if command in (0x60, 0x61) and len(data) >= 12:  # AUTH A / AUTH B
+            sector = data[1] // 4
+            key = bytes(data[2:8])
+            expected = self.keys[sector][command - 0x60]
+            if key != expected or bytes(data[8:12]) != self.uid[:4]:
+                self.halted = True
+                self.authenticated = None
+                return STATUS_AUTH_ERROR, b''
+            self.authenticated = sector
+            return STATUS_OK, b''
+        if command == 0x30 and len(data) == 2:  # READ
+            block = data[1]
+            if block >= 64 or block // 4 != self.authenticated:
+                self.halted = True
+                return STATUS_TIMEOUT, b''
+            out = bytes(self.memory[16*block:16*block+16])
+            if block % 4 == 3:  # keys are not readable
+                out = b'\x00' * 6 + out[6:10] + b'\x00' * 6
+            return STATUS_OK, out
+        if command == 0xA0 and len(data) == 18:  # WRITE
+            block = data[1]
+            if block == 0 or block >= 64 or block // 4 != self.authenticated:
+                self.halted = True
+                return STATUS_TIMEOUT, b''
+            self.memory[16*block:16*block+16] = data[2:18]
+            return STATUS_OK, b''
+        self.halted = True
+        return STATUS_TIMEOUT, b''
+
+
+# Type 4 tag NDEF application and files
+_NDEF_AID = b'\xD2\x76\x00\x00\x85\x01\x01'
+_CC_FILE = 0xE103
+_NDEF_FILE = 0xE104
+_SW_OK = b'\x90\x00'
+_SW_WRONG_LENGTH = b'\x67\x00'
+_SW_NOT_ALLOWED = b'\x69\x86'
+_SW_NOT_FOUND = b'\x6A\x82'
+_SW_WRONG_OFFSET = b'\x6B\x00'
+_SW_INS_NOT_SUPPORTED = b'\x6D\x00'
+
+
+class Type4Tag:
+    """Virtual NFC Forum Type 4 tag: an ISO14443-4 card with the NDEF
+    application (DESFire, a phone emulating a tag). ndef is the message of an
+    NDEF file of file_size bytes, mle the largest READ BINARY answer the
+    capability container allows (extended APDUs above 256). ta is the TA(1)
+    byte of the ATS (bit rates, 0x77: up to 848kbps, different both ways
+    allowed) and pps_limit the fastest rate a PPS really succeeds at, to
+    emulate a card or antenna that cannot keep up."""
+
+    sens_res = b'\x03\x44'
+    sel_res = 0x20
+    frame_size = 256
+    write_us = 0
+
+    def __init__(self, uid=b'\x04\x31\x82\x4a\xd2\x5e\x80', ndef=None,
+                 file_size=4096, mle=0xFFFF, ta=0x77, pps_limit=848):
+        self.uid = bytes(uid)
+        self.mle = mle
+        # ATS: TL, T0 (TA, TB, TC present, FSCI 8: 256 byte frames), TA, TB,
+        # TC, historical byte
+        self.ats = bytes([0x06, 0x78, ta, 0x81, 0x02, 0x80])
+        self.pps_limit = pps_limit
+        cc = bytes([0x00, 0x0F, 0x20, mle >> 8, mle & 0xFF, 0x00, 0xFF,
+                    0x04, 0x06, _NDEF_FILE >> 8, _NDEF_FILE & 0xFF,
+                    file_size >> 8, file_size & 0xFF, 0x00, 0x00])
+        self.files = {_CC_FILE: cc, _NDEF_FILE: bytearray(file_size)}
+        if ndef is not None:
+            self.set_ndef(ndef)
+        self.halted = False
+        self._application = False
+        self._file = None
+
+    def set_ndef(self, message):
+        """Store message in the NDEF file after its 2 byte length"""
+        data = self.files[_NDEF_FILE]
+        data[0:2] = bytes([len(message) >> 8, len(message) & 0xFF])
+        data[2:2+len(message)] = message
+
+    def activate(self):
+        """Selected by the reader (RATS), nothing is selected on the card"""
+        self.halted = False
+        self._application = False
+        self._file = None
+
+    def pps(self, to_card, from_card):
+        """PPS request for the bit rates in kbps, True if the card answers"""
+        ta = self.ats[2]
+        for kbps, allowed in ((to_card, ta), (from_card, ta >> 4)):
+            if kbps != 106 and (kbps > self.pps_limit or not allowed & (
+                    1 << (_BITRATES_KBPS.index(kbps) - 1))):
+                return False
+        return not ta & 0x80 or to_card == from_card
+
+    def exchange(self, apdu):
+        """Handle a command APDU, returns (status, response APDU)"""
+        if self.halted:
+            return STATUS_TIMEOUT, b''
+        if len(apdu) < 4:
+            return STATUS_OK, _SW_WRONG_LENGTH
+        ins, p1, p2 = apdu[1], apdu[2], apdu[3]
+        if ins == 0xA4:  # SELECT
+            data = apdu[5:5+apdu[4]] if len(apdu) > 4 else b''
+            if p1 == 0x04 and data == _NDEF_AID:
+                self._application = True
+                self._file = None
+                return STATUS_OK, _SW_OK
+            if p1 == 0x00 and self._application and len(data) == 2 and \
+                    (data[0] << 8 | data[1]) in self.files:
+                self._file = data[0] << 8 | data[1]
+                return STATUS_OK, _SW_OK
+            return STATUS_OK, _SW_NOT_FOUND
+        if ins == 0xB0:  # READ BINARY
+            if self._file is None:
+                return STATUS_OK, _SW_NOT_ALLOWED
+            if len(apdu) == 5:
+                length = apdu[4] or 256
+            elif len(apdu) == 7 and apdu[4] == 0x00:
+                length = (apdu[5] << 8 | apdu[6]) or 65536
+            else:
+                return STATUS_OK, _SW_WRONG_LENGTH
+            data = self.files[self._file]
+            offset = p1 << 8 | p2
+            if offset > len(data):
+                return STATUS_OK, _SW_WRONG_OFFSET
+            return STATUS_OK, bytes(data[offset:offset+length]) + _SW_OK
+        return STATUS_OK, _SW_INS_NOT_SUPPORTED
+
+
+class SimPin:
+    """IRQ pin of the simulated PN532, low while data is ready to be read"""
+
+    IRQ_FALLING = 2
+
+    def __init__(self, simulator):
+        self._simulator = simulator
+        self.handler = None
+
+    def value(self):
+        """0 when the PN532 has an ACK or response ready, always 1 once
+        SAMConfiguration turned the IRQ pin off"""
+        simulator = self._simulator
+        return 0 if simulator.irq_enabled and simulator.ready() else 1
+
+    def irq(self, trigger=None, handler=None):  # pylint: disable=unused-argument
+        """Record the handler, pin levels are checked by value()"""
+        self.handler = handler
+
+
+class SimOutputPin:
+    """Output pin (chip select) driven by the host, the simulator watches
+    its level"""
+
+    def __init__(self, on_change=None):
+        self.level = 1
+        self._on_change = on_change
+
+    def value(self, level=None):
+        """machine.Pin.value"""
+        if level is None:
+            return self.level
+        if level != self.level and self._on_change is not None:
+            self._on_change(level)
+        self.level = level
+        return None
+
+
+class _PN532Chip:
+    """PN532 command processing shared by the bus front ends. latency_us is
+    the command processing time before a response is ready; RF exchanges with
+    tags take time as well, at rf_kbps. corrupt is the probability that a
+    response frame reaches the host with one bit flipped (fault injection,
+    seeded by seed; NACK gets a clean copy with the same odds). bus_errors is
+    the probability that a bus transaction fails with OSError (EIO) before
+    any data moves. reset_pin is the RSTPD_N input: the chip is held in reset
+    while it is low and takes boot_us to start once it goes high, its I2C
+    address is not acknowledged meanwhile. The counters transactions,
+    bytes_read, bytes_written, commands, corrupted, nacks and bus_failures
+    can be cleared with reset_counters().
+    """
+
+    def __init__(self, tags=(), latency_us=500, rf_kbps=106,
+                 firmware=(0x32, 0x01, 0x06, 0x07), corrupt=0.0, seed=1,
+                 bus_errors=0.0, boot_us=0):
+        self.tags = list(tags)
+        self.boot_us = boot_us
+        self.reset_pin = SimOutputPin(self._reset_level)
+        self._in_reset = False
+        self._boot_at = 0
+        self.corrupt = corrupt
+        self.bus_errors = bus_errors
+        self._random = random.Random(seed)
+        self.latency_us = latency_us
+        self.rf_kbps = rf_kbps
+        # (kbps to, from) the current target, changed by InPSL
+        self.bitrate = (rf_kbps, rf_kbps)
+        self.firmware = firmware
+        self.irq_pin = SimPin(self)
+        self.irq_enabled = True  # SAMConfiguration IRQ parameter
+        self.targets = {}  # Tg -> tag activated by InListPassiveTarget
+        self.current = 1  # Tg of the target InCommunicateThru talks to
+        # InDataExchange chaining (MI bit): command so far, response left
+        self._chain_in = b''
+        self._chain_out = b''
+        self._pending = []  # [(ready_at_us, data), ...]
+        self._last_response = None
+        self._new_baudrate = None  # applied when the host ACKs
+        # RFConfiguration state
+        self.rf_field = True
+        self.passive_retries = 0xFF
+        self.rf_timeout_us = 51200  # wait for a target answer
+        self.com_retries = 0
+        # Endless InAutoPoll waiting for a tag, (period + types, start us)
+        self._autopoll = None
+        # PowerDown: frames before awake_at (us) are lost, the first one
+        # after power down only wakes the chip
+        self.powered_down = False
+        self._awake_at = 0
+        self.power_down_us = 0  # total time spent in power down
+        self._down_since = 0
+        self.reset_counters()
+
+    def _reset_level(self, level):
+        """RSTPD_N edge: low resets the chip, high starts its boot"""
+        if level == 0:
+            self._in_reset = True
+            self._pending = []
+            self._autopoll = None
+            self.targets = {}
+            self.powered_down = False
+            self.bitrate = (self.rf_kbps, self.rf_kbps)
+        else:
+            self._in_reset = False
+            self._boot_at = _now_us() + self.boot_us
+
+    def booting(self):
+        """True while held in reset or starting up after it"""
+        return self._in_reset or _now_us() < self._boot_at
+
+    def reset_counters(self):
+        """Clear the bus and command counters"""
+        self.transactions = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.commands = 0
+        self.corrupted = 0
+        self.nacks = 0
+        self.bus_failures = 0
+
+    def _wire_us(self, count):
+        """Time on the wire for count bytes"""
+        return 0
+
+    def _arrival_us(self, count):
+        """Extra time before count bytes of output reach the host on their
+        own (streaming links), polled buses spend it in _bus instead"""
+        return 0
+
+    def _bus(self, count):
+        """Account for one bus transaction of count bytes"""
+        self.transactions += 1
+        if self.bus_errors and self._random.random() < self.bus_errors:
+            self.bus_failures += 1
+            raise OSError(5)  # EIO
+        wire_us = self._wire_us(count)
+        if wire_us:
+            end = _now_us() + wire_us
+            while _now_us() < end:
+                pass
+
+    def ready(self):
+        """True if the head of the output queue can be read"""
+        if self._autopoll is not None and self.tags:
+            # A tag came into the field while the PN532 was polling, it is
+            # found on the next poll round
+            params, started = self._autopoll
+            now = _now_us()
+            period_us = params[0] * 150000
+            rounds = (now - started + period_us - 1) // period_us
+            result = self._cmd_60(b'\x01' + params)
+            self._autopoll = None
+            self._queue_response(0x60, result, started + rounds * period_us)
+        return bool(self._pending) and self._pending[0][0] <= _now_us()
+
+    def _pop(self):
+        """Take the ready data at the head of the output queue"""
+        data = self._pending.pop(0)[1]
+        if self.corrupt and data != _ACK and \
+                self._random.random() < self.corrupt:
+            bit = self._random.randrange(8 * len(data))
+            data = bytearray(data)
+            data[bit // 8] ^= 1 << (bit % 8)
+            self.corrupted += 1
+        return data
+
+    def _host_ack(self):
+        """The host sent an ACK frame, which aborts the current command"""
+        self._pending = []
+        self._autopoll = None
+
+    def _queue_response(self, command, result, now):
+        """Queue the response frame of command from an _execute result"""
+        if result is not None:
+            delay, response = result
+            self._last_response = _frame(bytes([0xD5, command + 1]) + response)
+            self._pending.append((now + self.latency_us + delay +
+                                  self._arrival_us(len(self._last_response)),
+                                  self._last_response))
+
+    def _host_frame(self, buf):
+        """Process a frame written by the host: a command, ACK or NACK"""
+        buf = bytes(buf)
+        now = _now_us()
+        if self.booting():
+            return
+        if self.powered_down:
+            # Host traffic wakes the PN532, the frame itself is lost
+            self.powered_down = False
+            self.power_down_us += now - self._down_since
+            self._awake_at = now + POWER_UP_US
+            return
+        if now < self._awake_at:
+            return  # still starting up
+        if buf[0:3] != b'\x00\x00\xFF' or len(buf) < 6:
+            return
+        if buf[3:5] == b'\x00\xFF':  # ACK, abort the current command
+            self._host_ack()
+            return
+        if buf[3:5] == b'\xFF\x00':  # NACK, send the last response again
+            self.nacks += 1
+            if self._last_response is not None:
+                self._pending = [(_now_us(), self._last_response)]
+            return
+        length = buf[3]
+        if (length + buf[4]) & 0xFF or len(buf) < 7 + length or \
+                sum(buf[5:6+length]) & 0xFF:
+            return  # corrupted frame, the PN532 does not ACK it
+        data = buf[5:5+length]
+        if data[0] != 0xD4:
+            return
+        self.commands += 1
+        self._pending = [(now + self._arrival_us(len(_ACK)), _ACK)]
+        self._queue_response(data[1], self._execute(data[1], data[2:]), now)
+
+    # PN532 side -------------------------------------------------------------
+
+    def _rf_us(self, count, kbps=None):
+        """Time spent on the RF interface for count bytes, at the activation
+        bit rate unless kbps is given"""
+        return count * 8 * 1000 // (kbps or self.rf_kbps)
+
+    def _cascade_levels(self, tag):
+        """ISO14443A cascade levels of the UID of tag (4, 7 or 10 bytes)"""
+        return 1 + (len(tag.uid) > 4) + (len(tag.uid) > 7)
+
+    def _activation_us(self, tag):
+        """RF time of REQA and the anticollision + select of each cascade
+        level"""
+        levels = self._cascade_levels(tag)
+        delay = self._rf_us(3 + 15 * levels) + (1 + 2 * levels) * FRAME_DELAY_US
+        ats = getattr(tag, 'ats', None)
+        if ats is not None:  # ISO14443-4: RATS and the ATS
+            delay += self._rf_us(2 + len(ats)) + FRAME_DELAY_US
+        return delay
+
+    def _no_answer_us(self):
+        """Time until the PN532 gives up on a target that does not answer"""
+        return self.rf_timeout_us * (self.com_retries + 1)
+
+    def _execute(self, command, params):
+        """Run command, returns (extra delay us, response data) or None if
+        the PN532 would not answer (yet)"""
+        handler = getattr(self, '_cmd_{:02x}'.format(command), None)
+        if handler is None:
+            return 0, b'\x7f'  # syntax error frame content
+        return handler(params)
+
+    def _cmd_02(self, params):  # GetFirmwareVersion
+        return 0, bytes(self.firmware)
+
+    def _cmd_10(self, params):  # SetSerialBaudRate
+        self._new_baudrate = _BAUDRATES[params[0]]
+        return 0, b''
+
+    def _cmd_14(self, params):  # SAMConfiguration
+        self.irq_enabled = len(params) < 3 or bool(params[2] & 0x01)
+        return 0, b''
+
+    def _cmd_16(self, params):  # PowerDown, after the response is sent
+        self.powered_down = True
+        self._down_since = _now_us()
+        return 0, b'\x00'
+
+    def _cmd_32(self, params):  # RFConfiguration
+        item = params[0]
+        if item == 0x01:
+            self.rf_field = bool(params[1] & 0x01)
+        elif item == 0x02:
+            self.rf_timeout_us = 100 << (params[3] - 1) if params[3] else 0
+        elif item == 0x04:
+            self.com_retries = params[1]
+        elif item == 0x05:
+            self.passive_retries = params[3]
+        return 0, b''
+
+    def _target_record(self, tag, tg):
+        return bytes([tg]) + tag.sens_res + bytes([tag.sel_res, len(tag.uid)]) \
+            + tag.uid + getattr(tag, 'ats', b'')
+
+    def _cmd_4a(self, params):  # InListPassiveTarget
+        max_targets, baud = params[0], params[1]
+        if baud != 0x00 or not self.tags:
+            if self.passive_retries == 0xFF:
+                return None  # keeps retrying until a card shows up
+            return (self.passive_retries + 1) * PASSIVE_ATTEMPT_US, b'\x00'
+        self.targets = {}
+        self.bitrate = (self.rf_kbps, self.rf_kbps)
+        out = bytearray()
+        delay = 0
+        for tag in self.tags[:max_targets]:
+            tg = len(self.targets) + 1
+            tag.activate()
+            self.targets[tg] = tag
+            out += self._target_record(tag, tg)
+            delay += self._activation_us(tag)
+        self.current = 1
+        return delay, bytes([len(self.targets)]) + out
+
+    def _cmd_60(self, params):  # InAutoPoll
+        poll_nr, period, types = params[0], params[1], params[2:]
+        for target_type in types:
+            if target_type in (0x00, 0x10) and self.tags:
+                tag = self.tags[0]
+                tag.activate()
+                self.targets = {1: tag}
+                self.bitrate = (self.rf_kbps, self.rf_kbps)
+                record = self._target_record(tag, 1)
+                return self._activation_us(tag), \
+                    bytes([1, target_type, len(record)]) + record
+        if poll_nr == 0xFF:
+            self._autopoll = (bytes(params[1:]), _now_us())
+            return None
+        return poll_nr * len(types) * period * 150000, b'\x00'
+
+    def _cmd_00(self, params):  # Diagnose
+        if params[0] != 0x06:
+            return 0, b'\x00'
+        # Attention request: does the current target still answer
+        tag = self.targets.get(self.current)
+        if tag is None or tag not in self.tags:
+            return self._no_answer_us(), bytes([STATUS_TIMEOUT])
+        return self._rf_us(2) + FRAME_DELAY_US, b'\x00'
+
+    def _cmd_54(self, params):  # InSelect, wakes the card up again (WUPA)
+        tag = self.targets.get(params[0])
+        if tag is None:
+            return 0, b'\x27'
+        if tag not in self.tags:
+            return self._no_answer_us(), bytes([STATUS_TIMEOUT])
+        tag.activate()
+        self.current = params[0]
+        levels = self._cascade_levels(tag)
+        return self._rf_us(3 + 8 * levels) + (1 + levels) * FRAME_DELAY_US, \
+            b'\x00'
+
+    def _deselect(self, params, release):
+        tg = params[0]
+        for number in [number for number in self.targets
+                       if tg in (0, number)]:
+            # Type 2 and Mifare Classic cards are halted (HLTA)
+            self.targets[number].halted = True
+            if release:
+                del self.targets[number]
+        return self._rf_us(2) + FRAME_DELAY_US, b'\x00'
+
+    def _cmd_4e(self, params):  # InPSL
+        tag = self.targets.get(params[0])
+        if tag is None:
+            return 0, b'\x27'
+        rates = (_BITRATES_KBPS[params[1]], _BITRATES_KBPS[params[2]])
+        if tag not in self.tags or not tag.pps(*rates):
+            return self._no_answer_us(), bytes([STATUS_TIMEOUT])
+        self.bitrate = rates
+        return self._rf_us(5) + FRAME_DELAY_US, b'\x00'
+
+    def _cmd_44(self, params):  # InDeselect
+        return self._deselect(params, False)
+
+    def _cmd_52(self, params):  # InRelease
+        return self._deselect(params, True)
+
+    def _tag_us(self, tag, request, response):
+        """RF time of a tag exchange, plus programming time for writes"""
+        delay = self._rf_us(len(request), self.bitrate[0]) + \
+            self._rf_us(len(response), self.bitrate[1]) + FRAME_DELAY_US
+        frame_size = getattr(tag, 'frame_size', None)
+        if frame_size is not None:  # ISO14443-4 blocks of the frame size
+            delay += (len(request) + len(response)) // frame_size * \
+                FRAME_DELAY_US
+        if request and request[0] in (0xA0, 0xA2):
+            delay += tag.write_us
+        return delay
+
+    def _cmd_40(self, params):  # InDataExchange
+        tag = self.targets.get(params[0] & 0x3F)
+        if tag is None or tag not in self.tags:
+            self._chain_in = self._chain_out = b''
+            return self._no_answer_us(), bytes([STATUS_TIMEOUT])
+        self.current = params[0] & 0x3F
+        data = bytes(params[1:])
+        if params[0] & MORE_INFORMATION:  # more command data follows
+            self._chain_in += data
+            return self._tag_us(tag, data, b''), b'\x00'
+        if not data and self._chain_out:  # host asks for the next part
+            return self._response_chunk(tag, FRAME_DELAY_US)
+        request = self._chain_in + data
+        self._chain_in = b''
+        status, self._chain_out = tag.exchange(request)
+        if status != STATUS_OK:
+            self._chain_out = b''
+            return self._tag_us(tag, data, b''), bytes([status])
+        return self._response_chunk(tag, self._tag_us(tag, data, b''))
+
+    def _response_chunk(self, tag, delay):
+        """Next part of a response, with MI set while more is left"""
+        chunk = self._chain_out[:DATA_EXCHANGE_CHUNK]
+        self._chain_out = self._chain_out[DATA_EXCHANGE_CHUNK:]
+        status = MORE_INFORMATION if self._chain_out else STATUS_OK
+        return delay + self._rf_us(len(chunk), self.bitrate[1]), \
+            bytes([status]) + chunk
+
+    def _cmd_42(self, params):  # InCommunicateThru
+        tag = self.targets.get(self.current)
+        if tag is None or tag not in self.tags:
+            return self._no_answer_us(), bytes([STATUS_TIMEOUT])
+        status, data = tag.exchange(bytes(params))
+        return self._tag_us(tag, params, data), bytes([status]) + data
+
+
+class PN532Simulator(_PN532Chip):
+    """Emulated PN532 on an I2C bus, use it in place of machine.I2C.
+    stretch_us is the clock stretch added to every bus transaction and
+    clock_hz the modelled bus clock (wall time is spent for each byte on the
+    wire)."""
+
+    def __init__(self, tags=(), latency_us=500, stretch_us=0, clock_hz=400000,
+                 **kwargs):
+        self.stretch_us = stretch_us
+        self.clock_hz = clock_hz
+        super().__init__(tags, latency_us, **kwargs)
+
+    def _wire_us(self, count):
+        # 9 clocks per byte plus the address byte
+        if not self.clock_hz:
+            return self.stretch_us
+        return self.stretch_us + (count + 1) * 9 * 1000000 // self.clock_hz
+
+    def scan(self):
+        """machine.I2C.scan"""
+        return [_I2C_ADDRESS]
+
+    def readfrom_into(self, address, buf):
+        """machine.I2C.readfrom_into: status byte followed by pending data"""
+        if address != _I2C_ADDRESS or self.booting():
+            raise OSError(19)  # ENODEV
+        self._bus(len(buf))
+        self.bytes_read += len(buf)
+        if not self.ready():
+            for i in range(len(buf)):
+                buf[i] = 0x00
+            return
+        buf[0] = 0x01
+        if len(buf) == 1:
+            return
+        data = self._pop()
+        count = min(len(data), len(buf) - 1)
+        buf[1:1+count] = data[:count]
+        for i in range(1 + count, len(buf)):
+            buf[i] = 0x00
+
+    def writeto(self, address, buf):
+        """machine.I2C.writeto: a command, ACK (abort) or NACK frame"""
+        if address != _I2C_ADDRESS or self.booting():
+            raise OSError(19)  # ENODEV
+        self._bus(len(buf))
+        self.bytes_written += len(buf)
+        self._host_frame(buf)
+
+
+class TCA9548ASimulator:
+    """TCA9548A I2C multiplexer in front of several simulated PN532 (one
+    PN532Simulator per channel, or None), use it in place of machine.I2C.
+    Selecting more than one PN532 at once makes their answers collide, that
+    is reported as EIO. clock_hz models the channel select writes; the
+    counters add up those of the channels."""
+
+    def __init__(self, channels, address=0x70, clock_hz=400000):
+        self.channels = list(channels)
+        self.address = address
+        self.clock_hz = clock_hz
+        self.mask = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Clear the mux and channel counters"""
+        self.selects = 0
+        for chip in self.channels:
+            if chip is not None:
+                chip.reset_counters()
+
+    def _total(self, name):
+        return sum(getattr(chip, name) for chip in self.channels
+                   if chip is not None)
+
+    @property
+    def transactions(self):
+        """Bus transactions, channel selects included"""
+        return self.selects + self._total('transactions')
+
+    @property
+    def bytes_read(self):
+        """Bytes read from the PN532s"""
+        return self._total('bytes_read')
+
+    @property
+    def bytes_written(self):
+        """Bytes written, channel selects included"""
+        return self.selects + self._total('bytes_written')
+
+    def _selected(self, address):
+        chips = [chip for i, chip in enumerate(self.channels)
+                 if self.mask & (1 << i) and chip is not None]
+        if not chips or address != _I2C_ADDRESS:
+            raise OSError(19)  # ENODEV
+        if len(chips) > 1:
+            raise OSError(5)  # EIO, the PN532s answer at once
+        return chips[0]
+
+    def scan(self):
+        """machine.I2C.scan"""
+        return [self.address] + ([_I2C_ADDRESS] if self.mask else [])
+
+    def readfrom_into(self, address, buf):
+        """machine.I2C.readfrom_into"""
+        if address == self.address:
+            buf[0] = self.mask
+            return
+        self._selected(address).readfrom_into(address, buf)
+
+    def writeto(self, address, buf):
+        """machine.I2C.writeto, a one byte write to the mux selects channels"""
+        if address == self.address:
+            self.selects += 1
+            end = _now_us() + 2 * 9 * 1000000 // self.clock_hz
+            while _now_us() < end:
+                pass
+            self.mask = buf[0]
+            return len(buf)
+        return self._selected(address).writeto(address, buf)
+
+
+class I2CDevLoopback:
+    """Kernel side of /dev/i2c-N for pn532_linux.LinuxI2C, pass it as its
+    ioctl: the I2C_RDWR messages are decoded from their C structures and run
+    against the I2C simulator, whose errors come back as the OSError of a
+    failed ioctl."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def __call__(self, fd, request, arg):  # pylint: disable=unused-argument
+        assert request == I2C_RDWR, 'Only I2C_RDWR is emulated'
+        for i in range(arg.nmsgs):
+            msg = arg.msgs[i]
+            data = memoryview(ctypes.cast(msg.buf, ctypes.POINTER(
+                ctypes.c_uint8 * msg.len)).contents).cast('B')
+            if msg.flags & I2C_M_RD:
+                self.simulator.readfrom_into(msg.addr, data)
+            else:
+                self.simulator.writeto(msg.addr, data)
+        return arg.nmsgs
+
+
+def _reverse_bits(value):
+    result = 0
+    for _ in range(8):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+_REVERSE = bytes(_reverse_bits(i) for i in range(256))
+
+
+class PN532SPISimulator(_PN532Chip):
+    """Emulated PN532 on SPI, use it in place of machine.SPI together with
+    cs_pin as the chip select. Data is LSB first on the wire, as with the
+    real PN532. clock_hz is the modelled SPI clock."""
+
+    def __init__(self, tags=(), latency_us=500, clock_hz=5000000, **kwargs):
+        self.clock_hz = clock_hz
+        self.cs_pin = SimOutputPin(self._select)
+        self._operation = None
+        super().__init__(tags, latency_us, **kwargs)
+
+    def _wire_us(self, count):
+        return count * 8 * 1000000 // self.clock_hz
+
+    def _select(self, level):
+        """Chip select edge, a low level starts a transaction"""
+        if level == 0:
+            self.transactions += 1
+            self._operation = None
+
+    def _transfer(self, out, into=None):
+        """One SPI transfer of out (bytes from the host), filling into"""
+        self._bus(len(out))
+        self.transactions -= 1  # counted per chip select instead
+        self.bytes_written += len(out)
+        data = bytes(_REVERSE[b] for b in out)
+        start = 0
+        if self._operation is None:
+            self._operation = data[0]
+            start = 1
+        reply = bytearray(len(out))
+        if self._operation == 0x01:  # data write
+            self._host_frame(data[start:])
+        elif self._operation == 0x02:  # status read
+            for i in range(start, len(out)):
+                reply[i] = 0x01 if self.ready() else 0x00
+        elif self._operation == 0x03 and self.ready():  # data read
+            pending = self._pop()
+            count = min(len(pending), len(out) - start)
+            reply[start:start+count] = pending[:count]
+        if into is not None:
+            self.bytes_read += len(out)
+            for i, value in enumerate(reply):
+                into[i] = _REVERSE[value]
+
+    def write(self, buf):
+        """machine.SPI.write"""
+        self._transfer(bytes(buf))
+
+    def write_readinto(self, write_buf, read_buf):
+        """machine.SPI.write_readinto"""
+        self._transfer(bytes(write_buf), read_buf)
+
+    def readinto(self, buf, write=0x00):
+        """machine.SPI.readinto"""
+        self._transfer(bytes([write]) * len(buf), buf)
+
+
+class PN532UARTSimulator(_PN532Chip):
+    """Emulated PN532 on its high speed UART, use it in place of
+    machine.UART. Starts at 115200 baud; SetSerialBaudRate changes the PN532
+    rate once the host ACKs the response, and the host side follows with
+    init(baudrate=...). Bytes sent at a mismatched rate are lost."""
+
+    def __init__(self, tags=(), latency_us=500, baudrate=115200, **kwargs):
+        self.baudrate = baudrate
+        self.host_baudrate = baudrate
+        self._out = bytearray()
+        super().__init__(tags, latency_us, **kwargs)
+
+    def _wire_us(self, count):
+        # 8N1, 10 bits per byte
+        return count * 10 * 1000000 // self.baudrate
+
+    def _arrival_us(self, count):
+        return self._wire_us(count)
+
+    def _host_ack(self):
+        super()._host_ack()
+        if self._new_baudrate is not None:
+            self.baudrate = self._new_baudrate
+            self._new_baudrate = None
+
+    def init(self, baudrate=115200, **kwargs):  # pylint: disable=unused-argument
+        """machine.UART.init"""
+        self.host_baudrate = baudrate
+
+    def write(self, buf):
+        """machine.UART.write"""
+        self._bus(len(buf))
+        self.bytes_written += len(buf)
+        if self.host_baudrate != self.baudrate:
+            return len(buf)
+        buf = bytes(buf)
+        start = buf.find(b'\x00\x00\xff')
+        if start >= 0:
+            self._host_frame(buf[start:])
+        return len(buf)
+
+    def any(self):
+        """machine.UART.any"""
+        while self.ready():
+            self._out += self._pop()
+        return len(self._out)
+
+    def readinto(self, buf, nbytes=None):
+        """machine.UART.readinto"""
+        self.any()
+        count = min(len(self._out), len(buf) if nbytes is None else nbytes)
+        if not count:
+            return None
+        self.transactions += 1
+        self.bytes_read += count
+        if self.host_baudrate != self.baudrate:
+            buf[0:count] = b'\xff' * count  # garbled
+        else:
+            buf[0:count] = self._out[:count]
+        del self._out[:count]
+        return count
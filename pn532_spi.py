@@ -0,0 +1,157 @@
+"""
+``pn532_spi``
+====================================================
+
+This module will let you communicate with a PN532 RFID/NFC shield or breakout
+using SPI (up to 5MHz, mode 0). The PN532 shifts data LSB first; bytes are
+bit-reversed in software so any MicroPython machine.SPI (MSB first) works.
+
+* Author(s): Original Raspberry Pi code by Tony DiCola, CircuitPython by ladyada,
+             refactor by Carter Nelson
+
+"""
+
+import time
+try:
+    from machine import Pin
+except ImportError:  # CPython, pass Pin objects for cs, irq and reset
+    Pin = None
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+from adafruit_pn532 import (PN532, _POWER_UP_US, _sleep_ms, _sleep_us,
+                            _deadline)
+
+# pylint: disable=bad-whitespace
+_SPI_STATREAD = const(0x02)
+_SPI_DATAWRITE = const(0x01)
+_SPI_DATAREAD = const(0x03)
+_SPI_READY = const(0x01)
+
+
+def _reverse_bits(value):
+    """Reverse the bit order of a byte"""
+    result = 0
+    for _ in range(8):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+# Lookup table, reversing every byte on the bus one by one would be slow
+_REVERSE = bytes(_reverse_bits(i) for i in range(256))
+
+
+def _reverse_into(buf, start, end):
+    """Bit-reverse buf[start:end] in place"""
+    for i in range(start, end):
+        buf[i] = _REVERSE[buf[i]]
+
+
+class PN532_SPI(PN532):
+    """Driver for the PN532 connected over SPI."""
+
+    def __init__(self, spi, cs, *, irq=None, reset=None, debug=False):
+        """Create an instance of the PN532 class using SPI. spi is a
+        machine.SPI set up for mode 0 (polarity=0, phase=0), MSB first, at up
+        to 5MHz. cs is the chip select pin (pin number or Pin), optional IRQ
+        pin (signals readiness so the status is not polled) and reset pin.
+        """
+        self.debug = debug
+        self._spi = spi
+        self._cs = Pin(cs, Pin.OUT, value=1) if isinstance(cs, int) else cs
+        self._cs.value(1)
+        if isinstance(irq, int):
+            irq = Pin(irq, Pin.IN, Pin.PULL_UP)
+        self._init_irq(irq)
+        self._op = bytearray(2)  # operation byte + status byte
+        if reset:
+            reset_pin = Pin(reset, Pin.OUT) if isinstance(reset, int) else reset
+            reset_pin.value(0)
+            time.sleep(0.1)
+            reset_pin.value(1)
+            time.sleep(0.1)
+        super().__init__(debug=debug)
+
+    def _wakeup(self, deadline=None, short=False):
+        """Send any special commands/data to wake up PN532, not sleeping past
+        deadline (ticks_ms) when one is given. short leaves out the wait
+        after the wake up byte."""
+        # Selecting the PN532 wakes it up, it needs ~2ms before the first byte
+        self._cs.value(0)
+        _sleep_us(_POWER_UP_US)
+        self._op[0] = _REVERSE[0x00]
+        self._spi.write(self._op[:1])
+        self._cs.value(1)
+        if not short:
+            _sleep_ms(10, deadline)
+
+    def _wait_ready(self, timeout=1):
+        """Poll PN532 if status byte is ready, up to `timeout` seconds"""
+        return self._read_ready(0, _deadline(timeout)) is not None
+
+    def _status_ready(self):
+        """Read the status byte, True if the PN532 has data ready"""
+        op = self._op
+        op[0] = _REVERSE[_SPI_STATREAD]
+        op[1] = 0x00
+        self._cs.value(0)
+        try:
+            self._spi.write_readinto(op, op)
+        finally:
+            self._cs.value(1)
+        return _REVERSE[op[1]] == _SPI_READY
+
+    def _poll_ready(self, count):
+        """Check once, without waiting, if the PN532 is ready and if so read
+        count bytes. Returns a memoryview of the bytes or None if the PN532 is
+        busy (or IRQ is not asserted yet). With an IRQ pin the status read is
+        skipped.
+        """
+        if not self._irq_pending():
+            return None
+        if self._irq is None:
+            if not self._status_ready():
+                return None
+        else:
+            self._irq_flag = False
+        if count == 0:
+            return self._rx_view[:0]
+        return self._read_data(count)
+
+    def _read_data(self, count):
+        """Read a specified count of bytes from the PN532 into the receive
+        buffer and return them as a memoryview."""
+        frame = self._rx_view[:count+1]
+        frame[0] = _REVERSE[_SPI_DATAREAD]
+        for i in range(1, count+1):
+            frame[i] = 0x00
+        self._cs.value(0)
+        try:
+            self._spi.write_readinto(frame, frame)
+        finally:
+            self._cs.value(1)
+        _reverse_into(frame, 1, count+1)
+        if self.debug:
+            print("_read_data frame: ", bytes(frame[1:]))
+        return frame[1:]  # don't return the operation byte
+
+    def _write_data(self, framebytes):
+        """Write a specified count of bytes to the PN532"""
+        if self.debug:
+            print('_write data: ', [hex(i) for i in framebytes])
+        # Frames to send are built in place, prefix and bit-reverse a copy in
+        # the receive buffer, which is free while writing
+        count = len(framebytes)
+        frame = self._rx_view[:count+1]
+        frame[0] = _REVERSE[_SPI_DATAWRITE]
+        for i in range(count):
+            frame[i+1] = _REVERSE[framebytes[i]]
+        self._irq_flag = False
+        self._cs.value(0)
+        try:
+            self._spi.write(frame)
+        finally:
+            self._cs.value(1)
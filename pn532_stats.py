@@ -0,0 +1,241 @@
+"""
+``pn532_stats``
+====================================================
+
+Low overhead per-command latency and error counters for the PN532 driver.
+All counters live in preallocated arrays, so recording allocates nothing and
+the stats can be left enabled in production. Enable with
+``pn532.enable_stats()``, then ``pn532.stats.dump()`` / ``pn532.stats.reset()``.
+"""
+
+import time
+from array import array
+
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+
+try:
+    from time import ticks_us as _ticks_us, ticks_diff as _ticks_diff
+except ImportError:
+    def _ticks_us():  # pylint: disable=missing-docstring
+        return time.monotonic_ns() // 1000
+
+    def _ticks_diff(end, start):  # pylint: disable=missing-docstring
+        return end - start
+
+# Phases of a command
+PHASE_WRITE = const(0)
+PHASE_ACK = const(1)
+PHASE_RESPONSE = const(2)
+PHASE_TOTAL = const(3)
+_PHASES = const(4)
+_PHASE_NAMES = ("write", "ack", "response", "total")
+
+# Events counted per command
+EVENT_TIMEOUT = const(0)
+EVENT_WAKEUP = const(1)
+EVENT_BUSY = const(2)
+EVENT_FRAME_ERROR = const(3)
+EVENT_NACK = const(4)
+_EVENTS = const(5)
+_EVENT_NAMES = ("timeouts", "wakeups", "busy", "frame_errors", "nacks")
+
+# Pseudo command codes for derived latencies. Odd codes are PN532 responses,
+# never sent as commands, so they cannot clash with a real command slot
+LATENCY_DETECT = const(0x4B)  # InListPassiveTarget that found a card
+LATENCY_NO_CARD = const(0x4D)  # InListPassiveTarget that found none
+LATENCY_WAKE = const(0x17)  # host wake up to UID, pn532_lowpower
+LATENCY_PRESENCE = const(0x01)  # presence check, pn532_session
+_LATENCY_NAMES = {LATENCY_DETECT: "detect (card found)",
+                  LATENCY_NO_CARD: "detect (no card)",
+                  LATENCY_WAKE: "wake to UID",
+                  LATENCY_PRESENCE: "presence check"}
+
+# Latency histogram: bucket i counts latencies below _BUCKET_BASE_US << i
+_BUCKETS = const(16)
+_BUCKET_BASE_US = const(64)
+
+
+class CommandStats:
+    """Latency and error counters keyed by PN532 command code. Up to
+    max_commands distinct commands get their own slot, any further commands
+    share the last one (reported as command 0xFF)."""
+
+    def __init__(self, max_commands=8):
+        self._slots = max_commands + 1
+        self._commands = bytearray(b'\xff' * self._slots)
+        cells = self._slots * _PHASES
+        self._count = array('L', [0] * self._slots)
+        self._min = array('L', [0] * cells)
+        self._max = array('L', [0] * cells)
+        self._sum = array('Q', [0] * cells)
+        self._histogram = array('L', [0] * (cells * _BUCKETS))
+        self._events = array('L', [0] * (self._slots * _EVENTS))
+        self._bytes = array('Q', [0] * self._slots)
+        self._slot = 0
+        self._start = 0
+        self._mark = 0
+        # Total time of the last completed command
+        self.last_us = 0
+        # Bit rates (kbps to the target, from the target) of the current
+        # target, set by the driver
+        self.bitrate = None
+        self.reset()
+
+    def reset(self):
+        """Clear all counters"""
+        self._used = 0
+        for counters in (self._count, self._max, self._sum, self._histogram,
+                         self._events, self._bytes):
+            for i in range(len(counters)):
+                counters[i] = 0
+        for i in range(len(self._min)):
+            self._min[i] = 0xFFFFFFFF
+
+    def _slot_for(self, command):
+        for slot in range(self._used):
+            if self._commands[slot] == command:
+                return slot
+        if self._used < self._slots - 1:
+            self._commands[self._used] = command
+            self._used += 1
+            return self._used - 1
+        return self._slots - 1
+
+    def begin(self, command):
+        """Start timing a command"""
+        self._slot = self._slot_for(command)
+        self._count[self._slot] += 1
+        self._start = self._mark = _ticks_us()
+
+    def phase(self, phase):
+        """Record the time since the previous phase (or begin) for phase"""
+        now = _ticks_us()
+        self._record(self._slot, phase, _ticks_diff(now, self._mark))
+        self._mark = now
+
+    def end(self):
+        """Record the total time of the command"""
+        self.last_us = _ticks_diff(_ticks_us(), self._start)
+        self._record(self._slot, PHASE_TOTAL, self.last_us)
+
+    def transferred(self, count):
+        """Count count bytes of parameters and response for the current
+        command, for its throughput"""
+        self._bytes[self._slot] += count
+
+    def sample(self, code, elapsed):
+        """Record a derived latency (LATENCY_*) of elapsed microseconds"""
+        slot = self._slot_for(code)
+        self._count[slot] += 1
+        self._record(slot, PHASE_TOTAL, elapsed)
+
+    def event(self, event):
+        """Count an event (EVENT_*) for the current command"""
+        self._events[self._slot * _EVENTS + event] += 1
+
+    def _record(self, slot, phase, elapsed):
+        cell = slot * _PHASES + phase
+        if elapsed < self._min[cell]:
+            self._min[cell] = elapsed
+        if elapsed > self._max[cell]:
+            self._max[cell] = elapsed
+        self._sum[cell] += elapsed
+        bucket = 0
+        limit = _BUCKET_BASE_US
+        while elapsed >= limit and bucket < _BUCKETS - 1:
+            bucket += 1
+            limit <<= 1
+        self._histogram[cell * _BUCKETS + bucket] += 1
+
+    def _find(self, command):
+        for slot in range(self._used):
+            if self._commands[slot] == command:
+                return slot
+        if command == 0xFF and self._count[self._slots - 1]:
+            return self._slots - 1
+        return None
+
+    def percentile(self, command, phase, percent):
+        """Upper bound in microseconds of the bucket holding the percent
+        percentile latency of phase for command, or None without samples"""
+        slot = self._find(command)
+        if slot is None:
+            return None
+        base = (slot * _PHASES + phase) * _BUCKETS
+        total = 0
+        for bucket in range(_BUCKETS):
+            total += self._histogram[base + bucket]
+        if not total:
+            return None
+        wanted = (total * percent + 99) // 100
+        seen = 0
+        for bucket in range(_BUCKETS):
+            seen += self._histogram[base + bucket]
+            if seen >= wanted:
+                return _BUCKET_BASE_US << bucket
+        return _BUCKET_BASE_US << (_BUCKETS - 1)
+
+    def summary(self, command):
+        """Dict of the counters for command, or None if it was never sent"""
+        slot = self._find(command)
+        if slot is None:
+            return None
+        result = {"count": self._count[slot]}
+        for phase in range(_PHASES):
+            cell = slot * _PHASES + phase
+            samples = 0
+            for bucket in range(_BUCKETS):
+                samples += self._histogram[cell * _BUCKETS + bucket]
+            if not samples:
+                continue
+            result[_PHASE_NAMES[phase]] = {
+                "min": self._min[cell],
+                "avg": self._sum[cell] // samples,
+                "max": self._max[cell],
+                "p50": self.percentile(command, phase, 50),
+                "p95": self.percentile(command, phase, 95),
+            }
+        for event in range(_EVENTS):
+            result[_EVENT_NAMES[event]] = self._events[slot * _EVENTS + event]
+        total = self._sum[slot * _PHASES + PHASE_TOTAL]
+        if self._bytes[slot] and total:
+            result["bytes"] = self._bytes[slot]
+            # kB/s: bytes per millisecond of command time
+            result["throughput"] = self._bytes[slot] * 1000 / total
+        return result
+
+    def commands(self):
+        """Command codes with recorded stats"""
+        commands = [self._commands[slot] for slot in range(self._used)]
+        if self._count[self._slots - 1]:
+            commands.append(0xFF)
+        return commands
+
+    def dump(self):
+        """Print the stats of every command (latencies in microseconds)"""
+        if self.bitrate is not None:
+            print("bitrate {}/{} kbps (to/from target)".format(*self.bitrate))
+        for command in self.commands():
+            summary = self.summary(command)
+            if command in _LATENCY_NAMES:
+                print("{}: count {}".format(_LATENCY_NAMES[command],
+                                            summary["count"]))
+            else:
+                print("command 0x{:02x}: count {}".format(command,
+                                                          summary["count"]))
+            for name in _PHASE_NAMES:
+                if name in summary:
+                    phase = summary[name]
+                    print("  {:<8} min {} avg {} max {} p50 <{} p95 <{}".format(
+                        name, phase["min"], phase["avg"], phase["max"],
+                        phase["p50"], phase["p95"]))
+            if command not in _LATENCY_NAMES:
+                print("  " + " ".join("{} {}".format(name, summary[name])
+                                      for name in _EVENT_NAMES))
+            if "throughput" in summary:
+                print("  bytes {} throughput {:.1f} kB/s".format(
+                    summary["bytes"], summary["throughput"]))
@@ -0,0 +1,154 @@
+"""
+``pn532_uart``
+====================================================
+
+This module will let you communicate with a PN532 RFID/NFC shield or breakout
+using the high speed UART (HSU), including switching the link to up to
+921600 baud with SetSerialBaudRate.
+
+* Author(s): Original Raspberry Pi code by Tony DiCola, CircuitPython by ladyada,
+             refactor by Carter Nelson
+
+"""
+
+import time
+try:
+    from machine import Pin
+except ImportError:  # CPython, pass a Pin object for reset
+    Pin = None
+try:
+    from micropython import const
+except ImportError:  # CPython
+    def const(value):  # pylint: disable=missing-docstring
+        return value
+from adafruit_pn532 import (PN532, _ACK, _COMMAND_SETSERIALBAUDRATE,
+                            _POWER_UP_US, _sleep_ms, _deadline, _ticks_ms,
+                            _ticks_diff)
+
+# pylint: disable=bad-whitespace
+# Frame header: preamble, start code (2), LEN, LCS
+_HEADER_LENGTH = const(5)
+
+# SetSerialBaudRate BR codes
+_BAUDRATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+
+class PN532_UART(PN532):
+    """Driver for the PN532 connected over the high speed UART."""
+
+    def __init__(self, uart, *, reset=None, debug=False):
+        """Create an instance of the PN532 class using the UART. uart is a
+        machine.UART set up for 115200 baud 8N1 (the PN532 default), optional
+        reset pin and debugging output.
+        """
+        self.debug = debug
+        self._uart = uart
+        # Frame being received over (possibly) several polls
+        self._rx_count = 0
+        self._rx_need = _HEADER_LENGTH
+        if reset:
+            reset_pin = Pin(reset, Pin.OUT) if isinstance(reset, int) else reset
+            reset_pin.value(0)
+            time.sleep(0.1)
+            reset_pin.value(1)
+            time.sleep(0.1)
+        super().__init__(debug=debug)
+
+    def _wakeup(self, deadline=None, short=False):
+        """Send any special commands/data to wake up PN532, not sleeping past
+        deadline (ticks_ms) when one is given. short only waits the power up
+        time."""
+        # Long preamble of 0x55 and 0x00 wakes the PN532 out of power down
+        self._uart.write(b'\x55\x55\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+                         b'\x00\x00\x00\x00')
+        _sleep_ms(_POWER_UP_US // 1000 if short else 10, deadline)
+        self._flush()
+
+    def _flush(self):
+        """Drop any bytes left in the receive path"""
+        while self._uart.any():
+            self._uart.readinto(self._rx_view, min(self._uart.any(),
+                                                   len(self._rx)))
+        self._rx_count = 0
+        self._rx_need = _HEADER_LENGTH
+
+    def _wait_ready(self, timeout=1):
+        """Wait up to `timeout` seconds for data to arrive"""
+        deadline = _deadline(timeout)
+        while _ticks_diff(deadline, _ticks_ms()) > 0:
+            if self._uart.any():
+                return True
+            time.sleep(0.0005)
+        return False
+
+    def _poll_ready(self, count):
+        """Read whatever has arrived of the next frame, without waiting.
+        Returns a memoryview of the complete frame (ACK or information frame)
+        or None while it is still incomplete. count is not needed as the
+        frame length is taken from the frame itself.
+        """
+        rx = self._rx
+        while True:
+            available = self._uart.any()
+            if not available:
+                return None
+            want = min(available, self._rx_need - self._rx_count)
+            got = self._uart.readinto(self._rx_view[self._rx_count:], want)
+            if not got:
+                return None
+            self._rx_count += got
+            if self._rx_count < self._rx_need:
+                continue
+            if self._rx_need == _HEADER_LENGTH:
+                if rx[0] != 0x00 or rx[1] != 0x00 or rx[2] != 0xFF:
+                    # Out of sync, shift until the frame start is at the start
+                    self._rx_count -= 1
+                    rx[0:self._rx_count] = rx[1:1+self._rx_count]
+                    continue
+                if rx[3] == 0x00 and rx[4] == 0xFF:
+                    self._rx_need = len(_ACK)  # ACK frame, postamble left
+                else:
+                    # LEN data bytes + DCS + postamble
+                    self._rx_need = _HEADER_LENGTH + rx[3] + 2
+                continue
+            frame = self._rx_view[:self._rx_count]
+            self._rx_count = 0
+            self._rx_need = _HEADER_LENGTH
+            if self.debug:
+                print("_poll_ready frame: ", bytes(frame))
+            return frame
+
+    def _read_data(self, count):
+        """Read a frame from the PN532, at most count bytes"""
+        frame = self._read_ready(count, _deadline(1))
+        if frame is None:
+            raise RuntimeError('No data read from PN532')
+        return frame
+
+    def _write_data(self, framebytes):
+        """Write a specified count of bytes to the PN532"""
+        if self.debug:
+            print('_write data: ', [hex(i) for i in framebytes])
+        self._flush()
+        self._uart.write(framebytes)
+
+    def set_baudrate(self, baudrate):
+        """Switch the PN532 and the host UART to baudrate (9600 to 921600).
+        Returns True if the PN532 answers at the new rate.
+        """
+        code = _BAUDRATES.index(baudrate)
+        response = self.call_function(_COMMAND_SETSERIALBAUDRATE,
+                                      params=[code])
+        if response is None:
+            return False
+        # The PN532 switches after the host acknowledges the response
+        self._uart.write(_ACK)
+        time.sleep(0.001)
+        self._uart.init(baudrate=baudrate)
+        time.sleep(0.001)
+        self._flush()
+        try:
+            self.get_firmware_version()
+        except RuntimeError:
+            return False
+        return True
@@ -0,0 +1,115 @@
+"""AsyncPN532 against the simulated PN532 under asyncio"""
+
+import asyncio
+
+import pn532_i2c
+from adafruit_pn532 import _COMMAND_INLISTPASSIVETARGET
+from pn532_async import AsyncPN532
+from pn532_sim import NTAG215, NTAG2xx, PN532Simulator, Type4Tag
+from pn532_stats import LATENCY_DETECT, LATENCY_NO_CARD
+
+
+def _reader(*tags):
+    bus = PN532Simulator(tags=list(tags))
+    return bus, AsyncPN532(pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin))
+
+
+def test_read_passive_target():
+    tag = NTAG2xx(NTAG215)
+    _, pn532 = _reader(tag)
+    assert asyncio.run(pn532.read_passive_target()) == tag.uid
+
+
+def test_read_passive_target_no_card():
+    _, pn532 = _reader()
+    pn532.pn532.rf_configure("fast tap")
+    assert asyncio.run(pn532.read_passive_target(timeout=0.2)) is None
+
+
+def test_cards_once_per_presentation():
+    first = NTAG2xx(NTAG215, uid=b'\x04\x01\x02\x03\x04\x05\x06')
+    second = NTAG2xx(NTAG215, uid=b'\x04\x0a\x0b\x0c\x0d\x0e\x0f')
+    bus, pn532 = _reader(first)
+
+    async def presentations():
+        cards = pn532.cards(interval=0.01)
+        uids = [await cards.__anext__()]
+        bus.tags[:] = [second]
+        uids.append(await cards.__anext__())
+        bus.tags[:] = [first]
+        uids.append(await cards.__anext__())
+        return uids
+
+    assert asyncio.run(asyncio.wait_for(presentations(), 5)) == \
+        [first.uid, second.uid, first.uid]
+
+
+def test_event_loop_runs_during_commands():
+    bus, pn532 = _reader(NTAG2xx(NTAG215))
+    bus.bus_errors = 0.2
+    ticks = []
+
+    async def ticker(done):
+        while not done.is_set():
+            ticks.append(None)
+            await asyncio.sleep(0)
+
+    async def reads():
+        done = asyncio.Event()
+        task = asyncio.create_task(ticker(done))
+        uids = [await pn532.read_passive_target() for _ in range(10)]
+        done.set()
+        await task
+        return uids
+
+    assert None not in asyncio.run(reads())
+    assert bus.bus_failures > 0
+    assert len(ticks) > 10
+
+
+def test_stats_match_the_sync_driver():
+    tag = NTAG2xx(NTAG215)
+    bus, pn532 = _reader(tag)
+    summaries = []
+    for driver in (pn532.pn532, pn532):
+        stats = pn532.pn532.enable_stats()
+        result = driver.read_passive_target()
+        if driver is pn532:
+            result = asyncio.run(result)
+        assert result == tag.uid
+        summaries.append(stats.summary(_COMMAND_INLISTPASSIVETARGET))
+    sync, async_ = summaries
+    assert sorted(sync) == sorted(async_)
+    for name in ("write", "ack", "response", "total", "bytes"):
+        assert name in async_
+    assert async_["timeouts"] == async_["wakeups"] == 0
+
+
+def test_detect_latency_matches_the_sync_driver():
+    tag = NTAG2xx(NTAG215)
+    bus, pn532 = _reader(tag)
+    pn532.pn532.rf_configure("fast tap")
+    for driver in (pn532.pn532, pn532):
+        stats = pn532.pn532.enable_stats()
+        for tags in ([tag], []):
+            bus.tags[:] = tags
+            result = driver.list_passive_targets(1, timeout=0.2)
+            if driver is pn532:
+                result = asyncio.run(result)
+            assert len(result) == len(tags)
+        assert stats.summary(LATENCY_DETECT)["count"] == 1
+        assert stats.summary(LATENCY_NO_CARD)["count"] == 1
+
+
+def test_bitrate_matches_the_sync_driver():
+    tag = Type4Tag(pps_limit=424)
+    _, pn532 = _reader(tag)
+    pn532.pn532.max_bitrate = 848
+    assert pn532.pn532.read_passive_target() == tag.uid
+    assert pn532.pn532.bitrate == (424, 424)
+    pn532.pn532.max_bitrate = 212
+    assert asyncio.run(pn532.read_passive_target()) == tag.uid
+    assert pn532.pn532.bitrate == (212, 212)
+    pn532.pn532.max_bitrate = 848
+    assert asyncio.run(pn532.read_passive_target()) == tag.uid
+    assert pn532.pn532.bitrate == (424, 424)
@@ -0,0 +1,143 @@
+"""Commands end by their deadline and survive injected bus errors"""
+
+import time
+
+import pytest
+
+import pn532_i2c
+from adafruit_pn532 import _ticks_ms
+from pn532_lowpower import MODE_AUTOPOLL, LowPowerDetector
+from pn532_session import TargetSession
+from pn532_sim import NTAG215, MifareClassic1K, NTAG2xx, PN532Simulator
+
+_URL = b'\xd1\x01\x0cU\x04example.com'
+# One bus transaction and the scheduling jitter of the host
+_SLACK = 0.05
+
+
+def _timed(operation):
+    start = time.perf_counter()
+    result = operation()
+    return result, time.perf_counter() - start
+
+
+def test_bus_errors_are_retried_within_the_timeout():
+    bus = PN532Simulator(tags=[NTAG2xx(NTAG215, ndef=_URL)], seed=3)
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    bus.bus_errors = 0.2
+    done = 0
+    for _ in range(20):
+        targets, elapsed = _timed(
+            lambda: pn532.list_passive_targets(1, timeout=0.2))
+        assert elapsed <= 0.2 + _SLACK
+        done += bool(targets)
+    assert bus.bus_failures > 0
+    assert done == 20
+
+
+def test_read_ndef_under_bus_errors():
+    bus = PN532Simulator(tags=[NTAG2xx(NTAG215, ndef=_URL)], seed=5)
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    assert pn532.list_passive_targets(1)
+    bus.bus_errors = 0.2
+    for _ in range(10):
+        message, elapsed = _timed(lambda: pn532.ntag2xx_read_ndef(timeout=0.1))
+        assert elapsed <= 0.1 + _SLACK
+        assert bytes(message) == _URL
+
+
+def test_timeout_without_answer():
+    bus = PN532Simulator()
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    bus.bus_errors = 1.0
+    targets, elapsed = _timed(
+        lambda: pn532.list_passive_targets(1, timeout=0.1))
+    assert targets is None
+    assert elapsed <= 0.1 + _SLACK
+
+
+class _ReqPin:
+    """digitalio style H_REQ line, keeps the length of its low pulses"""
+
+    direction = None
+
+    def __init__(self):
+        self._value = True
+        self._low_since = None
+        self.pulses = []
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, level):
+        if not level and self._value:
+            self._low_since = time.perf_counter()
+        elif level and not self._value:
+            self.pulses.append(time.perf_counter() - self._low_since)
+        self._value = level
+
+
+def test_recovery_wakes_with_a_short_pulse():
+    bus = PN532Simulator(tags=[NTAG2xx(NTAG215)])
+    req = _ReqPin()
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin, req=req)
+    assert req.pulses and req.pulses[0] >= 0.1
+    # A deadline already passed does not cut the pulse
+    req.pulses = []
+    _, elapsed = _timed(lambda: pn532._recover(_ticks_ms()))  # pylint: disable=protected-access
+    assert len(req.pulses) == 1
+    assert 0.0001 <= req.pulses[0] < 0.01
+    assert elapsed < 0.01
+    bus.bus_errors = 0.3
+    for _ in range(5):
+        assert pn532.list_passive_targets(1, timeout=0.5)
+    assert len(req.pulses) == 1 + bus.bus_failures
+    assert all(0.0001 <= pulse < 0.01 for pulse in req.pulses)
+
+
+def _no_sleep(ms, irq=None):  # pylint: disable=unused-argument
+    pass
+
+
+def test_autopoll_wait_survives_bus_errors():
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    bus = PN532Simulator(tags=[tag], seed=7)
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    detector = LowPowerDetector(pn532, MODE_AUTOPOLL, irq=bus.irq_pin,
+                                sleep=_no_sleep)
+    bus.bus_errors = 0.3
+    for _ in range(5):
+        assert detector.wait_for_card(timeout=1) == tag.uid
+    assert bus.bus_failures > 0
+
+
+def test_autopoll_stop_survives_bus_errors():
+    bus = PN532Simulator(seed=11)
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    assert pn532.auto_poll_start()
+    bus.bus_errors = 0.5
+    assert pn532.auto_poll_stop()
+    assert bus.bus_failures > 0
+    bus.bus_errors = 0.0
+    # The poll is over, the next command gets its own answer
+    assert pn532.get_firmware_version() == bus.firmware
+    assert pn532.auto_poll_start()
+    bus.bus_errors = 1.0
+    assert pn532.auto_poll_stop(timeout=0.05) is False
+
+
+@pytest.mark.parametrize("tag", [NTAG2xx(NTAG215), MifareClassic1K()])
+def test_session_poll_ends_by_its_timeout(tag):
+    bus = PN532Simulator(tags=[tag], seed=3)
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    session = TargetSession(pn532)
+    assert session.poll() is not None
+    # Presence check, InRelease and the new search all fail on a dead bus
+    bus.tags = []
+    bus.bus_errors = 1.0
+    target, elapsed = _timed(lambda: session.poll(timeout=0.2))
+    assert target is None
+    assert elapsed <= 0.2 + _SLACK
+    assert session.departures == 1
@@ -0,0 +1,112 @@
+"""LinuxI2C and LinuxPin, with the I2C_RDWR ioctl looped back onto the
+simulated PN532 and a temporary sysfs GPIO tree"""
+
+import pytest
+
+import pn532_i2c
+from pn532_linux import I2C_M_RD, LinuxI2C, LinuxPin
+from pn532_sim import I2CDevLoopback, NTAG215, NTAG2xx, PN532Simulator
+
+_GET_FIRMWARE_VERSION = b'\x00\x00\xff\x02\xfe\xd4\x02\x2a\x00'
+
+
+class _Recorder(I2CDevLoopback):
+    """Loopback that keeps (address, flags, bytes) of every message"""
+
+    def __init__(self, simulator):
+        super().__init__(simulator)
+        self.messages = []
+
+    def __call__(self, fd, request, arg):
+        result = super().__call__(fd, request, arg)
+        msg = arg.msgs[0]
+        self.messages.append((msg.addr, msg.flags, bytes(msg.buf[:msg.len])))
+        return result
+
+
+def _reader(irq):
+    tag = NTAG2xx(NTAG215)
+    bus = PN532Simulator(tags=[tag], latency_us=0, clock_hz=0)
+    ioctl = _Recorder(bus)
+    i2c = LinuxI2C(ioctl=ioctl)
+    pn532 = pn532_i2c.PN532_I2C(i2c, irq=bus.irq_pin if irq else None)
+    return tag, bus, ioctl, i2c, pn532
+
+
+@pytest.mark.parametrize("irq", [True, False])
+def test_frames_and_ioctls(irq):
+    tag, bus, ioctl, i2c, pn532 = _reader(irq)
+    ioctl.messages = []
+    i2c.ioctls = 0
+    bus.reset_counters()
+    assert pn532.get_firmware_version() == bus.firmware
+    # The command write, the ACK read and the response read
+    assert i2c.ioctls == 3
+    write, ack, response = ioctl.messages
+    assert write == (0x24, 0, _GET_FIRMWARE_VERSION)
+    assert ack[:2] == (0x24, I2C_M_RD)
+    assert ack[2] == b'\x01\x00\x00\xff\x00\xff\x00'
+    assert response[2][:8] == b'\x01\x00\x00\xff\x06\xfa\xd5\x03'
+
+    i2c.ioctls = 0
+    bus.reset_counters()
+    assert pn532.read_passive_target() == tag.uid
+    # Every ioctl is one bus transaction, with IRQ only the three needed
+    assert i2c.ioctls == bus.transactions
+    if irq:
+        assert i2c.ioctls == 3
+    else:
+        # Long responses are read once the status byte says ready
+        assert i2c.ioctls >= 4
+    assert pn532.ntag2xx_read_range(0, NTAG215 - 1) == tag.memory
+
+
+def test_bus_errors_are_oserrors():
+    _, bus, _, i2c, pn532 = _reader(True)
+    bus.bus_errors = 1.0
+    with pytest.raises(OSError):
+        i2c.writeto(0x24, _GET_FIRMWARE_VERSION)
+    bus.bus_errors = 0.0
+    assert pn532.get_firmware_version() == bus.firmware
+
+
+def _sysfs(tmp_path, number, value=b'0'):
+    gpio = tmp_path / 'gpio{}'.format(number)
+    gpio.mkdir()
+    (gpio / 'direction').write_text('')
+    (gpio / 'value').write_bytes(value)
+    return gpio
+
+
+def test_pin_output(tmp_path):
+    gpio = _sysfs(tmp_path, 27)
+    pin = LinuxPin(27, LinuxPin.OUT, root=str(tmp_path))
+    assert (gpio / 'direction').read_text() == 'out'
+    pin.value(1)
+    assert (gpio / 'value').read_bytes() == b'1'
+    pin.value(0)
+    assert (gpio / 'value').read_bytes() == b'0'
+    pin.close()
+
+
+def test_pin_input_and_irq(tmp_path):
+    gpio = _sysfs(tmp_path, 17, b'1\n')
+    pin = LinuxPin(17, LinuxPin.IN, LinuxPin.PULL_UP, root=str(tmp_path))
+    assert (gpio / 'direction').read_text() == 'in'
+    assert pin.value() == 1
+    (gpio / 'value').write_bytes(b'0\n')
+    assert pin.value() == 0
+
+    def handler(_):
+        pass
+    pin.irq(trigger=LinuxPin.IRQ_FALLING, handler=handler)
+    assert pin.handler is handler
+    pin.close()
+
+
+def test_pin_export(tmp_path):
+    (tmp_path / 'export').write_text('')
+    # No kernel behind the tree, the gpio directory never shows up
+    with pytest.raises(OSError):
+        LinuxPin(5, LinuxPin.OUT, root=str(tmp_path))
+    assert (tmp_path / 'export').read_text() == '5'
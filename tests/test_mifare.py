@@ -0,0 +1,36 @@
+"""MifareClassicSession against the simulated PN532"""
+
+import pn532_i2c
+from adafruit_pn532 import _COMMAND_INLISTPASSIVETARGET
+from pn532_mifare import KEY_DEFAULT, MifareClassicSession
+from pn532_sim import MifareClassic1K, PN532Simulator
+
+_KEY = b'\x01\x02\x03\x04\x05\x06'
+
+
+def _card(uid, key):
+    card = MifareClassic1K(uid=uid, keys=[(key, key)] * 16)
+    card.memory[64:80] = bytes(range(16))
+    return card
+
+
+def test_new_card_needs_no_reactivation():
+    first = _card(b'\x01\x02\x03\x04', _KEY)
+    second = _card(b'\x05\x06\x07\x08', KEY_DEFAULT)
+    bus = PN532Simulator(tags=[first])
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    session = MifareClassicSession(pn532, keys=[KEY_DEFAULT, _KEY])
+    assert pn532.read_passive_target() == first.uid
+    # The default key fails first, the card is selected again for the next
+    assert session.read_sector(first.uid, 1, trailer=False)[:48] == \
+        first.memory[64:112]
+    assert session.auth_failures == 2
+    # No key opens sector 2, the card is left idle
+    first.keys[2] = (bytes(6), bytes(6))
+    assert session.read_sector(first.uid, 2) is None
+    bus.tags[:] = [second]
+    assert pn532.read_passive_target() == second.uid
+    stats = pn532.enable_stats()
+    assert session.read_sector(second.uid, 1, trailer=False)[:48] == \
+        second.memory[64:112]
+    assert stats.summary(_COMMAND_INLISTPASSIVETARGET) is None
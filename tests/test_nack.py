@@ -0,0 +1,54 @@
+"""Corrupted responses are sent again after a NACK"""
+
+import pytest
+
+import pn532_i2c
+from adafruit_pn532 import _COMMAND_INLISTPASSIVETARGET
+from pn532_sim import NTAG215, NTAG2xx, PN532Simulator
+
+_URL = b'\xd1\x01\x0cU\x04example.com'
+
+
+def _reader(corrupt, seed):
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    bus = PN532Simulator(tags=[tag], seed=seed)
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    bus.corrupt = corrupt
+    bus.reset_counters()
+    return tag, bus, pn532, pn532.enable_stats()
+
+
+def _workload(pn532, tag):
+    for _ in range(20):
+        targets = pn532.list_passive_targets(1)
+        assert targets[0].uid == tag.uid
+        assert bytes(pn532.ntag2xx_read_ndef()) == _URL
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_corrupted_responses_are_retransmitted(seed):
+    tag, bus, pn532, _ = _reader(0.0, seed)
+    _workload(pn532, tag)
+    commands = bus.commands
+    tag, bus, pn532, stats = _reader(0.1, seed)
+    _workload(pn532, tag)
+    assert bus.corrupted > 0
+    # Corrupted frames cost a NACK each (flips in the postamble go
+    # unnoticed), never a new command
+    assert 0 < bus.nacks <= bus.corrupted
+    assert bus.commands == commands
+    nacks = sum(stats.summary(command)["nacks"]
+                for command in stats.commands())
+    assert nacks == bus.nacks
+
+
+def test_retry_budget_runs_out():
+    _, bus, pn532, stats = _reader(1.0, 1)
+    pn532.nack_retries = 3
+    with pytest.raises(RuntimeError):
+        pn532.list_passive_targets(1)
+    assert bus.commands == 1
+    assert bus.nacks == 3
+    summary = stats.summary(_COMMAND_INLISTPASSIVETARGET)
+    assert summary["nacks"] == 3
+    assert summary["frame_errors"] == 1
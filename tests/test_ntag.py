@@ -0,0 +1,111 @@
+"""NTAG2xx NDEF read and write against the simulated PN532"""
+
+import pytest
+
+import pn532_i2c
+from pn532_sim import (NTAG213, NTAG215, STATUS_TIMEOUT, NTAG2xx,
+                       PN532Simulator)
+
+_URL = b'\xd1\x01\x0cU\x04example.com'
+
+
+def _reader(tag):
+    bus = PN532Simulator(tags=[tag])
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    assert pn532.list_passive_targets(1)
+    return pn532
+
+
+def test_write_ndef_roundtrip():
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    pn532 = _reader(tag)
+    message = bytes(range(200))
+    assert pn532.ntag2xx_write_ndef(tag.uid, message) is not None
+    assert bytes(pn532.ntag2xx_read_ndef()) == message
+
+
+def test_write_ndef_blank_tag_starts_data_area():
+    tag = NTAG2xx(NTAG215)
+    tag.memory[16] = 0x00  # zero filled, all NULL TLVs
+    pn532 = _reader(tag)
+    assert pn532.ntag2xx_write_ndef(tag.uid, _URL) is not None
+    assert tag.memory[16:18] == bytes([0x03, len(_URL)])
+    assert bytes(pn532.ntag2xx_read_ndef()) == _URL
+
+
+def test_write_ndef_fills_small_tag():
+    tag = NTAG2xx(NTAG213)
+    tag.memory[16] = 0x00
+    pn532 = _reader(tag)
+    # 144 byte data area: 4 byte TLV header, message, Terminator
+    message = bytes(139)
+    assert pn532.ntag2xx_write_ndef(tag.uid, message) is not None
+    assert bytes(pn532.ntag2xx_read_ndef()) == message
+
+
+@pytest.mark.parametrize("size", [600, 2000])
+def test_write_ndef_too_large(size):
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    pn532 = _reader(tag)
+    with pytest.raises(ValueError):
+        pn532.ntag2xx_write_ndef(tag.uid, bytes(size))
+    assert bytes(pn532.ntag2xx_read_ndef()) == _URL
+
+
+def test_write_ndef_keeps_lock_control():
+    tag = NTAG2xx(NTAG215)
+    lock = bytes([0x01, 0x03, 0xA0, 0x10, 0x44])
+    tag.memory[16:16+len(lock)] = lock
+    tag.memory[16+len(lock)] = 0xFE
+    pn532 = _reader(tag)
+    assert pn532.ntag2xx_write_ndef(tag.uid, _URL) is not None
+    assert tag.memory[16:16+len(lock)] == lock
+    assert bytes(pn532.ntag2xx_read_ndef()) == _URL
+
+
+@pytest.mark.parametrize("uid", [b'\x01\x02\x03\x04', b'\x04\x5a\x1b\x72',
+                                 b'\x04\x5a\x1b\x72\x9c\x3e\x81'])
+def test_write_ndef_other_uid(uid):
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    pn532 = _reader(tag)
+    assert pn532.ntag2xx_write_ndef(uid, bytes(40)) is None
+    assert bytes(pn532.ntag2xx_read_ndef()) == _URL
+
+
+class _TearingTag(NTAG2xx):
+    """NTAG2xx pulled off the reader after tear_after page writes"""
+
+    tear_after = None
+
+    def exchange(self, data):
+        if data[0] == 0xA2 and self.tear_after is not None:
+            if not self.tear_after:
+                self.halted = True
+                return STATUS_TIMEOUT, b''
+            self.tear_after -= 1
+        return super().exchange(data)
+
+
+@pytest.mark.parametrize("lock", [b'', bytes([0x01, 0x03, 0xA0, 0x10, 0x44])])
+def test_write_ndef_tear(lock):
+    # With the Lock Control TLV the NDEF TLV is at offset 21 and its 3 byte
+    # length runs over into the next page. A tear after any write leaves no
+    # message or the old one.
+    old = bytes(range(200)) * 2
+    new = old[:290] + b'new message'
+    tlv = bytes([0x03, 0xFF, len(old) >> 8, len(old) & 0xFF]) + old + b'\xfe'
+    tag = _TearingTag(NTAG215)
+    tag.memory[16:16+len(lock)+len(tlv)] = lock + tlv
+    image = bytes(tag.memory)
+    pn532 = _reader(tag)
+    writes = pn532.ntag2xx_write_ndef(tag.uid, new)[0]
+    assert bytes(pn532.ntag2xx_read_ndef()) == new
+    for tear in range(writes):
+        tag.memory[:] = image
+        tag.tear_after = tear
+        assert pn532.list_passive_targets(1)
+        assert pn532.ntag2xx_write_ndef(tag.uid, new) is None
+        tag.tear_after = None
+        assert pn532.list_passive_targets(1)
+        message = pn532.ntag2xx_read_ndef()
+        assert message is None or bytes(message) == old, tear
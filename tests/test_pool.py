@@ -0,0 +1,60 @@
+"""ReaderPool against simulated PN532s behind a simulated TCA9548A"""
+
+import pn532_i2c
+from adafruit_pn532 import _COMMAND_INLISTPASSIVETARGET
+from pn532_pool import MuxChannel, ReaderPool, TCA9548A
+from pn532_sim import NTAG215, NTAG2xx, PN532Simulator, TCA9548ASimulator
+from pn532_stats import LATENCY_DETECT
+
+
+def _pool(count, **kwargs):
+    chips = [PN532Simulator(tags=[NTAG2xx(NTAG215)]) for _ in range(count)]
+    mux = TCA9548A(TCA9548ASimulator(chips))
+    readers = [pn532_i2c.PN532_I2C(MuxChannel(mux, channel), irq=chip.irq_pin)
+               for channel, chip in enumerate(chips)]
+    for pn532 in readers:
+        pn532.rf_configure("fast tap")
+    for chip in chips:
+        for name, value in kwargs.items():
+            setattr(chip, name, value)
+    return chips, ReaderPool(readers)
+
+
+def _polls(pool, count):
+    done = []
+    for _ in range(100):
+        done += pool.poll()
+        if len(done) >= count:
+            break
+    return done
+
+
+def test_poll_finds_every_card():
+    chips, pool = _pool(3)
+    done = _polls(pool, 6)
+    assert {reader.index for reader, _ in done} == {0, 1, 2}
+    for reader, targets in done:
+        assert targets[0].uid == chips[reader.index].tags[0].uid
+
+
+def test_corrupted_responses_are_asked_again():
+    chips, pool = _pool(2, corrupt=0.3)
+    stats = [reader.pn532.enable_stats() for reader in pool.readers]
+    done = _polls(pool, 40)
+    assert len(done) >= 40
+    assert all(targets for _, targets in done)
+    assert sum(reader.failures for reader in pool.readers) == 0
+    nacks = sum(s.summary(_COMMAND_INLISTPASSIVETARGET)["nacks"] for s in stats)
+    assert nacks == sum(chip.nacks for chip in chips) > 0
+    assert sum(s.summary(LATENCY_DETECT)["count"] for s in stats) == len(done)
+
+
+def test_bus_errors_are_recovered():
+    chips, pool = _pool(2, bus_errors=0.1)
+    stats = [reader.pn532.enable_stats() for reader in pool.readers]
+    done = _polls(pool, 40)
+    assert len(done) >= 40
+    assert sum(chip.bus_failures for chip in chips) > 0
+    assert all(reader.healthy for reader in pool.readers)
+    assert sum(s.summary(_COMMAND_INLISTPASSIVETARGET)["wakeups"]
+               for s in stats) > 0
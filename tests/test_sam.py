@@ -0,0 +1,42 @@
+"""SAMConfiguration parameters"""
+
+import pytest
+
+import pn532_i2c
+from adafruit_pn532 import _sam_timeout_units
+from pn532_sim import PN532Simulator
+
+
+@pytest.mark.parametrize("seconds, units", [
+    (0, 0), (0.05, 1), (0.15, 3), (0.35, 7), (0.7, 14), (1, 20),
+    (12.75, 255), (20, 255), (-1, 0)])
+def test_timeout_units(seconds, units):
+    assert _sam_timeout_units(seconds) == units
+
+
+class _Bus(PN532Simulator):
+    """Keeps the frames written by the host"""
+
+    def __init__(self):
+        super().__init__()
+        self.written = []
+
+    def writeto(self, address, buf):
+        self.written.append(bytes(buf))
+        super().writeto(address, buf)
+
+
+@pytest.mark.parametrize("irq", [True, False])
+def test_sam_configuration_frame(irq):
+    bus = _Bus()
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    pn532.SAM_configuration(sam_timeout=0.35, irq=irq)
+    assert bus.written[-1][5:10] == bytes([0xD4, 0x14, 0x01, 7, int(irq)])
+
+
+def test_irq_off_polls_status():
+    bus = PN532Simulator()
+    pn532 = pn532_i2c.PN532_I2C(bus, irq=bus.irq_pin)
+    pn532.SAM_configuration(irq=False)
+    # The pin stays high from now on, commands are answered by polling
+    assert pn532.get_firmware_version() == bus.firmware
@@ -0,0 +1,107 @@
+"""SPI and UART framing against the simulated PN532"""
+
+import pytest
+
+import pn532_spi
+import pn532_uart
+from pn532_sim import (NTAG215, NTAG2xx, PN532SPISimulator,
+                       PN532UARTSimulator)
+
+_URL = b'\xd1\x01\x0cU\x04example.com'
+_FIRMWARE = (0x32, 0x01, 0x06, 0x07)
+# Host to PN532 frames: GetFirmwareVersion, InListPassiveTarget (one 106
+# kbps type A target) and InDataExchange READ of page 4
+_GET_FIRMWARE_VERSION = bytes([0x00, 0x00, 0xFF, 0x02, 0xFE, 0xD4, 0x02,
+                               0x2A, 0x00])
+_IN_LIST_PASSIVE_TARGET = bytes([0x00, 0x00, 0xFF, 0x04, 0xFC, 0xD4, 0x4A,
+                                 0x01, 0x00, 0xE1, 0x00])
+_READ_PAGE_4 = bytes([0x00, 0x00, 0xFF, 0x05, 0xFB, 0xD4, 0x40, 0x01, 0x30,
+                      0x04, 0xB7, 0x00])
+
+
+class _Recording:
+    """Keeps the frames the host wrote, as the PN532 decoded them"""
+
+    def __init__(self, *args, **kwargs):
+        self.frames = []
+        super().__init__(*args, **kwargs)
+
+    def _host_frame(self, buf):
+        self.frames.append(bytes(buf))
+        super()._host_frame(buf)
+
+
+class SPIRecorder(_Recording, PN532SPISimulator):
+    """PN532SPISimulator keeping the written frames and the wire bytes"""
+
+    def __init__(self, *args, **kwargs):
+        self.wire = []
+        super().__init__(*args, **kwargs)
+
+    def write(self, buf):
+        self.wire.append(bytes(buf))
+        super().write(buf)
+
+
+class UARTRecorder(_Recording, PN532UARTSimulator):
+    """PN532UARTSimulator keeping the written frames"""
+
+
+def _spi(irq, tag):
+    bus = SPIRecorder(tags=[tag])
+    pn532 = pn532_spi.PN532_SPI(bus, bus.cs_pin,
+                                irq=bus.irq_pin if irq else None)
+    return bus, pn532
+
+
+def _uart(tag):
+    bus = UARTRecorder(tags=[tag])
+    return bus, pn532_uart.PN532_UART(bus)
+
+
+def _exchange(bus, pn532, tag):
+    """Check the frames and answers of a firmware, detect and read cycle"""
+    del bus.frames[:]
+    assert pn532.get_firmware_version() == _FIRMWARE
+    assert pn532.read_passive_target() == tag.uid
+    assert bytes(pn532.ntag2xx_read_block(4)) == bytes(tag.memory[16:20])
+    assert bus.frames == [_GET_FIRMWARE_VERSION, _IN_LIST_PASSIVE_TARGET,
+                          _READ_PAGE_4]
+
+
+@pytest.mark.parametrize("irq", [True, False])
+def test_spi(irq):
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    bus, pn532 = _spi(irq, tag)
+    _exchange(bus, pn532, tag)
+
+
+def test_spi_wire_is_lsb_first():
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    bus, pn532 = _spi(True, tag)
+    del bus.wire[:]
+    pn532.get_firmware_version()
+    # DATAWRITE (0x01) then the frame, every byte bit reversed
+    assert bus.wire[0] == bytes(int('{:08b}'.format(value)[::-1], 2)
+                                for value in b'\x01' + _GET_FIRMWARE_VERSION)
+
+
+def test_uart():
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    bus, pn532 = _uart(tag)
+    _exchange(bus, pn532, tag)
+
+
+def test_uart_baudrate():
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    bus, pn532 = _uart(tag)
+    assert pn532.set_baudrate(460800)
+    assert bus.baudrate == bus.host_baudrate == 460800
+    _exchange(bus, pn532, tag)
+
+
+def test_uart_read_ndef():
+    tag = NTAG2xx(NTAG215, ndef=_URL)
+    _, pn532 = _uart(tag)
+    assert pn532.read_passive_target() == tag.uid
+    assert bytes(pn532.ntag2xx_read_ndef()) == _URL